@@ -1,12 +1,13 @@
 import React, { useState, useEffect } from 'react';
 import { Download, Search, CheckCircle, AlertCircle, Clock, Music, ExternalLink, X } from 'lucide-react';
-import { downloadService, SearchResult, DownloadStatus } from '../../services/downloadService';
+import { downloadService, SearchResult, LocalSearchResult, DownloadStatus } from '../../services/downloadService';
 import { useLanguage } from '../../context/LanguageContext';
 
 const MusicDownloader: React.FC = () => {
   const { t } = useLanguage();
   const [searchQuery, setSearchQuery] = useState('');
   const [searchResults, setSearchResults] = useState<SearchResult[]>([]);
+  const [localResults, setLocalResults] = useState<LocalSearchResult[]>([]);
   const [isSearching, setIsSearching] = useState(false);
   const [downloads, setDownloads] = useState<DownloadStatus[]>([]);
   const [downloadUrl, setDownloadUrl] = useState('');
@@ -21,12 +22,13 @@ const MusicDownloader: React.FC = () => {
     return () => clearInterval(interval);
   }, []);
 
-  // İndirme durumlarını güncelle
+  // İndirme durumlarını güncelle (sunucu değişiklikleri SSE ile gönderir)
   useEffect(() => {
     if (isServiceOnline) {
-      loadDownloads();
-      const interval = setInterval(loadDownloads, 2000); // Her 2 saniyede güncelle
-      return () => clearInterval(interval);
+      // Playlist alt işleri üst işin toplam ilerlemesinde gösterilir
+      return downloadService.subscribeToDownloads((all) =>
+        setDownloads(all.filter((download) => !download.parent_id))
+      );
     }
   }, [isServiceOnline]);
 
@@ -54,12 +56,22 @@ const MusicDownloader: React.FC = () => {
     if (!searchQuery.trim() || !isServiceOnline) return;
 
     setIsSearching(true);
+    setSearchResults([]);
+    // Kütüphanedeki eşleşmeler Spotify aramasını beklemeden gösterilir
+    const local = downloadService.searchLibrary(searchQuery)
+      .then((results) => {
+        setLocalResults(results);
+        return results;
+      })
+      .catch(() => [] as LocalSearchResult[]);
     try {
       const results = await downloadService.searchMusic(searchQuery);
       setSearchResults(results);
     } catch (error) {
       console.error('Search failed:', error);
-      alert(t.download.searchFailed);
+      if ((await local).length === 0) {
+        alert(t.download.searchFailed);
+      }
     } finally {
       setIsSearching(false);
     }
@@ -163,7 +175,7 @@ const MusicDownloader: React.FC = () => {
           </div>
           {serviceStatus && (
             <div className="text-sm text-dark-600">
-              SpotDL: {serviceStatus.spotdl_initialized ? '✓' : '✗'} | 
+              SpotDL: {serviceStatus.spotdl_initialized ? '✓' : serviceStatus.spotdl_state === 'initializing' ? '…' : '✗'} | 
               Spotify: {serviceStatus.spotify_configured ? '✓' : '✗'}
             </div>
           )}
@@ -241,6 +253,32 @@ const MusicDownloader: React.FC = () => {
           </button>
         </div>
 
+        {/* Library Results */}
+        {localResults.length > 0 && (
+          <div className="mb-4">
+            <h3 className="text-sm font-semibold text-dark-600 mb-2">{t.download.libraryResults}</h3>
+            <div className="grid gap-2">
+              {localResults.map((result) => (
+                <div key={result.filename} className="bg-dark-200 rounded-lg p-4 border border-dark-500">
+                  <div className="flex items-center justify-between">
+                    <div className="flex-1 min-w-0">
+                      <h3 className="text-white font-medium truncate">{result.title}</h3>
+                      <p className="text-dark-600 text-sm">{result.artist}</p>
+                      <p className="text-dark-700 text-xs">
+                        {result.album ? `${result.album} • ` : ''}{formatDuration(result.duration)}
+                      </p>
+                    </div>
+                    <span className="flex items-center text-spotify-500 text-xs ml-4" title={result.filename}>
+                      <CheckCircle className="w-4 h-4 mr-1" />
+                      {t.download.inLibrary}
+                    </span>
+                  </div>
+                </div>
+              ))}
+            </div>
+          </div>
+        )}
+
         {/* Search Results */}
         {searchResults.length > 0 && (
           <div className="grid gap-3">
@@ -253,6 +291,12 @@ const MusicDownloader: React.FC = () => {
                     <p className="text-dark-700 text-xs">{result.album} • {formatDuration(result.duration)}</p>
                   </div>
                   <div className="flex items-center space-x-2 ml-4">
+                    {result.in_library && (
+                      <span className="flex items-center text-spotify-500 text-xs" title={result.filename}>
+                        <CheckCircle className="w-4 h-4 mr-1" />
+                        {t.download.inLibrary}
+                      </span>
+                    )}
                     <a
                       href={result.url}
                       target="_blank"
@@ -129,7 +129,9 @@ export const translations = {
   urlDownload: "URL'den İndir",
   downloadsTitle: "İndirmeler",
   supportedFormats: "Desteklenen: Spotify şarkıları, albümleri, çalma listeleri ve YouTube videoları",
-  playlistBulkInfo: "💡 Playlist/Album linkleri için toplu indirme desteklenir"
+  playlistBulkInfo: "💡 Playlist/Album linkleri için toplu indirme desteklenir",
+  libraryResults: "Kütüphanende",
+  inLibrary: "Kütüphanede"
     },
     
     // Çalar
@@ -316,7 +318,9 @@ export const translations = {
       urlDownload: "Download from URL",
       downloadsTitle: "Downloads",
       supportedFormats: "Supported: Spotify tracks, albums, playlists and YouTube videos",
-      playlistBulkInfo: "💡 Bulk download is supported for playlist/album links"
+      playlistBulkInfo: "💡 Bulk download is supported for playlist/album links",
+      libraryResults: "In your library",
+      inLibrary: "In library"
     },
     
     // Player
@@ -503,7 +507,9 @@ export const translations = {
       urlDownload: "从 URL 下载",
       downloadsTitle: "下载",
       supportedFormats: "支持：Spotify 歌曲、专辑、播放列表和 YouTube 视频",
-      playlistBulkInfo: "💡 支持播放列表/专辑链接的批量下载"
+      playlistBulkInfo: "💡 支持播放列表/专辑链接的批量下载",
+      libraryResults: "你的曲库中",
+      inLibrary: "已在曲库"
     },
     
     // 播放器
@@ -6,6 +6,9 @@ const api = axios.create({
   timeout: 30000,
 });
 
+// Bağlantı hızının yayına ayrılan payı (tampon dolarken takılmasın)
+const STREAM_BANDWIDTH_SHARE = 0.5;
+
 export const musicAPI = {
   // Songs
   getAllSongs: async (): Promise<Song[]> => {
@@ -31,7 +34,17 @@ export const musicAPI = {
   },
 
   getStreamUrl: (songId: string): string => {
-    return `http://localhost:3001/api/music/stream/${songId}`;
+    const url = `http://localhost:3001/api/music/stream/${songId}`;
+    // Bağlantı yavaşsa sunucu şarkının düşük bit hızlı kopyasını yayınlar (Network Information API)
+    const connection = (navigator as any).connection;
+    if (connection?.saveData) {
+      return `${url}?quality=lowest`;
+    }
+    // Tarayıcılar downlink'i 10 Mbps'de keser; bu hızda asıl dosya rahatça akar
+    if (connection?.downlink > 0 && connection.downlink < 10) {
+      return `${url}?maxBitrate=${Math.round(connection.downlink * 1000 * STREAM_BANDWIDTH_SHARE)}`;
+    }
+    return url;
   },
 
   // Favorites
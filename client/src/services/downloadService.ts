@@ -6,6 +6,18 @@ export interface SearchResult {
   duration: number;
   url: string;
   cover_url?: string;
+  in_library?: boolean;
+  filename?: string;
+}
+
+// Yerel kütüphane araması sonucu (Spotify'a gidilmeden döner)
+export interface LocalSearchResult {
+  title: string;
+  artist: string | null;
+  album: string | null;
+  duration: number;
+  filename: string;
+  spotify_id?: string | null;
 }
 
 export interface DownloadStatus {
@@ -20,6 +32,16 @@ export interface DownloadStatus {
     duration: number;
   };
   file_path?: string;
+  url?: string;
+  priority?: number;
+  queue_position?: number | null;
+  queue_depth?: number;
+  total_tracks?: number;
+  completed_tracks?: number;
+  current_track?: string | null;
+  failed_tracks?: number;
+  parent_id?: string | null;
+  children?: string[];
 }
 
 const PYTHON_SERVICE_URL = 'http://127.0.0.1:8000';
@@ -27,21 +49,31 @@ const PYTHON_SERVICE_URL = 'http://127.0.0.1:8000';
 class DownloadService {
   // Müzik arama
   async searchMusic(query: string): Promise<SearchResult[]> {
+    const data = await this.search(query, true);
+    return data.results || [];
+  }
+
+  // Sadece yerel kütüphanede ara; Spotify aramasını beklemeden sonuç gösterilir
+  async searchLibrary(query: string): Promise<LocalSearchResult[]> {
+    const data = await this.search(query, false);
+    return data.local_results || [];
+  }
+
+  private async search(query: string, remote: boolean): Promise<any> {
     try {
       const response = await fetch(`${PYTHON_SERVICE_URL}/search`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({ query }),
+        body: JSON.stringify({ query, remote }),
       });
 
       if (!response.ok) {
         throw new Error(`Search failed: ${response.statusText}`);
       }
 
-      const data = await response.json();
-      return data.results || [];
+      return await response.json();
     } catch (error) {
       console.error('Search error:', error);
       throw error;
@@ -102,6 +134,36 @@ class DownloadService {
     }
   }
 
+  // İndirme durumlarını SSE ile dinle (sadece değişen alanlar gönderilir)
+  // EventSource bağlantı koparsa Last-Event-ID ile kaldığı yerden devam eder
+  subscribeToDownloads(onChange: (downloads: DownloadStatus[]) => void): () => void {
+    const downloads = new Map<string, DownloadStatus>();
+    const source = new EventSource(`${PYTHON_SERVICE_URL}/downloads/events`);
+    const emit = () => onChange(Array.from(downloads.values()));
+
+    source.addEventListener('snapshot', (event) => {
+      const data = JSON.parse((event as MessageEvent).data);
+      downloads.clear();
+      data.downloads.forEach((download: DownloadStatus) => downloads.set(download.id, download));
+      emit();
+    });
+
+    source.addEventListener('update', (event) => {
+      const data = JSON.parse((event as MessageEvent).data);
+      data.changed.forEach((delta: Partial<DownloadStatus> & { id: string }) => {
+        downloads.set(delta.id, { ...downloads.get(delta.id), ...delta } as DownloadStatus);
+      });
+      data.removed.forEach((id: string) => downloads.delete(id));
+      emit();
+    });
+
+    source.onerror = () => {
+      console.error('Download event stream error, reconnecting...');
+    };
+
+    return () => source.close();
+  }
+
   // İndirmeyi iptal et
   async cancelDownload(downloadId: string): Promise<{ message: string }> {
     try {
@@ -124,6 +186,7 @@ class DownloadService {
   async checkHealth(): Promise<{
     status: string;
     spotdl_initialized: boolean;
+    spotdl_state?: 'disabled' | 'initializing' | 'ready' | 'failed';
     spotify_configured: boolean;
   }> {
     try {
@@ -0,0 +1,279 @@
+"""
+Şarkı analizi: dalga formu tepeleri ve ses yüksekliği
+
+Her kütüphane dosyası indirme sonrası bir kez ffmpeg ile çözülür. Bu tek
+geçişte ebur128 filtresi entegre ses yüksekliğini (LUFS) ve yükseklik
+aralığını ölçer. Aynı geçişte düşük örnekleme hızına indirilmiş mono PCM'den
+sabit sayıda tepe değeri çıkarılır. Sonuç küçük bir ikili yan dosyada
+(sidecar) saklanır; böylece oynatıcı dalga formu göstermek ya da sesi
+normalize etmek için dosyanın tamamını çözmek zorunda kalmaz.
+
+Yan dosya biçimi (little-endian):
+    4s  magic "ERWF"
+    B   sürüm
+    x   (boş)
+    H   tepe sayısı (N)
+    f   süre (saniye)
+    f   entegre ses yüksekliği (LUFS, bilinmiyorsa NaN)
+    f   yükseklik aralığı (LU, bilinmiyorsa NaN)
+    N*B tepe değerleri (0-255, tam ölçek = 255)
+
+Mevcut kütüphane için toplu doldurma:
+    python audio_analysis.py [--uploads ../uploads] [--workers N] [--force]
+"""
+
+import argparse
+import logging
+import math
+import os
+import re
+import shutil
+import struct
+import subprocess
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+from library import AUDIO_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+SIDECAR_MAGIC = b"ERWF"
+SIDECAR_VERSION = 1
+SIDECAR_EXTENSION = ".erwf"
+_HEADER = struct.Struct("<4sBxHfff")
+
+# Dalga formu için yeterli çözünürlük; çözme ve tepe hesabı ucuz kalır
+PEAK_SAMPLE_RATE = 8000
+PEAK_POINTS = 1000
+PEAK_SCALE = 255
+# ReplayGain 2.0 referans seviyesi
+REPLAYGAIN_REFERENCE_LUFS = -18.0
+ANALYSIS_TIMEOUT = 300  # saniye
+
+_SUMMARY_RE = re.compile(
+    r"Summary:.*?I:\s+(-?[\d.]+|-inf)\s+LUFS.*?LRA:\s+([\d.]+)\s+LU",
+    re.DOTALL,
+)
+
+
+class AnalysisError(Exception):
+    """Dosya çözülemediğinde fırlatılır"""
+
+
+def resolve_ffmpeg() -> str:
+    """FFMPEG_PATH, PATH'teki ffmpeg ya da spotdl'in indirdiği yerel ffmpeg"""
+    configured = os.getenv("FFMPEG_PATH")
+    if configured:
+        return configured
+    if shutil.which("ffmpeg"):
+        return "ffmpeg"
+    try:
+        from spotdl.utils.ffmpeg import get_local_ffmpeg
+
+        local = get_local_ffmpeg()
+        if local is not None:
+            return str(local)
+    except Exception:
+        pass
+    return "ffmpeg"
+
+
+def sidecar_path(analysis_dir: str, filename: str) -> str:
+    return os.path.join(analysis_dir, os.path.basename(filename) + SIDECAR_EXTENSION)
+
+
+def compute_peaks(samples: array, points: int = PEAK_POINTS) -> List[int]:
+    """16-bit PCM örneklerini eşit aralıklı mutlak tepe değerlerine indir"""
+    count = len(samples)
+    if count == 0:
+        return []
+    points = min(points, count)
+    step = count / points
+    peaks = []
+    for i in range(points):
+        segment = samples[int(i * step):int((i + 1) * step)]
+        peak = max(max(segment), -min(segment))
+        peaks.append(min(PEAK_SCALE, round(peak * PEAK_SCALE / 32768)))
+    return peaks
+
+
+def parse_loudness(ffmpeg_log: str) -> Dict[str, Optional[float]]:
+    """ebur128 özetinden entegre yükseklik ve yükseklik aralığını al"""
+    match = _SUMMARY_RE.search(ffmpeg_log)
+    if not match:
+        return {"integrated": None, "range": None}
+    integrated = None if match.group(1) == "-inf" else float(match.group(1))
+    return {"integrated": integrated, "range": float(match.group(2))}
+
+
+def replaygain_db(integrated: Optional[float]) -> Optional[float]:
+    if integrated is None or math.isnan(integrated):
+        return None
+    return round(REPLAYGAIN_REFERENCE_LUFS - integrated, 2)
+
+
+def analyze_track(path: str, ffmpeg: str = "ffmpeg", points: int = PEAK_POINTS) -> Dict[str, Any]:
+    """Dosyayı tek geçişte çöz: süre, tepeler ve ses yüksekliği (bloklayan çağrı)"""
+    command = [
+        ffmpeg, "-nostdin", "-hide_banner", "-nostats", "-loglevel", "info",
+        "-i", path, "-vn",
+        "-af", f"ebur128=framelog=quiet,aresample={PEAK_SAMPLE_RATE},"
+               "aformat=sample_fmts=s16:channel_layouts=mono",
+        "-f", "s16le", "pipe:1",
+    ]
+    try:
+        result = subprocess.run(command, capture_output=True, timeout=ANALYSIS_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise AnalysisError(f"ffmpeg failed for {path}: {e}")
+    log = result.stderr.decode("utf-8", errors="replace")
+    if result.returncode != 0:
+        raise AnalysisError(f"ffmpeg exited with code {result.returncode} for {path}: {log[-500:].strip()}")
+
+    samples = array("h")
+    samples.frombytes(result.stdout[:len(result.stdout) - len(result.stdout) % 2])
+    if sys.byteorder == "big":
+        samples.byteswap()
+    loudness = parse_loudness(log)
+    return {
+        "duration": round(len(samples) / PEAK_SAMPLE_RATE, 3),
+        "integrated_lufs": loudness["integrated"],
+        "loudness_range": loudness["range"],
+        "peaks": compute_peaks(samples, points),
+    }
+
+
+def encode_sidecar(analysis: Dict[str, Any]) -> bytes:
+    def as_float(value: Optional[float]) -> float:
+        return float("nan") if value is None else value
+
+    peaks = analysis["peaks"]
+    header = _HEADER.pack(
+        SIDECAR_MAGIC,
+        SIDECAR_VERSION,
+        len(peaks),
+        analysis["duration"],
+        as_float(analysis["integrated_lufs"]),
+        as_float(analysis["loudness_range"]),
+    )
+    return header + bytes(peaks)
+
+
+def decode_sidecar(data: bytes) -> Dict[str, Any]:
+    if len(data) < _HEADER.size:
+        raise ValueError("sidecar is truncated")
+    magic, version, count, duration, integrated, loudness_range = _HEADER.unpack_from(data)
+    if magic != SIDECAR_MAGIC or version != SIDECAR_VERSION:
+        raise ValueError("unknown sidecar format")
+    peaks = data[_HEADER.size:_HEADER.size + count]
+    if len(peaks) != count:
+        raise ValueError("sidecar is truncated")
+
+    def optional(value: float) -> Optional[float]:
+        return None if math.isnan(value) else round(value, 2)
+
+    return {
+        "duration": round(duration, 3),
+        "integrated_lufs": optional(integrated),
+        "loudness_range": optional(loudness_range),
+        "peaks": list(peaks),
+    }
+
+
+def write_sidecar(path: str, analysis: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(encode_sidecar(analysis))
+    os.replace(temp_path, path)
+
+
+def read_sidecar(path: str) -> Optional[Dict[str, Any]]:
+    """Yan dosyayı oku; yoksa ya da bozuksa None"""
+    try:
+        with open(path, "rb") as f:
+            return decode_sidecar(f.read())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, struct.error) as e:
+        logger.warning(f"Ignoring unreadable analysis sidecar {path}: {e}")
+        return None
+
+
+def analyze_to_sidecar(audio_path: str, analysis_dir: str, ffmpeg: str = "ffmpeg") -> Dict[str, Any]:
+    """Dosyayı analiz edip yan dosyasını yaz (süreç havuzunda çalıştırılır)"""
+    analysis = analyze_track(audio_path, ffmpeg)
+    write_sidecar(sidecar_path(analysis_dir, audio_path), analysis)
+    return analysis
+
+
+def analysis_response(filename: str, analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Analizi API yanıtına çevir"""
+    return {
+        "filename": filename,
+        "duration": analysis["duration"],
+        "loudness": {
+            "integrated_lufs": analysis["integrated_lufs"],
+            "range_lu": analysis["loudness_range"],
+            "replaygain_db": replaygain_db(analysis["integrated_lufs"]),
+            "reference_lufs": REPLAYGAIN_REFERENCE_LUFS,
+        },
+        "peak_scale": PEAK_SCALE,
+        "peaks": analysis["peaks"],
+    }
+
+
+def backfill(uploads_dir: str, analysis_dir: str, workers: int, force: bool = False) -> int:
+    """Yan dosyası olmayan kütüphane dosyalarını analiz et, sahipsiz yan dosyaları sil"""
+    try:
+        entries = sorted(os.scandir(uploads_dir), key=lambda entry: entry.name)
+    except FileNotFoundError:
+        logger.error(f"Uploads directory not found: {uploads_dir}")
+        return 0
+    audio_files = [
+        entry.path for entry in entries
+        if entry.is_file() and entry.name.lower().endswith(AUDIO_EXTENSIONS)
+    ]
+
+    if os.path.isdir(analysis_dir):
+        names = {os.path.basename(path) for path in audio_files}
+        for entry in os.scandir(analysis_dir):
+            if entry.name.endswith(SIDECAR_EXTENSION) and entry.name[:-len(SIDECAR_EXTENSION)] not in names:
+                os.remove(entry.path)
+
+    pending = [
+        path for path in audio_files
+        if force or not os.path.exists(sidecar_path(analysis_dir, path))
+    ]
+    logger.info(f"Analyzing {len(pending)} of {len(audio_files)} library file(s) with {workers} worker(s)")
+    ffmpeg = resolve_ffmpeg()
+    analyzed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(analyze_to_sidecar, path, analysis_dir, ffmpeg): path for path in pending}
+        for future in as_completed(futures):
+            try:
+                future.result()
+                analyzed += 1
+            except AnalysisError as e:
+                logger.warning(str(e))
+            if analyzed and analyzed % 50 == 0:
+                logger.info(f"Analyzed {analyzed}/{len(pending)}")
+    logger.info(f"Backfill finished: {analyzed}/{len(pending)} file(s) analyzed")
+    return analyzed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Backfill waveform/loudness analysis for the music library")
+    parser.add_argument("--uploads", default=os.getenv("UPLOADS_DIR", "../uploads"))
+    parser.add_argument("--analysis-dir", default=os.getenv("ANALYSIS_DIR", "../data/analysis"))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--force", action="store_true", help="re-analyze files that already have a sidecar")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    backfill(args.uploads, args.analysis_dir, max(1, args.workers), args.force)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
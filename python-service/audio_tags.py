@@ -0,0 +1,129 @@
+"""
+İndirilen dosyalardan metadata okuma
+
+spotdl kodlama sonrası ID3 etiketlerini (başlık, sanatçı, albüm, tür, yıl,
+ISRC, Spotify URL'si) zaten yazıyor. Backend'e gönderilen kayıtlar dosya
+adından tahmin edilmek yerine bu etiketlerden ve dosyanın gerçek
+süresi/bitrate'inden oluşturulur; böylece istemciler süreyi göstermek için
+sesi çözmek zorunda kalmaz ve " - " içeren başlıklar bozulmaz.
+
+Okuma bloklayan bir çağrıdır; ana süreçte bir işçi havuzunda çalıştırılır.
+"""
+
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from mutagen import File as MutagenFile
+from mutagen import MutagenError
+from mutagen.id3 import ID3
+
+logger = logging.getLogger(__name__)
+
+# ID3 çerçevesi -> kayıt alanı
+_ID3_TEXT_FRAMES = {
+    "TIT2": "title",
+    "TPE1": "artist",
+    "TALB": "album",
+    "TCON": "genre",
+    "TDRC": "date",
+    "TSRC": "isrc",
+}
+# Diğer formatlar için mutagen'in "easy" anahtarları
+_EASY_KEYS = ("title", "artist", "album", "genre", "date", "isrc")
+_YEAR_RE = re.compile(r"\d{4}")
+_SPOTIFY_TRACK_RE = re.compile(r"open\.spotify\.com/track/([A-Za-z0-9]+)")
+
+
+def _first(value: Any) -> Optional[str]:
+    if isinstance(value, (list, tuple)):
+        value = value[0] if value else None
+    if value is None:
+        return None
+    text = str(value).strip()
+    return text or None
+
+
+def _join(value: Any) -> Optional[str]:
+    """Çok değerli alanı (spotdl sanatçıları ayrı değerler olarak yazar) birleştir"""
+    if not isinstance(value, (list, tuple)):
+        return _first(value)
+    parts = [str(item).strip() for item in value if str(item).strip()]
+    return ", ".join(parts) or None
+
+
+def _parse_year(value: Optional[str]) -> Optional[int]:
+    match = _YEAR_RE.search(value or "")
+    return int(match.group()) if match else None
+
+
+def read_audio_metadata(path: str) -> Dict[str, Any]:
+    """Dosyanın etiketlerini ve ses bilgilerini oku (bloklayan çağrı)
+
+    Okunamayan alanlar None döner; dosya hiç açılamazsa tüm alanlar None olur.
+    """
+    metadata: Dict[str, Any] = {
+        "title": None,
+        "artist": None,
+        "album": None,
+        "genre": None,
+        "year": None,
+        "isrc": None,
+        "spotify_id": None,
+        "duration": None,
+        "bitrate": None,
+        "sample_rate": None,
+        "has_cover": False,
+    }
+    try:
+        audio = MutagenFile(path)
+    except (MutagenError, OSError) as e:
+        logger.warning(f"Could not read tags from {path}: {e}")
+        return metadata
+    if audio is None:
+        return metadata
+
+    info = getattr(audio, "info", None)
+    if info is not None:
+        length = getattr(info, "length", None)
+        metadata["duration"] = round(length, 3) if length else None
+        metadata["bitrate"] = getattr(info, "bitrate", None) or None
+        metadata["sample_rate"] = getattr(info, "sample_rate", None) or None
+
+    text: Dict[str, Optional[str]] = {}
+    tags = audio.tags
+    if isinstance(tags, ID3):
+        for frame, field in _ID3_TEXT_FRAMES.items():
+            if frame in tags:
+                values = tags[frame].text
+                text[field] = _join(values) if field == "artist" else _first(values)
+        metadata["has_cover"] = bool(tags.getall("APIC"))
+        # spotdl şarkının Spotify URL'sini WOAS çerçevesine yazar
+        for frame in tags.getall("WOAS"):
+            match = _SPOTIFY_TRACK_RE.search(frame.url or "")
+            if match:
+                metadata["spotify_id"] = match.group(1)
+                break
+    elif tags is not None:
+        # FLAC resimleri dosyada, MP4 kapağı "covr" etiketinde
+        metadata["has_cover"] = bool(getattr(audio, "pictures", None)) or "covr" in tags.keys()
+        try:
+            easy = MutagenFile(path, easy=True)
+        except (MutagenError, OSError):
+            easy = None
+        if easy is not None and easy.tags is not None:
+            for key in _EASY_KEYS:
+                if key in easy.tags:
+                    values = easy.tags[key]
+                    text[key] = _join(values) if key == "artist" else _first(values)
+
+    for field in ("title", "artist", "album", "genre", "isrc"):
+        metadata[field] = text.get(field)
+    metadata["year"] = _parse_year(text.get("date"))
+    return metadata
+
+
+def read_many(paths: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Birden çok dosyayı tek havuz görevinde oku: {yol: metadata}"""
+    return {path: read_audio_metadata(path) for path in paths if os.path.exists(path)}
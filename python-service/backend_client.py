@@ -0,0 +1,194 @@
+"""
+Erotify (Node) backend istemcisi
+
+İndirilen şarkılar tek tek değil, kısa bir bekleme penceresinde
+biriktirilip toplu olarak `add-downloaded-batch` ucuna gönderilir.
+Böylece backend songs.json'u şarkı başına değil, grup başına bir kez
+yeniden yazar. İstekler tek bir havuzlanmış oturumdan gider; backend
+meşgul ya da erişilemezken artan beklemeyle tekrar denenir. Aynı kuyruk
+yayın kopyalarının (`renditions-batch`) kaydı için de kullanılır.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from metrics import BACKEND_REQUEST_SECONDS, BACKEND_SONGS
+
+logger = logging.getLogger(__name__)
+
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:3001")
+
+REQUEST_TIMEOUT = 30
+# Bu durum kodlarında backend geçici olarak meşgul sayılır
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+class LibraryRegistrar:
+    """Yeni şarkıları toplayıp backend'e gruplar halinde kaydeden kuyruk"""
+
+    def __init__(
+        self,
+        base_url: str = BACKEND_URL,
+        batch_size: int = 50,
+        linger_seconds: float = 0.5,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 10.0,
+        endpoint: str = "add-downloaded-batch",
+        item_name: str = "song",
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.endpoint = endpoint
+        # Loglarda ve metriklerde kaydedilenlerin adı; şarkı sayacı sadece şarkılar için artar
+        self.item_name = item_name
+        self.batch_size = batch_size
+        self.linger_seconds = linger_seconds
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def pending(self) -> int:
+        """Henüz gönderilmemiş şarkı sayısı"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def register(self, song: Dict[str, Any]) -> bool:
+        """Şarkıyı sıradaki gruba ekle; backend kaydettiğinde True döner"""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((song, future))
+        return await future
+
+    async def register_many(self, songs: List[Dict[str, Any]]) -> List[bool]:
+        return list(await asyncio.gather(*(self.register(song) for song in songs)))
+
+    async def _session_or_create(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=4),
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+            )
+        return self._session
+
+    async def _next_batch(self) -> List[Tuple[Dict[str, Any], asyncio.Future]]:
+        """İlk öğeyi bekle, sonra pencere dolana ya da grup büyüyene kadar topla"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.linger_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        # Tek gönderici: backend yazımları zaten sıralı, paralel grup göndermenin faydası yok
+        while True:
+            batch = await self._next_batch()
+            try:
+                results = await self._send([song for song, _ in batch])
+            except asyncio.CancelledError:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(False)
+                raise
+            except Exception as e:
+                logger.error(f"Failed to register {len(batch)} {self.item_name}(s) with backend: {e}")
+                results = [False] * len(batch)
+            for (_, future), ok in zip(batch, results):
+                if not future.done():
+                    future.set_result(ok)
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        delay = min(self.backoff_base * (2 ** attempt), self.backoff_max)
+        # Aynı anda yeniden deneyen istemciler senkronize olmasın
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _send(self, songs: List[Dict[str, Any]]) -> List[bool]:
+        """Grubu gönder; geçici hatalarda artan beklemeyle tekrar dene"""
+        results = await self._send_with_retries(songs)
+        if self.item_name != "song":
+            return results
+        registered = sum(results)
+        if registered:
+            BACKEND_SONGS.inc(registered, result="registered")
+        if registered < len(songs):
+            BACKEND_SONGS.inc(len(songs) - registered, result="failed")
+        return results
+
+    async def _send_with_retries(self, songs: List[Dict[str, Any]]) -> List[bool]:
+        session = await self._session_or_create()
+        url = f"{self.base_url}/api/music/{self.endpoint}"
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            started = time.perf_counter()
+            try:
+                async with session.post(url, json={"songs": songs}) as response:
+                    BACKEND_REQUEST_SECONDS.observe(time.perf_counter() - started, outcome=str(response.status))
+                    if response.status == 200:
+                        data = await response.json()
+                        results = data.get("results") or []
+                        for song, result in zip(songs, results):
+                            if not result.get("success"):
+                                logger.warning(f"Backend rejected {song.get('filename')}: {result.get('error')}")
+                        ok = [bool(result.get("success")) for result in results]
+                        logger.info(f"Registered {sum(ok)}/{len(songs)} {self.item_name}(s) with backend")
+                        return ok + [False] * (len(songs) - len(ok))
+                    if response.status not in RETRY_STATUSES:
+                        logger.error(f"Backend batch add failed: {response.status} - {await response.text()}")
+                        return [False] * len(songs)
+                    retry_after = response.headers.get("Retry-After")
+                    reason = f"status {response.status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                BACKEND_REQUEST_SECONDS.observe(time.perf_counter() - started, outcome="error")
+                reason = str(e) or type(e).__name__
+
+            if attempt == self.max_retries:
+                break
+            delay = self._retry_delay(attempt, retry_after)
+            logger.warning(f"Backend busy or unreachable ({reason}), retrying batch in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+        logger.error(f"Giving up on registering {len(songs)} {self.item_name}(s) after {self.max_retries} retries")
+        return [False] * len(songs)
+
+    async def close(self) -> None:
+        """Kuyruktakileri gönder, göndericiyi durdur ve oturumu kapat"""
+        if self._queue is not None:
+            pending = []
+            while not self._queue.empty():
+                pending.append(self._queue.get_nowait())
+            if pending:
+                results = await self._send([song for song, _ in pending])
+                for (_, future), ok in zip(pending, results):
+                    if not future.done():
+                        future.set_result(ok)
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
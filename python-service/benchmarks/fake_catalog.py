@@ -0,0 +1,121 @@
+"""
+Benchmark'lar için sahte Spotify kataloğu
+
+Sahte spotdl, Spotify stub'ı ve sunucu başlatıcısı aynı ID'den aynı şarkıyı
+üretsin diye tüm veriler ID'den deterministik olarak türetilir. Playlist
+ID'leri boyutlarını taşır: "bench<N>n<nonce>" N şarkılık bir playlisttir.
+"""
+
+import hashlib
+import re
+from typing import Any, Dict, List, Optional
+
+_BASE62 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+_PLAYLIST_RE = re.compile(r"bench(\d+)n[A-Za-z0-9]+")
+_TRACK_URL_RE = re.compile(r"track/([A-Za-z0-9]{22})")
+_PLAYLIST_URL_RE = re.compile(r"playlist/([A-Za-z0-9]+)")
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz çerçevesi (417 byte, ~26 ms)
+_MP3_FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+MP3_FRAME_SECONDS = 1152 / 44100
+
+
+def make_id(seed: str) -> str:
+    """Tohumdan 22 karakterlik Spotify benzeri ID"""
+    number = int.from_bytes(hashlib.sha1(seed.encode("utf-8")).digest(), "big")
+    chars = []
+    for _ in range(22):
+        number, index = divmod(number, 62)
+        chars.append(_BASE62[index])
+    return "".join(chars)
+
+
+def playlist_id(size: int, nonce: str) -> str:
+    return f"bench{size}n{nonce}"
+
+
+def playlist_track_ids(list_id: str) -> List[str]:
+    match = _PLAYLIST_RE.fullmatch(list_id)
+    size = int(match.group(1)) if match else 10
+    return [make_id(f"{list_id}:{i}") for i in range(size)]
+
+
+def track_ids_for_url(url: str) -> List[str]:
+    """spotdl'e verilen URL'nin şarkı ID'leri (şarkı veya playlist)"""
+    track = _TRACK_URL_RE.search(url)
+    if track:
+        return [track.group(1)]
+    playlist = _PLAYLIST_URL_RE.search(url)
+    if playlist:
+        return playlist_track_ids(playlist.group(1))
+    return [make_id(url)]
+
+
+def track(track_id: str) -> Dict[str, Any]:
+    """Spotify Web API biçiminde şarkı nesnesi"""
+    number = int(hashlib.sha1(track_id.encode("utf-8")).hexdigest()[:8], 16)
+    artist_name = f"Bench Artist {number % 97}"
+    album_id = make_id(f"album:{number % 211}")
+    return {
+        "id": track_id,
+        "name": f"Bench Track {track_id[:8]}",
+        "artists": [{"id": make_id(artist_name), "name": artist_name}],
+        "album": {
+            "id": album_id,
+            "name": f"Bench Album {number % 211}",
+            "release_date": f"{2000 + number % 25}-01-01",
+            "total_tracks": 12,
+            "images": [],
+        },
+        "duration_ms": 150000 + number % 120000,
+        "explicit": False,
+        "popularity": number % 100,
+        "disc_number": 1,
+        "track_number": 1 + number % 12,
+        "external_ids": {"isrc": f"BENCH{number % 10 ** 7:07d}"},
+        "external_urls": {"spotify": f"https://open.spotify.com/track/{track_id}"},
+    }
+
+
+def search(query: str, limit: int = 10) -> List[Dict[str, Any]]:
+    return [track(make_id(f"search:{query}:{i}")) for i in range(limit)]
+
+
+def display_name(data: Dict[str, Any]) -> str:
+    """spotdl'in "Sanatçı - Başlık" adı"""
+    return f"{data['artists'][0]['name']} - {data['name']}"
+
+
+def song_dict(data: Dict[str, Any], list_url: Optional[str] = None) -> Dict[str, Any]:
+    """spotdl Song.from_dict'e verilebilecek şarkı verisi"""
+    album = data["album"]
+    return {
+        "name": data["name"],
+        "artists": [artist["name"] for artist in data["artists"]],
+        "artist": data["artists"][0]["name"],
+        "genres": [],
+        "disc_number": data["disc_number"],
+        "disc_count": 1,
+        "album_name": album["name"],
+        "album_artist": data["artists"][0]["name"],
+        "duration": data["duration_ms"] // 1000,
+        "year": int(album["release_date"][:4]),
+        "date": album["release_date"],
+        "track_number": data["track_number"],
+        "tracks_count": album["total_tracks"],
+        "song_id": data["id"],
+        "explicit": data["explicit"],
+        "publisher": "Bench Records",
+        "url": data["external_urls"]["spotify"],
+        "isrc": data["external_ids"]["isrc"],
+        "cover_url": None,
+        "copyright_text": None,
+        "popularity": data["popularity"],
+        "album_id": album["id"],
+        "list_url": list_url,
+    }
+
+
+def mp3_bytes(size: int) -> bytes:
+    """Yaklaşık size byte'lık, mutagen/ffmpeg'in okuyabileceği sessiz MP3"""
+    return _MP3_FRAME * max(1, size // len(_MP3_FRAME))
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Sahte ffmpeg
+
+- Kodlama (`-i <kaynak> ... <çıktı>`): BENCH_ENCODE_LATENCY kadar bekleyip
+  kaynağı çıktıya kopyalar.
+- Analiz (`... -f s16le pipe:1`): dosya boyutundan süre hesaplayıp sessiz
+  PCM ve ebur128 özetini yazar.
+"""
+
+import os
+import shutil
+import sys
+import time
+
+ENCODE_LATENCY = float(os.getenv("BENCH_ENCODE_LATENCY", "0.1"))
+# fake_catalog.MP3_FRAME_SECONDS / 417 byte
+SECONDS_PER_BYTE = (1152 / 44100) / 417
+ANALYSIS_SAMPLE_RATE = 8000
+
+
+def main(argv) -> int:
+    source = argv[argv.index("-i") + 1]
+    if not os.path.exists(source):
+        sys.stderr.write(f"{source}: No such file or directory\n")
+        return 1
+
+    if argv[-1] == "pipe:1":
+        seconds = os.path.getsize(source) * SECONDS_PER_BYTE
+        sys.stdout.buffer.write(b"\x00\x00" * int(seconds * ANALYSIS_SAMPLE_RATE))
+        sys.stderr.write(
+            "[Parsed_ebur128_0] Summary:\n\n"
+            "  Integrated loudness:\n    I:         -14.0 LUFS\n    Threshold: -24.0 LUFS\n\n"
+            "  Loudness range:\n    LRA:         6.0 LU\n"
+        )
+        return 0
+
+    time.sleep(ENCODE_LATENCY)
+    shutil.copyfile(source, argv[-1])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
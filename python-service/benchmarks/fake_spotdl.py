@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Sahte spotdl
+
+İki modda çalışır:
+- `fake_spotdl.py download <url> --output <klasör> ...`: spotdl CLI'ının
+  --simple-tui çıktısını taklit eder ve etiketli MP3'ler yazar (SPOTDL_BIN).
+- Argümansız: spotdl_worker.py'nin JSON satır protokolünü konuşan sıcak
+  işçi (SPOTDL_WORKER_SCRIPT). "pipeline" işlerinde ham dosyayı bildirir,
+  kodlama sahte ffmpeg ile servis tarafında yapılır.
+
+Ayarlar (ortam değişkenleri):
+    BENCH_TRACK_LATENCY   şarkı başına ağ süresi, saniye (0.5)
+    BENCH_RESOLVE_SHARE   bu sürenin çözümleme/eşleştirmeye düşen payı (0.3)
+    BENCH_FILE_SIZE       üretilen dosya boyutu, byte (262144)
+    BENCH_FAILURE_RATE    şarkı başına hata olasılığı (0.0)
+    BENCH_THROTTLE_RATE   şarkı başına YouTube 429 hatası olasılığı (0.0)
+    BENCH_STARTUP_DELAY   CLI/işçi açılış süresi, saniye (1.5)
+"""
+
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_catalog  # noqa: E402
+
+TRACK_LATENCY = float(os.getenv("BENCH_TRACK_LATENCY", "0.5"))
+RESOLVE_SHARE = float(os.getenv("BENCH_RESOLVE_SHARE", "0.3"))
+FILE_SIZE = int(os.getenv("BENCH_FILE_SIZE", str(256 * 1024)))
+FAILURE_RATE = float(os.getenv("BENCH_FAILURE_RATE", "0.0"))
+THROTTLE_RATE = float(os.getenv("BENCH_THROTTLE_RATE", "0.0"))
+STARTUP_DELAY = float(os.getenv("BENCH_STARTUP_DELAY", "1.5"))
+FAKE_FFMPEG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_ffmpeg.py")
+RAW_DIRNAME = ".raw"
+
+
+def _sleep(seconds: float) -> None:
+    # Gerçek ağ gecikmesi gibi ±%20 oynasın
+    time.sleep(max(0.0, seconds * random.uniform(0.8, 1.2)))
+
+
+def _tag(path: str, song: dict) -> None:
+    from mutagen.id3 import ID3, TALB, TIT2, TPE1, TSRC, WOAS
+
+    tags = ID3()
+    tags.add(TIT2(encoding=3, text=song["name"]))
+    tags.add(TPE1(encoding=3, text=song["artists"]))
+    tags.add(TALB(encoding=3, text=song["album_name"]))
+    tags.add(TSRC(encoding=3, text=song["isrc"]))
+    tags.add(WOAS(encoding=3, url=song["url"]))
+    tags.save(path)
+
+
+def run_tracks(url: str, output: str, emit_line, on_track) -> int:
+    """URL'nin şarkılarını sahte ağ gecikmesiyle işle; başarılı şarkı sayısı"""
+    track_ids = fake_catalog.track_ids_for_url(url)
+    emit_line(f"Found {len(track_ids)} songs in {url}")
+    succeeded = 0
+    for index, track_id in enumerate(track_ids, 1):
+        data = fake_catalog.track(track_id)
+        name = fake_catalog.display_name(data)
+        emit_line(f"{name}: Searching for song")
+        _sleep(TRACK_LATENCY * RESOLVE_SHARE)
+        emit_line(f"{name}: Downloading")
+        _sleep(TRACK_LATENCY * (1 - RESOLVE_SHARE))
+        if random.random() < THROTTLE_RATE:
+            emit_line(f"{name}: Error")
+            emit_line("DownloadError: ERROR: unable to download video data: HTTP Error 429: Too Many Requests")
+        elif random.random() < FAILURE_RATE:
+            emit_line(f"{name}: Error")
+            emit_line("LookupError: No results found for song (benchmark failure)")
+        else:
+            on_track(name, data)
+            succeeded += 1
+        emit_line(f"{index}/{len(track_ids)} complete")
+    return succeeded
+
+
+def run_cli(argv) -> int:
+    url = argv[1]
+    output = argv[argv.index("--output") + 1] if "--output" in argv else "."
+    _sleep(STARTUP_DELAY)
+    print(f"Processing query: {url}", flush=True)
+
+    def write_track(name, data):
+        os.makedirs(output, exist_ok=True)
+        path = os.path.join(output, f"{name}.mp3")
+        with open(path, "wb") as f:
+            f.write(fake_catalog.mp3_bytes(FILE_SIZE))
+        _tag(path, fake_catalog.song_dict(data))
+        print(f"{name}: Done", flush=True)
+
+    run_tracks(url, output, lambda line: print(line, flush=True), write_track)
+    return 0
+
+
+def run_worker() -> int:
+    protocol = sys.stdout
+    lock = threading.Lock()
+
+    def emit(event):
+        with lock:
+            protocol.write(json.dumps(event) + "\n")
+            protocol.flush()
+
+    json.loads(sys.stdin.readline() or "{}")
+    _sleep(STARTUP_DELAY)
+    emit({"event": "ready"})
+
+    for raw in sys.stdin:
+        if not raw.strip():
+            continue
+        job = json.loads(raw)
+        output = job["output"]
+
+        def emit_line(line):
+            emit({"event": "line", "line": line})
+
+        if job.get("pipeline"):
+            def fetched(name, data):
+                raw_dir = os.path.join(output, RAW_DIRNAME)
+                os.makedirs(raw_dir, exist_ok=True)
+                source = os.path.join(raw_dir, f"{data['id']}.webm")
+                with open(source, "wb") as f:
+                    f.write(fake_catalog.mp3_bytes(FILE_SIZE))
+                emit({
+                    "event": "fetched",
+                    "name": name,
+                    "song": fake_catalog.song_dict(data, list_url=job["url"]),
+                    "source": source,
+                    "output": os.path.join(output, f"{name}.mp3"),
+                    "ffmpeg": FAKE_FFMPEG,
+                })
+
+            run_tracks(job["url"], output, emit_line, fetched)
+            emit({"event": "done"})
+        else:
+            def write_track(name, data):
+                os.makedirs(output, exist_ok=True)
+                path = os.path.join(output, f"{name}.mp3")
+                with open(path, "wb") as f:
+                    f.write(fake_catalog.mp3_bytes(FILE_SIZE))
+                _tag(path, fake_catalog.song_dict(data))
+                emit_line(f"{name}: Done")
+
+            files = run_tracks(job["url"], output, emit_line, write_track)
+            emit({"event": "done", "files": files})
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "download":
+        sys.exit(run_cli(sys.argv[1:]))
+    sys.exit(run_worker())
@@ -0,0 +1,430 @@
+"""
+İndirme servisi benchmark'ı
+
+Servisi (benchmarks/serve.py) ayrı bir süreçte sahte spotdl, sahte ffmpeg,
+Spotify stub'ı ve backend stub'ıyla başlatır; ağa ya da çalışan bir Node
+sunucusuna ihtiyaç duymaz. Senaryolar:
+
+- search:    tekrarlı sorgularla /search gecikmesi (önbellek isabetleri dahil)
+- singles:   tek seferde gelen N tekil şarkı; iş/sn ve durum sorgusu gecikmesi
+- playlists: M adet K şarkılık playlist (alt işlere bölünür); şarkı/sn
+- pollers:   singles ile aynı yük altında P istemcinin sürekli durum sorgulaması
+
+Her senaryo için sunucunun (alt süreçleriyle birlikte) bellek kullanımı ve
+/metrics'ten alınan ortalama aşama süreleri raporlanır.
+
+    cd python-service
+    python benchmarks/run.py --engine pool --singles 100 --json results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICE_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import fake_catalog  # noqa: E402
+import stubs  # noqa: E402
+
+SCENARIOS = ("search", "singles", "playlists", "pollers")
+FINAL_STATUSES = ("completed", "failed", "cancelled")
+SERVER_START_TIMEOUT = 60.0
+_PHASE_RE = re.compile(r'^erotify_download_phase_seconds_(sum|count)\{phase="([^"]+)"\} (\S+)$')
+
+
+def percentile(samples: List[float], pct: float) -> Optional[float]:
+    """En yakın sıra yöntemiyle yüzdelik (ms)"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return round(ordered[index] * 1000, 1)
+
+
+def latency_summary(samples: List[float]) -> Dict[str, Any]:
+    return {"count": len(samples), "p50_ms": percentile(samples, 50), "p99_ms": percentile(samples, 99)}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def process_tree_rss(pid: int) -> Optional[int]:
+    """Sürecin ve alt süreçlerinin toplam RSS'i (byte, sadece Linux)"""
+    total = 0
+    pending = [pid]
+    seen = set()
+    while pending:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pending.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            if current == pid:
+                return None
+    return total
+
+
+class ServiceUnderTest:
+    """serve.py sürecini ve ona HTTP istemcisini yönetir"""
+
+    def __init__(self, args: argparse.Namespace, spotify_url: str, backend_url: str, workdir: str):
+        self.args = args
+        self.port = free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.workdir = workdir
+        self.env = {
+            **os.environ,
+            "PYTHONUNBUFFERED": "1",
+            "SPOTIFY_CLIENT_ID": "bench",
+            "SPOTIFY_CLIENT_SECRET": "bench",
+            "SPOTIFY_API_URL": spotify_url,
+            "SPOTIFY_ACCOUNTS_URL": spotify_url,
+            "BACKEND_URL": backend_url,
+            "UPLOADS_DIR": os.path.join(workdir, "uploads"),
+            "JOB_STORE_PATH": os.path.join(workdir, "downloads.db"),
+            "METADATA_CACHE_PATH": os.path.join(workdir, "metadata_cache.db"),
+            "LIBRARY_INDEX_PATH": os.path.join(workdir, "library_index.db"),
+            "ANALYSIS_DIR": os.path.join(workdir, "analysis"),
+            "COVER_CACHE_DIR": os.path.join(workdir, "covers"),
+            "RENDITIONS_DIR": os.path.join(workdir, "renditions"),
+            # Geliştiricinin ortamındaki RENDITION_BACKFILL=true kopya taramasını başlatmasın
+            "RENDITION_BACKFILL": "false",
+            "FFMPEG_PATH": os.path.join(BENCH_DIR, "fake_ffmpeg.py"),
+            "SPOTDL_BIN": os.path.join(BENCH_DIR, "fake_spotdl.py"),
+            "SPOTDL_WORKER_SCRIPT": os.path.join(BENCH_DIR, "fake_spotdl.py"),
+            "DOWNLOAD_ENGINE": args.engine,
+            "MAX_CONCURRENT_DOWNLOADS": str(args.max_concurrent),
+            "DOWNLOAD_WORKERS": str(args.max_concurrent),
+            "BENCH_TRACK_LATENCY": str(args.track_latency),
+            "BENCH_FILE_SIZE": str(args.file_size),
+            "BENCH_FAILURE_RATE": str(args.failure_rate),
+            "BENCH_THROTTLE_RATE": str(args.throttle_rate),
+            "BENCH_STARTUP_DELAY": str(args.startup_delay),
+        }
+        self.process: Optional[subprocess.Popen] = None
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self) -> None:
+        log = open(os.path.join(self.workdir, "service.log"), "wb")
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.join(BENCH_DIR, "serve.py"), "--port", str(self.port)],
+            cwd=SERVICE_DIR,
+            env=self.env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=0),
+            timeout=aiohttp.ClientTimeout(total=60),
+        )
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"service exited with code {self.process.returncode}, see service.log")
+            try:
+                async with self.session.get(f"{self.base_url}/health") as response:
+                    # Arama istemcisi arka planda kurulur; hazır olmadan ölçüme başlanmaz
+                    ready = response.status == 200 and (await response.json()).get("spotdl_initialized")
+                    if ready and await self._workers_ready():
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+        raise RuntimeError("service did not become ready in time")
+
+    async def _workers_ready(self) -> bool:
+        if self.args.engine != "pool":
+            return True
+        metrics = await self.metrics_text()
+        match = re.search(r"^erotify_warm_workers (\S+)$", metrics, re.MULTILINE)
+        return bool(match) and float(match.group(1)) >= self.args.max_concurrent
+
+    async def metrics_text(self) -> str:
+        async with self.session.get(f"{self.base_url}/metrics") as response:
+            return await response.text()
+
+    async def phase_totals(self) -> Dict[str, List[float]]:
+        totals: Dict[str, List[float]] = {}
+        for line in (await self.metrics_text()).splitlines():
+            match = _PHASE_RE.match(line)
+            if match:
+                kind, phase, value = match.groups()
+                totals.setdefault(phase, [0.0, 0.0])[0 if kind == "sum" else 1] = float(value)
+        return totals
+
+    def rss(self) -> Optional[int]:
+        return process_tree_rss(self.process.pid) if self.process else None
+
+    async def timed(self, method: str, path: str, samples: Optional[List[float]] = None, **kwargs) -> Any:
+        started = time.perf_counter()
+        async with self.session.request(method, f"{self.base_url}{path}", **kwargs) as response:
+            data = await response.json()
+        if samples is not None:
+            samples.append(time.perf_counter() - started)
+        return data
+
+    async def stop(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+
+def track_url() -> str:
+    return f"https://open.spotify.com/track/{fake_catalog.make_id(uuid.uuid4().hex)}"
+
+
+async def submit_all(service: ServiceUnderTest, urls: List[str], samples: List[float]) -> List[str]:
+    responses = await asyncio.gather(*(
+        service.timed("POST", "/download", samples, json={"url": url}) for url in urls
+    ))
+    return [response["download_id"] for response in responses]
+
+
+async def wait_for_jobs(
+    service: ServiceUnderTest, job_ids: List[str], samples: List[float], interval: float, timeout: float
+) -> Dict[str, Dict[str, Any]]:
+    """İşler bitene kadar durumlarını sorgula (her sorgu gecikmesi örneklenir)"""
+    outstanding = set(job_ids)
+    finished: Dict[str, Dict[str, Any]] = {}
+    deadline = time.monotonic() + timeout
+    while outstanding and time.monotonic() < deadline:
+        statuses = await asyncio.gather(*(
+            service.timed("GET", f"/download/{job_id}/status", samples) for job_id in outstanding
+        ))
+        for status in statuses:
+            if status.get("status") in FINAL_STATUSES:
+                finished[status["id"]] = status
+                outstanding.discard(status["id"])
+        if outstanding:
+            await asyncio.sleep(interval)
+    return finished
+
+
+def job_counts(finished: Dict[str, Dict[str, Any]], expected: int) -> Dict[str, int]:
+    completed = sum(1 for status in finished.values() if status["status"] == "completed")
+    return {"jobs": expected, "completed": completed, "failed": len(finished) - completed,
+            "unfinished": expected - len(finished)}
+
+
+async def scenario_search(service: ServiceUnderTest, args: argparse.Namespace) -> Dict[str, Any]:
+    queries = [f"bench query {i}" for i in range(max(1, args.searches // 4))]
+    samples: List[float] = []
+    semaphore = asyncio.Semaphore(args.search_concurrency)
+    before = await service.timed("GET", "/search/cache/stats")
+
+    async def one() -> None:
+        async with semaphore:
+            await service.timed("POST", "/search", samples, json={"query": random.choice(queries)})
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(args.searches)))
+    elapsed = time.perf_counter() - started
+    after = await service.timed("GET", "/search/cache/stats")
+    hits = (after["hits"] + after["coalesced"]) - (before["hits"] + before["coalesced"])
+    return {
+        "requests": args.searches,
+        "requests_per_sec": round(args.searches / elapsed, 1),
+        "latency": latency_summary(samples),
+        "cache_hit_rate": round(hits / args.searches, 3),
+    }
+
+
+async def scenario_singles(service: ServiceUnderTest, args: argparse.Namespace) -> Dict[str, Any]:
+    submit_samples: List[float] = []
+    status_samples: List[float] = []
+    started = time.perf_counter()
+    job_ids = await submit_all(service, [track_url() for _ in range(args.singles)], submit_samples)
+    finished = await wait_for_jobs(service, job_ids, status_samples, args.poll_interval, args.timeout)
+    elapsed = time.perf_counter() - started
+    counts = job_counts(finished, len(job_ids))
+    return {
+        **counts,
+        "wall_seconds": round(elapsed, 2),
+        "jobs_per_sec": round(counts["completed"] / elapsed, 2),
+        "submit_latency": latency_summary(submit_samples),
+        "status_latency": latency_summary(status_samples),
+    }
+
+
+async def scenario_playlists(service: ServiceUnderTest, args: argparse.Namespace) -> Dict[str, Any]:
+    urls = [
+        f"https://open.spotify.com/playlist/{fake_catalog.playlist_id(args.playlist_size, uuid.uuid4().hex[:8])}"
+        for _ in range(args.playlists)
+    ]
+    submit_samples: List[float] = []
+    status_samples: List[float] = []
+    started = time.perf_counter()
+    job_ids = await submit_all(service, urls, submit_samples)
+    finished = await wait_for_jobs(service, job_ids, status_samples, args.poll_interval, args.timeout)
+    elapsed = time.perf_counter() - started
+    tracks = sum(status.get("completed_tracks", 0) for status in finished.values())
+    return {
+        **job_counts(finished, len(job_ids)),
+        "tracks": args.playlists * args.playlist_size,
+        "tracks_completed": tracks,
+        "wall_seconds": round(elapsed, 2),
+        "tracks_per_sec": round(tracks / elapsed, 2),
+        "status_latency": latency_summary(status_samples),
+    }
+
+
+async def scenario_pollers(service: ServiceUnderTest, args: argparse.Namespace) -> Dict[str, Any]:
+    submit_samples: List[float] = []
+    status_samples: List[float] = []
+    poll_samples: List[float] = []
+    list_samples: List[float] = []
+    started = time.perf_counter()
+    job_ids = await submit_all(service, [track_url() for _ in range(args.singles)], submit_samples)
+    done = asyncio.Event()
+
+    async def poller() -> None:
+        while not done.is_set():
+            await service.timed("GET", f"/download/{random.choice(job_ids)}/status", poll_samples)
+            await service.timed("GET", "/downloads", list_samples, params={"limit": "50"})
+            await asyncio.sleep(args.poller_interval)
+
+    pollers = [asyncio.create_task(poller()) for _ in range(args.pollers)]
+    try:
+        finished = await wait_for_jobs(service, job_ids, status_samples, args.poll_interval, args.timeout)
+    finally:
+        done.set()
+        await asyncio.gather(*pollers, return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    counts = job_counts(finished, len(job_ids))
+    return {
+        **counts,
+        "pollers": args.pollers,
+        "wall_seconds": round(elapsed, 2),
+        "jobs_per_sec": round(counts["completed"] / elapsed, 2),
+        "status_latency": latency_summary(poll_samples + status_samples),
+        "list_latency": latency_summary(list_samples),
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="erotify-bench-")
+    spotify_runner, spotify_url = await stubs.start(stubs.spotify_app(args.stub_latency, args.throttle_rate))
+    backend = stubs.backend_app(args.stub_latency)
+    backend_runner, backend_url = await stubs.start(backend)
+    service = ServiceUnderTest(args, spotify_url, backend_url, workdir)
+    results: Dict[str, Any] = {
+        "config": {key: value for key, value in vars(args).items() if key != "json"},
+        "scenarios": {},
+    }
+    try:
+        await service.start()
+        results["baseline_rss_mb"] = _mb(service.rss())
+        runners = {
+            "search": scenario_search,
+            "singles": scenario_singles,
+            "playlists": scenario_playlists,
+            "pollers": scenario_pollers,
+        }
+        for name in args.scenarios:
+            rss_before = service.rss()
+            phases_before = await service.phase_totals()
+            print(f"Running {name}...", flush=True)
+            result = await runners[name](service, args)
+            phases_after = await service.phase_totals()
+            result["phase_avg_seconds"] = {
+                phase: round((total - phases_before.get(phase, [0, 0])[0]) / (count - phases_before.get(phase, [0, 0])[1]), 3)
+                for phase, (total, count) in phases_after.items()
+                if count > phases_before.get(phase, [0, 0])[1]
+            }
+            rss_after = service.rss()
+            result["rss_mb"] = {"before": _mb(rss_before), "after": _mb(rss_after),
+                                "growth": _mb((rss_after or 0) - (rss_before or 0)) if rss_before else None}
+            results["scenarios"][name] = result
+            print(json.dumps({name: result}, indent=2), flush=True)
+        results["backend_songs_registered"] = backend["songs"]
+        results["backend_requests"] = backend["requests"]
+    finally:
+        await service.stop()
+        await spotify_runner.cleanup()
+        await backend_runner.cleanup()
+        if args.keep_temp:
+            print(f"Benchmark files kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def _mb(value: Optional[int]) -> Optional[float]:
+    return None if value is None else round(value / (1024 * 1024), 1)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark for the download service")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--engine", choices=("pool", "cli"), default="pool")
+    parser.add_argument("--max-concurrent", type=int, default=2, help="MAX_CONCURRENT_DOWNLOADS")
+    parser.add_argument("--singles", type=int, default=50)
+    parser.add_argument("--playlists", type=int, default=2)
+    parser.add_argument("--playlist-size", type=int, default=50)
+    parser.add_argument("--pollers", type=int, default=50)
+    parser.add_argument("--poller-interval", type=float, default=0.05)
+    parser.add_argument("--searches", type=int, default=200)
+    parser.add_argument("--search-concurrency", type=int, default=20)
+    parser.add_argument("--poll-interval", type=float, default=0.25, help="status polling interval while waiting")
+    parser.add_argument("--track-latency", type=float, default=0.5, help="fake spotdl network time per track (s)")
+    parser.add_argument("--startup-delay", type=float, default=1.5, help="fake spotdl start-up time (s)")
+    parser.add_argument("--file-size", type=int, default=256 * 1024)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0,
+                        help="share of Spotify stub requests and fake downloads answered with HTTP 429")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="Spotify/backend stub latency (s)")
+    parser.add_argument("--timeout", type=float, default=1800.0, help="per scenario timeout (s)")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--keep-temp", action="store_true")
+    args = parser.parse_args(argv)
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results = asyncio.run(run_benchmark(args))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Servisi benchmark modunda başlat
+
+main.py'yi olduğu gibi çalıştırır; sadece spotdl kütüphanesinin Spotify
+istemcisi (arama ve playlist çözümleme) Spotify stub'ına giden küçük bir
+istemciyle değiştirilir. İndirmeler SPOTDL_BIN / SPOTDL_WORKER_SCRIPT ile
+verilen sahte spotdl'e, metadata istekleri SPOTIFY_API_URL'deki stub'a,
+backend kayıtları BACKEND_URL'deki stub'a gider.
+
+    python benchmarks/serve.py --port 8800
+"""
+
+import argparse
+import os
+import re
+import sys
+import threading
+from typing import List
+
+import requests
+import uvicorn
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import fake_catalog  # noqa: E402
+import main  # noqa: E402
+import search_client  # noqa: E402
+from spotdl.types.song import Song  # noqa: E402
+
+_TRACK_RE = re.compile(r"track/([A-Za-z0-9]{22})")
+_PLAYLIST_RE = re.compile(r"playlist/([A-Za-z0-9]+)")
+
+
+class StubSpotdlClient:
+    """Spotdl.search'ün Spotify stub'ını kullanan karşılığı"""
+
+    def __init__(self, api_url: str):
+        self.api_url = api_url.rstrip("/")
+        # Arama havuzdaki thread'lerden çağrılır
+        self._local = threading.local()
+
+    def _get(self, path: str, **params) -> dict:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        response = session.get(f"{self.api_url}{path}", params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()
+
+    def search(self, queries: List[str]) -> List[Song]:
+        songs = []
+        for query in queries:
+            track = _TRACK_RE.search(query)
+            playlist = _PLAYLIST_RE.search(query)
+            if track:
+                items = [self._get(f"/v1/tracks/{track.group(1)}")]
+            elif playlist:
+                items, offset = [], 0
+                while True:
+                    page = self._get(f"/v1/playlists/{playlist.group(1)}/tracks", offset=offset, limit=100)
+                    items.extend(item["track"] for item in page["items"])
+                    offset += len(page["items"])
+                    if not page["next"] or not page["items"]:
+                        break
+            else:
+                items = self._get("/v1/search", q=query, type="track", limit=10)["tracks"]["items"]
+            songs.extend(Song.from_dict(fake_catalog.song_dict(item, list_url=query)) for item in items)
+        return songs
+
+
+def install_stub_client() -> None:
+    # Arka plan kurulumu ve hazır olma durumu main'deki gibi işler, sadece kurulan istemci farklı
+    def build_spotdl_client(client_id, client_secret, settings):
+        return StubSpotdlClient(os.environ["SPOTIFY_API_URL"]), lambda: None
+
+    search_client.build_spotdl_client = build_spotdl_client
+
+
+def run() -> int:
+    parser = argparse.ArgumentParser(description="Run the download service against benchmark stubs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    args = parser.parse_args()
+    if not os.getenv("SPOTIFY_API_URL"):
+        parser.error("SPOTIFY_API_URL must point to the Spotify stub")
+    install_stub_client()
+    uvicorn.run(main.app, host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
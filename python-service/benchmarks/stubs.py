@@ -0,0 +1,156 @@
+"""
+Spotify ve Node backend stub'ları
+
+- Spotify: accounts.spotify.com `/api/token` ve api.spotify.com'un servisin
+  kullandığı uçları (`/v1/tracks`, `/v1/tracks/{id}`, `/v1/search`,
+  `/v1/playlists/{id}/tracks`). Veriler fake_catalog'dan üretilir.
+- Backend: `/api/music/add-downloaded` ve `/api/music/add-downloaded-batch`
+  isteği kabul eder, sadece sayar.
+
+İkisi de yapay gecikmeyle çalıştırılabilir; Spotify stub'ı istenen oranda
+429 (Retry-After: 1) da döndürebilir. Tek başına:
+    python benchmarks/stubs.py --spotify-port 8901 --backend-port 8902
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+from typing import Tuple
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_catalog  # noqa: E402
+
+PAGE_SIZE = 100
+
+
+def spotify_app(latency: float = 0.0, throttle_rate: float = 0.0) -> web.Application:
+    app = web.Application()
+    app["requests"] = 0
+    app["throttled"] = 0
+
+    async def delay(request: web.Request, throttle: bool = True) -> None:
+        request.app["requests"] += 1
+        if latency:
+            await asyncio.sleep(latency)
+        if throttle and throttle_rate and random.random() < throttle_rate:
+            request.app["throttled"] += 1
+            raise web.HTTPTooManyRequests(headers={"Retry-After": "1"})
+
+    async def token(request: web.Request) -> web.Response:
+        await delay(request, throttle=False)
+        return web.json_response({"access_token": "bench-token", "token_type": "Bearer", "expires_in": 3600})
+
+    async def get_track(request: web.Request) -> web.Response:
+        await delay(request)
+        return web.json_response(fake_catalog.track(request.match_info["track_id"]))
+
+    async def get_tracks(request: web.Request) -> web.Response:
+        await delay(request)
+        ids = [item for item in request.query.get("ids", "").split(",") if item]
+        return web.json_response({"tracks": [fake_catalog.track(track_id) for track_id in ids]})
+
+    async def search(request: web.Request) -> web.Response:
+        await delay(request)
+        limit = int(request.query.get("limit", "10"))
+        items = fake_catalog.search(request.query.get("q", ""), limit)
+        return web.json_response({"tracks": {"items": items, "total": len(items)}})
+
+    async def playlist_tracks(request: web.Request) -> web.Response:
+        await delay(request)
+        track_ids = fake_catalog.playlist_track_ids(request.match_info["playlist_id"])
+        offset = int(request.query.get("offset", "0"))
+        limit = int(request.query.get("limit", str(PAGE_SIZE)))
+        page = track_ids[offset:offset + limit]
+        return web.json_response({
+            "items": [{"track": fake_catalog.track(track_id)} for track_id in page],
+            "total": len(track_ids),
+            "offset": offset,
+            "next": None if offset + limit >= len(track_ids) else "more",
+        })
+
+    app.router.add_post("/api/token", token)
+    app.router.add_get("/v1/tracks/{track_id}", get_track)
+    app.router.add_get("/v1/tracks", get_tracks)
+    app.router.add_get("/v1/search", search)
+    app.router.add_get("/v1/playlists/{playlist_id}/tracks", playlist_tracks)
+    return app
+
+
+def backend_app(latency: float = 0.0) -> web.Application:
+    app = web.Application()
+    app["songs"] = 0
+    app["requests"] = 0
+
+    async def add_downloaded(request: web.Request) -> web.Response:
+        app["requests"] += 1
+        song = await request.json()
+        if latency:
+            await asyncio.sleep(latency)
+        app["songs"] += 1
+        return web.json_response({"success": True, "song": song})
+
+    async def add_downloaded_batch(request: web.Request) -> web.Response:
+        app["requests"] += 1
+        songs = (await request.json()).get("songs") or []
+        if latency:
+            await asyncio.sleep(latency)
+        app["songs"] += len(songs)
+        return web.json_response({
+            "success": True,
+            "added": len(songs),
+            "results": [{"success": True, "filename": song.get("filename"), "song": song} for song in songs],
+        })
+
+    async def renditions_batch(request: web.Request) -> web.Response:
+        app["requests"] += 1
+        songs = (await request.json()).get("songs") or []
+        return web.json_response({
+            "success": True,
+            "updated": len(songs),
+            "results": [{"success": True, "filename": song.get("filename")} for song in songs],
+        })
+
+    app.router.add_post("/api/music/add-downloaded", add_downloaded)
+    app.router.add_post("/api/music/add-downloaded-batch", add_downloaded_batch)
+    app.router.add_post("/api/music/renditions-batch", renditions_batch)
+    return app
+
+
+async def start(app: web.Application, host: str = "127.0.0.1", port: int = 0) -> Tuple[web.AppRunner, str]:
+    """Uygulamayı başlat; (runner, temel URL) döndür (port=0 boş port seçer)"""
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = runner.addresses[0][1]
+    return runner, f"http://{host}:{bound_port}"
+
+
+async def serve_forever(spotify_port: int, backend_port: int, latency: float, throttle_rate: float) -> None:
+    _, spotify_url = await start(spotify_app(latency, throttle_rate), port=spotify_port)
+    _, backend_url = await start(backend_app(latency), port=backend_port)
+    print(f"Spotify stub: {spotify_url}\nBackend stub: {backend_url}", flush=True)
+    await asyncio.Event().wait()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run the Spotify and backend stubs")
+    parser.add_argument("--spotify-port", type=int, default=8901)
+    parser.add_argument("--backend-port", type=int, default=8902)
+    parser.add_argument("--latency", type=float, default=0.0, help="artificial latency per request (s)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of Spotify requests answered with 429")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve_forever(args.spotify_port, args.backend_port, args.latency, args.throttle_rate))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
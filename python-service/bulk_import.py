@@ -0,0 +1,151 @@
+"""
+Toplu içe aktarma
+
+Kütüphane taşıyan kullanıcılar yüzlerce linki tek seferde gönderir. Linkler
+burada normalize edilir (spotify: URI'leri, /intl-xx/ yolları, ?si= gibi
+izleme parametreleri, youtu.be kısa linkleri) ve tekrar edenler ayıklanır.
+Her giriş satırı bir `BulkItem` olur; sonuçları bittikçe NDJSON satırı
+olarak raporlanır.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+from urllib.parse import parse_qs, urlparse
+
+SPOTIFY_KINDS = ("track", "album", "playlist", "artist")
+
+_SPOTIFY_URI_RE = re.compile(r"^spotify:(track|album|playlist|artist):([A-Za-z0-9]+)$")
+_SPOTIFY_ID_RE = re.compile(r"^[A-Za-z0-9]+$")
+_YOUTUBE_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+_SEPARATORS_RE = re.compile(r"[\s,;]+")
+
+STATUS_INVALID = "invalid"
+STATUS_DUPLICATE = "duplicate"
+# İşleri bitmiş ama kayıtları sonuç raporlanmadan silinmiş link
+STATUS_UNKNOWN = "unknown"
+
+
+@dataclass
+class BulkItem:
+    index: int
+    source: str  # İstemcinin gönderdiği hali
+    url: Optional[str]  # Normalize edilmiş hali; desteklenmiyorsa None
+    duplicate_of: Optional[int] = None  # Aynı linkin ilk geçtiği satır
+    download_ids: List[str] = field(default_factory=list)
+
+
+def _normalize_spotify(parts: List[str]) -> Optional[str]:
+    # /intl-tr/track/ID, /embed/track/ID
+    parts = [part for part in parts if not part.startswith("intl-") and part != "embed"]
+    if len(parts) >= 2 and parts[0] in SPOTIFY_KINDS and _SPOTIFY_ID_RE.match(parts[1]):
+        return f"https://open.spotify.com/{parts[0]}/{parts[1]}"
+    return None
+
+
+def _normalize_youtube(host: str, path: str, query: Dict[str, List[str]]) -> Optional[str]:
+    video_id = None
+    if host == "youtu.be":
+        video_id = path.strip("/").split("/")[0]
+    elif path == "/watch":
+        video_id = (query.get("v") or [""])[0]
+    elif path.startswith("/shorts/"):
+        video_id = path.split("/")[2]
+    elif path == "/playlist":
+        playlist_id = (query.get("list") or [""])[0]
+        return f"https://www.youtube.com/playlist?list={playlist_id}" if playlist_id else None
+    if video_id and _YOUTUBE_ID_RE.match(video_id):
+        # Playlist içinden kopyalanan video linkindeki list= atılır; sadece video indirilir
+        return f"https://www.youtube.com/watch?v={video_id}"
+    return None
+
+
+def normalize_url(value: str) -> Optional[str]:
+    """Spotify/YouTube linkini kanonik hale getir; desteklenmiyorsa None"""
+    value = value.strip().strip("<>\"'")
+    uri = _SPOTIFY_URI_RE.match(value)
+    if uri:
+        return f"https://open.spotify.com/{uri.group(1)}/{uri.group(2)}"
+    if "://" not in value:
+        value = f"https://{value}"
+    parsed = urlparse(value)
+    host = (parsed.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if host == "open.spotify.com":
+        return _normalize_spotify([part for part in parsed.path.split("/") if part])
+    if host in ("youtube.com", "m.youtube.com", "music.youtube.com", "youtu.be"):
+        return _normalize_youtube(host, parsed.path.rstrip("/") or "/", parse_qs(parsed.query))
+    return None
+
+
+def split_urls(text: str) -> List[str]:
+    """Düz metinden linkleri ayır (satır, boşluk, virgül; # ile başlayan satırlar yorum)"""
+    values = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        values.extend(value for value in _SEPARATORS_RE.split(line) if value)
+    return values
+
+
+def dedupe_urls(values: Sequence[str]) -> List[BulkItem]:
+    """Her giriş için bir BulkItem; aynı linke normalize olan tekrarlar ilkini gösterir"""
+    items: List[BulkItem] = []
+    first_seen: Dict[str, int] = {}
+    for index, value in enumerate(values):
+        url = normalize_url(value)
+        item = BulkItem(index=index, source=value, url=url)
+        if url is not None:
+            if url in first_seen:
+                item.duplicate_of = first_seen[url]
+            else:
+                first_seen[url] = index
+        items.append(item)
+    return items
+
+
+def item_result(item: BulkItem, jobs: Sequence[Any], expired: int = 0) -> Dict[str, Any]:
+    """Bir giriş satırının sonucu (işleri bitmiş olmalı)
+
+    expired: biten ama kaydı bulunamayan iş sayısı; bunlar başarısız sayılmaz.
+    """
+    result: Dict[str, Any] = {"event": "item", "index": item.index, "url": item.source}
+    if item.url is None:
+        result.update(status=STATUS_INVALID, message="Not a Spotify or YouTube URL")
+        return result
+    if item.duplicate_of is not None:
+        result.update(status=STATUS_DUPLICATE, normalized=item.url, duplicate_of=item.duplicate_of)
+        return result
+
+    completed = [job for job in jobs if job.status == "completed"]
+    failed = sum(1 for job in jobs if job.status == "failed")
+    if jobs and len(completed) == len(jobs):
+        status = "completed"
+    elif completed:
+        status = "partial"
+    elif jobs and all(job.status == "cancelled" for job in jobs):
+        status = "cancelled"
+    elif not jobs and expired:
+        status = STATUS_UNKNOWN
+    else:
+        status = "failed"
+    result.update(
+        status=status,
+        normalized=item.url,
+        download_ids=item.download_ids,
+        tracks=len(jobs) + expired,
+        completed_tracks=len(completed),
+        failed_tracks=failed,
+        file_paths=[job.file_path for job in completed if job.file_path],
+    )
+    if expired:
+        result["unknown_tracks"] = expired
+    if len(jobs) == 1 and not expired:
+        result["message"] = jobs[0].message
+    elif not jobs and expired:
+        result["message"] = "Job records expired before the result was reported"
+    elif not jobs:
+        result["message"] = "No tracks found"
+    return result
@@ -0,0 +1,258 @@
+"""
+Çok süreçli çalışma için paylaşılan durum
+
+uvicorn birden fazla işçi süreciyle (`--workers N`) çalıştırıldığında her
+süreç kendi belleğine sahiptir. İşçiler iş deposunu (SQLite WAL) ortak
+kullanır; bu modül de aynı dosyada şunları tutar:
+
+- config: runtime'da güncellenen ayarlar (Spotify credential'ları).
+  Her değişiklik sürüm numarasını artırır, işçiler sürümü yoklayıp
+  değişikliği bir kez uygular.
+- leases: süreli kiralar. Zamanlayıcı kirasını tutan tek süreç indirmeleri
+  çalıştırır; kira yenilenmezse (süreç öldüyse) başka bir işçi devralır.
+- commands: zamanlayıcıyı tutmayan işçilerin ona gönderdiği istekler
+  (kuyruğa ekle, tekrar dene, iptal et). Aktif işleri sadece zamanlayıcı
+  değiştirir; böylece iki süreç aynı işin üzerine yazmaz.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+COMMAND_ENQUEUE = "enqueue"
+COMMAND_RETRY = "retry"
+COMMAND_CANCEL = "cancel"
+
+
+class SharedState:
+    """İşçi süreçleri arasında paylaşılan ayar, kira ve komut tabloları"""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS config (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                seed TEXT,
+                version INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS leases (
+                name TEXT PRIMARY KEY,
+                holder TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                info TEXT
+            )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS commands (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                job_id TEXT NOT NULL,
+                owner TEXT,
+                created_at REAL NOT NULL
+            )"""
+        )
+        self._lock = threading.Lock()
+
+    def seed_config(self, key: str, value: Any) -> None:
+        """Ortam değişkenlerinden gelen değeri kaydet
+
+        Değer runtime'da güncellenmişse ve ortam değişmediyse güncel değer
+        korunur; ortamdaki değer değiştiyse (yeniden dağıtım) ortam kazanır.
+        """
+        encoded = json.dumps(value, sort_keys=True)
+        with self._lock:
+            row = self._conn.execute("SELECT seed FROM config WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] == encoded:
+                return
+            self._conn.execute(
+                "INSERT INTO config (key, value, seed, version, updated_at) VALUES (?, ?, ?, 1, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, seed = excluded.seed, "
+                "version = config.version + 1, updated_at = excluded.updated_at",
+                (key, encoded, encoded, time.time()),
+            )
+
+    def set_config(self, key: str, value: Any) -> int:
+        """Ayarı güncelle, yeni sürüm numarasını döndür"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO config (key, value, version, updated_at) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, "
+                "version = config.version + 1, updated_at = excluded.updated_at",
+                (key, json.dumps(value, sort_keys=True), time.time()),
+            )
+            return self._conn.execute("SELECT version FROM config WHERE key = ?", (key,)).fetchone()[0]
+
+    def get_config(self, key: str) -> Tuple[Any, int]:
+        """(değer, sürüm); ayar yoksa (None, 0)"""
+        with self._lock:
+            row = self._conn.execute("SELECT value, version FROM config WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None, 0
+        return json.loads(row[0]), row[1]
+
+    def config_version(self, key: str) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT version FROM config WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def acquire_lease(self, name: str, holder: str, ttl: float, info: Optional[Dict[str, Any]] = None) -> bool:
+        """Kirayı al ya da yenile; başka bir süreçte ve süresi dolmamışsa False"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO leases (name, holder, expires_at, info) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, "
+                "expires_at = excluded.expires_at, info = excluded.info "
+                "WHERE leases.holder = excluded.holder OR leases.expires_at < ?",
+                (name, holder, now + ttl, json.dumps(info) if info is not None else None, now),
+            )
+            row = self._conn.execute("SELECT holder FROM leases WHERE name = ?", (name,)).fetchone()
+        return row is not None and row[0] == holder
+
+    def release_lease(self, name: str, holder: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder))
+
+    def lease_info(self, name: str) -> Optional[Dict[str, Any]]:
+        """Geçerli kiranın sahibi ve sahibin yayınladığı durum; kira yoksa None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT holder, expires_at, info FROM leases WHERE name = ? AND expires_at >= ?",
+                (name, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"holder": row[0], "expires_at": row[1], "info": json.loads(row[2]) if row[2] else {}}
+
+    def send_command(self, kind: str, job_id: str, owner: Optional[str] = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO commands (kind, job_id, owner, created_at) VALUES (?, ?, ?, ?)",
+                (kind, job_id, owner, time.time()),
+            )
+
+    def send_commands(self, kind: str, job_ids: List[str], owner: Optional[str] = None) -> None:
+        """Aynı türden komutları tek transaction'da gönder"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO commands (kind, job_id, owner, created_at) VALUES (?, ?, ?, ?)",
+                    [(kind, job_id, owner, now) for job_id in job_ids],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def take_commands(self, limit: int = 100) -> List[Tuple[str, str, Optional[str]]]:
+        """Bekleyen komutları gönderilme sırasıyla al ve tablodan sil"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, kind, job_id, owner FROM commands ORDER BY id LIMIT ?", (limit,)
+                ).fetchall()
+                if rows:
+                    self._conn.execute("DELETE FROM commands WHERE id <= ?", (rows[-1][0],))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [(kind, job_id, owner) for _, kind, job_id, owner in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class LeaderLease:
+    """Kirayı periyodik olarak almaya/yenilemeye çalışan döngü
+
+    Kira alınınca `on_acquired`, kaybedilince (yenilenemeyince) `on_lost`
+    çağrılır. Yenileme TTL'nin üçte biri aralıkla yapılır; sahibi ölen
+    kira en geç TTL sonra başka bir sürece geçer.
+    """
+
+    def __init__(
+        self,
+        state: SharedState,
+        name: str,
+        ttl: float,
+        on_acquired: Callable[[], Awaitable[None]],
+        on_lost: Callable[[], Awaitable[None]],
+        info: Optional[Callable[[], Dict[str, Any]]] = None,
+    ):
+        self.state = state
+        self.name = name
+        self.ttl = ttl
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._on_acquired = on_acquired
+        self._on_lost = on_lost
+        self._info = info
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Kira döngüsünü arka planda başlat (event loop içinden çağrılmalı)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                info = self._info() if self._info else None
+                acquired = self.state.acquire_lease(self.name, self.holder, self.ttl, info)
+            except sqlite3.Error as e:
+                logger.error(f"Lease {self.name} renewal failed: {e}")
+                acquired = False
+            if acquired and not self.is_leader:
+                self.is_leader = True
+                logger.info(f"Acquired {self.name} lease as {self.holder}")
+                await self._on_acquired()
+            elif not acquired and self.is_leader:
+                self.is_leader = False
+                logger.warning(f"Lost {self.name} lease, stopping")
+                await self._on_lost()
+            await asyncio.sleep(self.ttl / 3)
+
+    def stop(self) -> None:
+        """Döngüyü durdur ve kirayı bırak; diğer işçi TTL beklemeden devralabilir"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.is_leader:
+            self.is_leader = False
+            try:
+                self.state.release_lease(self.name, self.holder)
+            except sqlite3.Error as e:
+                logger.error(f"Lease {self.name} release failed: {e}")
+
+
+def create_shared_state() -> Optional[SharedState]:
+    """SHARED_STATE açıksa paylaşılan durumu aç (WEB_WORKERS > 1 ise varsayılan olarak açık)"""
+    workers = int(os.getenv("WEB_WORKERS", "1"))
+    enabled = os.getenv("SHARED_STATE", "true" if workers > 1 else "false").lower() != "false"
+    if not enabled:
+        return None
+    if os.getenv("JOB_STORE", "sqlite").lower() != "sqlite":
+        raise ValueError("SHARED_STATE requires JOB_STORE=sqlite")
+    path = os.getenv("SHARED_STATE_PATH", os.getenv("JOB_STORE_PATH", "../data/downloads.db"))
+    return SharedState(path)
@@ -0,0 +1,371 @@
+"""
+Kapak görseli önbelleği
+
+Arama sonuçlarındaki Spotify kapakları (640 px) ve indirilen dosyalara
+gömülü kapaklar bir kez alınır, küçültülmüş varyantları (varsayılan 64 ve
+300 px JPEG) içerik hash'iyle adreslenen dosyalar olarak diske yazılır.
+Aynı görsel (ör. bir albümün tüm şarkıları) tek kopya tutulur. Kaynak
+(Spotify görsel ID'si ya da dosya) -> hash eşlemesi ve son erişim zamanları
+SQLite'ta tutulur; toplam boyut bütçeyi aşınca en uzun süredir
+kullanılmayan görseller silinir.
+
+Görsel işleme (Pillow) ve dosya işlemleri bloklayan çağrılardır; async
+katman bunları verilen işçi havuzunda çalıştırır.
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import aiohttp
+from mutagen import File as MutagenFile
+from mutagen import MutagenError
+from mutagen.id3 import ID3, ID3NoHeaderError
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+SPOTIFY_IMAGE_URL = os.getenv("SPOTIFY_IMAGE_URL", "https://i.scdn.co/image")
+_SPOTIFY_IMAGE_RE = re.compile(r"^https://i\.scdn\.co/image/([A-Za-z0-9]+)$")
+IMAGE_ID_RE = re.compile(r"^[A-Za-z0-9]{16,64}$")
+
+REQUEST_TIMEOUT = 10
+# Bundan büyük kaynak görseller işlenmez
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+# Küçük dosyada dev boyut bildiren görseller (sıkıştırma bombası) açılmadan reddedilir
+MAX_SOURCE_PIXELS = 6000 * 6000
+JPEG_QUALITY = 85
+# Son erişim zamanı en fazla bu aralıkla güncellenir (her istekte yazılmasın)
+TOUCH_INTERVAL = 60.0
+# Kaynakta kapak yok (sonuç önbelleğe alınır, dosya her istekte tekrar okunmaz)
+NO_ART = ""
+
+
+def spotify_image_id(url: Optional[str]) -> Optional[str]:
+    """Spotify CDN görsel URL'sinden görsel ID'si"""
+    match = _SPOTIFY_IMAGE_RE.match(url or "")
+    return match.group(1) if match else None
+
+
+def parse_sizes(value: str) -> Tuple[int, ...]:
+    """"64,300" -> (64, 300)"""
+    sizes = sorted({int(part) for part in value.split(",") if part.strip()})
+    if not sizes or sizes[0] <= 0:
+        raise ValueError(f"Invalid cover sizes: {value!r}")
+    return tuple(sizes)
+
+
+def extract_embedded_art(path: str) -> Optional[bytes]:
+    """Dosyaya gömülü kapak görseli (ön kapak tercih edilir); yoksa None (bloklayan çağrı)"""
+    try:
+        # MP3: sadece ID3 etiketi okunur, ses akışı taranmaz
+        pictures = ID3(path).getall("APIC")
+        # Tür 3 = ön kapak
+        pictures.sort(key=lambda frame: frame.type != 3)
+        return pictures[0].data if pictures else None
+    except ID3NoHeaderError:
+        pass
+    except (MutagenError, OSError) as e:
+        logger.warning(f"Could not read cover art from {path}: {e}")
+        return None
+    try:
+        audio = MutagenFile(path)
+    except (MutagenError, OSError) as e:
+        logger.warning(f"Could not read cover art from {path}: {e}")
+        return None
+    if audio is None or audio.tags is None:
+        return None
+    tags = audio.tags
+    pictures = getattr(audio, "pictures", None)  # FLAC
+    if pictures:
+        return sorted(pictures, key=lambda picture: picture.type != 3)[0].data
+    covers = tags.get("covr") if hasattr(tags, "get") else None  # MP4/M4A
+    if covers:
+        return bytes(covers[0])
+    return None
+
+
+def render_variants(data: bytes, sizes: Sequence[int]) -> Dict[int, bytes]:
+    """Görseli her boyut için kare JPEG'e küçült (bloklayan çağrı)
+
+    Kare olmayan görseller (ör. YouTube kapakları) ortadan kırpılır; kaynaktan
+    büyük boyutlar kaynağın boyutunda kalır.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        # Boyut başlıktan okunur; piksel verisi henüz açılmadı
+        if image.width * image.height > MAX_SOURCE_PIXELS:
+            raise ValueError(f"image is too large ({image.width}x{image.height})")
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        variants = {}
+        for size in sizes:
+            edge = min(size, image.width, image.height)
+            resized = ImageOps.fit(image, (edge, edge), method=Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            resized.save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=edge > 100)
+            variants[size] = buffer.getvalue()
+        return variants
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    # Aynı görseli yazan diğer süreç yarım dosya görmesin
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+class CoverArtStore:
+    """Küçültülmüş kapakların içerik adresli disk deposu (LRU boyut bütçeli)"""
+
+    def __init__(self, directory: str, sizes: Sequence[int], max_bytes: int):
+        self.directory = directory
+        self.sizes = tuple(sizes)
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(
+            os.path.join(directory, "covers.db"), check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS covers (
+                digest TEXT PRIMARY KEY,
+                bytes INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS covers_last_access ON covers(last_access)")
+        # Kaynak -> hash ('' = kaynakta kapak yok)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sources (source TEXT PRIMARY KEY, digest TEXT NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def variant_path(self, digest: str, size: int) -> str:
+        return os.path.join(self.directory, digest[:2], f"{digest}_{size}.jpg")
+
+    def lookup(self, source: str) -> Optional[str]:
+        """Kaynağın hash'i; kaynak hiç işlenmediyse ya da görseli silindiyse None, kapak yoksa NO_ART"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sources.digest, covers.digest FROM sources "
+                "LEFT JOIN covers ON covers.digest = sources.digest WHERE source = ?",
+                (source,),
+            ).fetchone()
+        if row is None:
+            return None
+        digest, stored = row
+        if digest == NO_ART:
+            return NO_ART
+        if stored is None:
+            return None
+        return digest
+
+    def store(self, source: str, data: Optional[bytes]) -> str:
+        """Görselin varyantlarını yaz ve kaynağı eşle; hash'i döndür (görsel yoksa/bozuksa NO_ART)"""
+        digest = NO_ART
+        if data and len(data) <= MAX_SOURCE_BYTES:
+            digest = hashlib.sha256(data).hexdigest()[:32]
+            with self._lock:
+                known = self._conn.execute("SELECT 1 FROM covers WHERE digest = ?", (digest,)).fetchone()
+            if known is None:
+                try:
+                    variants = render_variants(data, self.sizes)
+                except (UnidentifiedImageError, Image.DecompressionBombError, OSError, ValueError) as e:
+                    logger.warning(f"Could not decode cover art for {source}: {e}")
+                    variants = None
+                if variants is None:
+                    digest = NO_ART
+                else:
+                    os.makedirs(os.path.dirname(self.variant_path(digest, self.sizes[0])), exist_ok=True)
+                    for size, variant in variants.items():
+                        _write_atomic(self.variant_path(digest, size), variant)
+                    with self._lock:
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO covers (digest, bytes, last_access) VALUES (?, ?, ?)",
+                            (digest, sum(len(variant) for variant in variants.values()), time.time()),
+                        )
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sources (source, digest) VALUES (?, ?)", (source, digest)
+            )
+        if digest != NO_ART:
+            self.evict(keep=digest)
+        return digest
+
+    def track(self, path: str) -> str:
+        """Dosyaya gömülü kapağın hash'i; ilk seferde çıkarılıp kaydedilir (bloklayan çağrı)
+
+        Kaynak anahtarı dosyanın değişme zamanını içerir; dosya yeniden
+        yazılırsa kapak tekrar okunur.
+        """
+        source = f"file:{os.path.basename(path)}:{os.stat(path).st_mtime_ns}"
+        digest = self.lookup(source)
+        if digest is None:
+            digest = self.store(source, extract_embedded_art(path))
+        return digest
+
+    def read(self, digest: str, size: int) -> Optional[bytes]:
+        """Varyantın içeriği; silinmişse None"""
+        try:
+            with open(self.variant_path(digest, size), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self._conn.execute("DELETE FROM covers WHERE digest = ?", (digest,))
+            return None
+        self.touch(digest)
+        return data
+
+    def touch(self, digest: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE covers SET last_access = ? WHERE digest = ? AND last_access < ?",
+                (now, digest, now - TOUCH_INTERVAL),
+            )
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT IFNULL(SUM(bytes), 0) FROM covers").fetchone()[0]
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Bütçe aşıldıysa en uzun süredir kullanılmayan görselleri sil; silinen görsel sayısı
+
+        `keep` (az önce yazılan görsel) bütçeden büyük olsa da silinmez.
+        """
+        with self._lock:
+            total = self._conn.execute("SELECT IFNULL(SUM(bytes), 0) FROM covers").fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+            victims: List[str] = []
+            for digest, size in self._conn.execute("SELECT digest, bytes FROM covers ORDER BY last_access"):
+                if total <= self.max_bytes:
+                    break
+                if digest == keep:
+                    continue
+                victims.append(digest)
+                total -= size
+            self._conn.executemany("DELETE FROM covers WHERE digest = ?", [(digest,) for digest in victims])
+        for digest in victims:
+            for size in self.sizes:
+                try:
+                    os.remove(self.variant_path(digest, size))
+                except FileNotFoundError:
+                    pass
+        return len(victims)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CoverArtCache:
+    """Kapakları kaynağından bir kez alıp depodan sunan async katman
+
+    Aynı kaynağa gelen eşzamanlı istekler tek indirme/çıkarma işine bağlanır.
+    """
+
+    def __init__(self, store: CoverArtStore, executor: Executor, max_connections: int = 8):
+        self.store = store
+        self.executor = executor
+        self.max_connections = max_connections
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    @property
+    def sizes(self) -> Tuple[int, ...]:
+        return self.store.sizes
+
+    async def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+            )
+        return self._session
+
+    async def _resolve(self, source: str, load) -> str:
+        loop = asyncio.get_running_loop()
+        digest = await loop.run_in_executor(self.executor, self.store.lookup, source)
+        if digest is not None:
+            return digest
+        future = self._in_flight.get(source)
+        if future is not None:
+            return await asyncio.shield(future)
+        future = loop.create_future()
+        self._in_flight[source] = future
+        try:
+            data = await load()
+            digest = await loop.run_in_executor(self.executor, self.store.store, source, data)
+            future.set_result(digest)
+            return digest
+        except BaseException as e:
+            future.set_exception(e)
+            # Bekleyen yoksa "exception was never retrieved" uyarısı çıkmasın
+            future.exception()
+            raise
+        finally:
+            self._in_flight.pop(source, None)
+
+    async def spotify(self, image_id: str) -> str:
+        """Spotify görselinin hash'i (ilk istekte CDN'den indirilir); görsel yoksa NO_ART"""
+        async def download() -> Optional[bytes]:
+            session = await self.session()
+            async with session.get(f"{SPOTIFY_IMAGE_URL}/{image_id}") as response:
+                if response.status == 404:
+                    return None
+                response.raise_for_status()
+                data = bytearray()
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    data.extend(chunk)
+                    if len(data) > MAX_SOURCE_BYTES:
+                        logger.warning(f"Spotify image {image_id} is too large, skipping")
+                        return None
+                return bytes(data)
+
+        return await self._resolve(f"spotify:{image_id}", download)
+
+    async def track(self, path: str) -> str:
+        """Dosyaya gömülü kapağın hash'i; kapak yoksa NO_ART (tek havuz görevi)"""
+        key = f"file:{path}"
+        future = self._in_flight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+        loop = asyncio.get_running_loop()
+        future = asyncio.ensure_future(loop.run_in_executor(self.executor, self.store.track, path))
+        self._in_flight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if future.done():
+                self._in_flight.pop(key, None)
+            else:
+                future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+    async def read(self, digest: str, size: int) -> Optional[bytes]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.store.read, digest, size)
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+def create_cover_store() -> Optional[CoverArtStore]:
+    """COVER_CACHE_DIR'deki depoyu aç; açılamazsa kapaklar sunulmaz"""
+    directory = os.getenv("COVER_CACHE_DIR", "../data/covers")
+    max_bytes = int(float(os.getenv("COVER_CACHE_MAX_MB", "200")) * 1024 * 1024)
+    try:
+        return CoverArtStore(directory, parse_sizes(os.getenv("COVER_SIZES", "64,300")), max_bytes)
+    except (sqlite3.Error, OSError, ValueError) as e:
+        logger.error(f"Failed to open cover art cache at {directory}: {e}")
+        return None
@@ -0,0 +1,250 @@
+"""
+Sıcak indirme motoru
+
+spotdl'i bir kez import edip kimliği doğrulanmış istemciyi tutan uzun
+ömürlü işçi süreçlerden (spotdl_worker.py) oluşan küçük bir havuz. Her
+iş için yeni bir `spotdl` CLI süreci başlatmak yerine boştaki bir işçiye
+gönderilir; yorumlayıcı açılışı, spotdl/yt-dlp import'u ve Spotify
+kimlik doğrulaması iş başına tekrarlanmaz.
+
+Zaman aşımı veya iptalde işçi (süreç grubuyla birlikte) öldürülür ve
+yerine arka planda yenisi başlatılır.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+import time
+from typing import Any, Callable, Dict, Optional, Set
+
+from metrics import SUBPROCESS_EXITS, SUBPROCESS_SECONDS, SUBPROCESS_TIMEOUTS
+
+logger = logging.getLogger(__name__)
+
+WORKER_SCRIPT = os.getenv(
+    "SPOTDL_WORKER_SCRIPT", os.path.join(os.path.dirname(os.path.abspath(__file__)), "spotdl_worker.py")
+)
+# spotdl import'u ve Spotify kimlik doğrulaması yavaş ortamlarda uzun sürebilir
+WORKER_START_TIMEOUT = 120.0
+# "done" gibi olay satırları için okuma sınırı
+WORKER_LINE_LIMIT = 1024 * 1024
+
+
+class DownloadEngineError(Exception):
+    """İşçi işi tamamlayamadığında fırlatılır"""
+
+
+async def kill_process_group(process: asyncio.subprocess.Process) -> None:
+    """Süreci (start_new_session ile başlatıldıysa alt süreçleriyle birlikte) öldür"""
+    if process.returncode is None:
+        try:
+            if os.name == "posix":
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
+    await process.wait()
+
+
+class _Worker:
+    """Tek bir spotdl işçi süreci"""
+
+    def __init__(self, process: asyncio.subprocess.Process, generation: int):
+        self.process = process
+        self.generation = generation
+
+    @classmethod
+    async def start(cls, init: Dict[str, Any], generation: int) -> "_Worker":
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-u", WORKER_SCRIPT,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            env={**os.environ, "COLUMNS": "1000", "PYTHONIOENCODING": "utf-8"},
+            limit=WORKER_LINE_LIMIT,
+            # ffmpeg/yt-dlp alt süreçleri de grupla birlikte öldürülebilsin
+            start_new_session=os.name == "posix",
+        )
+        worker = cls(process, generation)
+        try:
+            await worker.send(init)
+            event = await asyncio.wait_for(worker.receive(), timeout=WORKER_START_TIMEOUT)
+        except (asyncio.TimeoutError, DownloadEngineError) as e:
+            await worker.kill()
+            raise DownloadEngineError(f"worker did not become ready: {e or 'timeout'}")
+        if event.get("event") != "ready":
+            await worker.kill()
+            raise DownloadEngineError(event.get("error") or "worker failed to initialize")
+        return worker
+
+    @property
+    def alive(self) -> bool:
+        return self.process.returncode is None
+
+    async def send(self, message: Dict[str, Any]) -> None:
+        try:
+            self.process.stdin.write((json.dumps(message) + "\n").encode("utf-8"))
+            await self.process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError) as e:
+            raise DownloadEngineError(f"worker exited unexpectedly: {e}")
+
+    async def receive(self) -> Dict[str, Any]:
+        line = await self.process.stdout.readline()
+        if not line:
+            raise DownloadEngineError("worker exited unexpectedly")
+        return json.loads(line)
+
+    async def kill(self) -> None:
+        await kill_process_group(self.process)
+
+
+class WarmDownloadEngine:
+    """Sıcak spotdl işçileri havuzu"""
+
+    def __init__(self, size: int, settings: Dict[str, Any]):
+        self.size = size
+        self.settings = settings
+        self._credentials = ("", "")
+        self._generation = 0
+        self._workers: Set[_Worker] = set()
+        self._idle: Optional[asyncio.Queue] = None
+        self._stopped = True
+
+    @property
+    def available(self) -> bool:
+        """En az bir işçi hazırsa True; değilse çağıran CLI'a düşer"""
+        return bool(self._workers)
+
+    @property
+    def worker_count(self) -> int:
+        return len(self._workers)
+
+    def _queue(self) -> asyncio.Queue:
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+        return self._idle
+
+    async def start(self, client_id: str, client_secret: str) -> None:
+        """Havuzu verilen credential'larla başlat (eski işçiler emekliye ayrılır)"""
+        self._credentials = (client_id, client_secret)
+        self._generation += 1
+        self._stopped = False
+        await self._retire_idle()
+        results = await asyncio.gather(*(self._spawn(self._generation) for _ in range(self.size)))
+        logger.info(f"Download engine started with {sum(results)}/{self.size} warm worker(s)")
+
+    async def _spawn(self, generation: int) -> bool:
+        init = {
+            "client_id": self._credentials[0],
+            "client_secret": self._credentials[1],
+            "settings": self.settings,
+        }
+        try:
+            worker = await _Worker.start(init, generation)
+        except (OSError, DownloadEngineError) as e:
+            logger.warning(f"SpotDL worker failed to start: {e}")
+            return False
+        if self._stopped or generation != self._generation:
+            await worker.kill()
+            return False
+        self._workers.add(worker)
+        self._queue().put_nowait(worker)
+        return True
+
+    async def _retire_idle(self) -> None:
+        """Boştaki eski işçileri kapat; meşgul olanlar işleri bitince kapanır"""
+        queue = self._queue()
+        idle = []
+        while not queue.empty():
+            idle.append(queue.get_nowait())
+        retired = []
+        for worker in idle:
+            if worker.generation == self._generation:
+                queue.put_nowait(worker)
+            else:
+                self._workers.discard(worker)
+                retired.append(worker)
+        await asyncio.gather(*(worker.kill() for worker in retired))
+
+    async def _discard(self, worker: _Worker) -> None:
+        """İşçiyi öldür ve gerekiyorsa yerine yenisini başlat"""
+        self._workers.discard(worker)
+        await worker.kill()
+        SUBPROCESS_EXITS.inc(command="spotdl_worker", code=str(worker.process.returncode))
+        if not self._stopped and worker.generation == self._generation:
+            asyncio.create_task(self._spawn(self._generation))
+
+    async def _acquire(self) -> _Worker:
+        while True:
+            if not self._workers:
+                raise DownloadEngineError("no warm workers available")
+            worker = await self._queue().get()
+            if worker.alive and worker.generation == self._generation:
+                return worker
+            await self._discard(worker)
+
+    def _release(self, worker: _Worker) -> None:
+        if worker.generation == self._generation and not self._stopped:
+            self._queue().put_nowait(worker)
+        else:
+            self._workers.discard(worker)
+            asyncio.create_task(worker.kill())
+
+    async def download(
+        self,
+        url: str,
+        output_dir: str,
+        on_line: Callable[[str], None],
+        timeout: float,
+        on_fetched: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> None:
+        """URL'yi boştaki bir işçiyle output_dir'e indir
+
+        on_fetched verilirse işçi sadece ağ aşamalarını yapar; her şarkının ham
+        dosyası indikçe on_fetched çağrılır ve kodlama çağırana kalır.
+        """
+        worker = await self._acquire()
+        started = time.perf_counter()
+
+        async def run_job() -> None:
+            await worker.send({"url": url, "output": output_dir, "pipeline": on_fetched is not None})
+            while True:
+                event = await worker.receive()
+                kind = event.get("event")
+                if kind == "line":
+                    on_line(event.get("line", ""))
+                elif kind == "fetched" and on_fetched is not None:
+                    on_fetched(event)
+                elif kind == "done":
+                    return
+                elif kind == "error":
+                    raise DownloadEngineError(event.get("error") or "download failed")
+
+        try:
+            await asyncio.wait_for(run_job(), timeout=timeout)
+        except DownloadEngineError:
+            if worker.alive:
+                self._release(worker)
+            else:
+                await self._discard(worker)
+            raise
+        except BaseException as e:
+            if isinstance(e, asyncio.TimeoutError):
+                SUBPROCESS_TIMEOUTS.inc(command="spotdl_worker")
+            # Zaman aşımı/iptal: spotdl'i işin ortasında durdurmanın tek yolu süreci öldürmek
+            await asyncio.shield(self._discard(worker))
+            raise
+        finally:
+            SUBPROCESS_SECONDS.observe(time.perf_counter() - started, command="spotdl_worker")
+        self._release(worker)
+
+    async def stop(self) -> None:
+        self._stopped = True
+        self._generation += 1
+        workers = list(self._workers)
+        self._workers.clear()
+        self._idle = None
+        await asyncio.gather(*(worker.kill() for worker in workers))
@@ -0,0 +1,105 @@
+"""
+Kodlama aşaması
+
+İndirme pipeline'ının CPU ağırlıklı son aşaması: işçilerin indirdiği ham
+sesi ffmpeg ile çıktı biçimine (varsayılan MP3) kodlar ve spotdl'in
+etiketlerini yazar. Aynı anda çalışan ffmpeg süreci sayısı sınırlıdır;
+böylece bir şarkının kodlanması sıradaki şarkıların ağdan inmesiyle
+örtüşür ama çekirdekleri aşırı doldurmaz.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from metrics import SUBPROCESS_EXITS, SUBPROCESS_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Hata mesajında saklanacak ffmpeg çıktısı (byte)
+MAX_ERROR_OUTPUT = 2000
+
+# Çıktı biçimi (dosya uzantısı) -> ffmpeg kodlayıcısı
+FFMPEG_CODECS = {
+    "mp3": "libmp3lame",
+    "opus": "libopus",
+    "ogg": "libvorbis",
+    "m4a": "aac",
+    "flac": "flac",
+}
+# Kayıpsız biçimlerde bit hızı verilmez
+LOSSLESS_FORMATS = ("flac",)
+
+
+def codec_args(audio_format: str, bitrate: str) -> List[str]:
+    """Biçim ve bit hızı için ffmpeg kodlayıcı argümanları"""
+    if audio_format not in FFMPEG_CODECS:
+        raise ValueError(f"Unsupported output format {audio_format!r}")
+    args = ["-vn", "-codec:a", FFMPEG_CODECS[audio_format]]
+    if audio_format not in LOSSLESS_FORMATS:
+        args += ["-b:a", bitrate]
+    return args
+
+
+class EncodeError(Exception):
+    """ffmpeg kodlamayı tamamlayamadığında fırlatılır"""
+
+
+class EncodePool:
+    """Sınırlı sayıda eşzamanlı ffmpeg kodlama süreci"""
+
+    def __init__(self, workers: int, bitrate: str = "320k", audio_format: str = "mp3"):
+        self.workers = workers
+        self.bitrate = bitrate
+        self.audio_format = audio_format
+        self._slots = asyncio.Semaphore(workers)
+        self.active = 0
+
+    async def encode(self, source: str, output: str, ffmpeg: str = "ffmpeg") -> None:
+        """Ham ses dosyasını çıktı biçimine kodla; başarılı olursa kaynağı sil"""
+        async with self._slots:
+            started = time.perf_counter()
+            self.active += 1
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    ffmpeg, "-nostdin", "-y", "-loglevel", "error",
+                    "-i", source,
+                    *codec_args(self.audio_format, self.bitrate),
+                    output,
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+                try:
+                    _, stderr = await process.communicate()
+                except asyncio.CancelledError:
+                    if process.returncode is None:
+                        process.kill()
+                        await process.wait()
+                    raise
+            finally:
+                self.active -= 1
+            SUBPROCESS_SECONDS.observe(time.perf_counter() - started, command="ffmpeg")
+            SUBPROCESS_EXITS.inc(command="ffmpeg", code=str(process.returncode))
+
+        if process.returncode != 0:
+            # Yarım kalan çıktı kütüphaneye taşınmasın
+            if os.path.exists(output):
+                os.remove(output)
+            details = stderr.decode("utf-8", errors="replace")[-MAX_ERROR_OUTPUT:].strip()
+            raise EncodeError(f"ffmpeg exited with code {process.returncode}: {details}")
+
+        try:
+            os.remove(source)
+        except OSError as e:
+            logger.debug(f"Could not remove raw file {source}: {e}")
+
+
+def tag_track(output: str, song_data: Dict[str, Any]) -> None:
+    """spotdl şarkı verisinden ID3 etiketlerini ve kapağı yaz (bloklayan çağrı)"""
+    from spotdl.types.song import Song
+    from spotdl.utils.metadata import embed_metadata
+
+    embed_metadata(Path(output), Song.from_dict(song_data))
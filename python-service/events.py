@@ -0,0 +1,82 @@
+"""
+İndirme durum olayları
+
+İndirme durumlarındaki her değişiklik artan bir sıra numarasıyla kaydedilir.
+SSE bağlantıları bu numarayı imleç (cursor) olarak kullanır: yeniden
+bağlanan istemci son gördüğü numarayı gönderir ve sadece o noktadan sonra
+değişen işleri alır. Kayıt defteri sınırlıdır; imleç çok eskiyse istemciye
+tam bir anlık görüntü gönderilir.
+"""
+
+import asyncio
+import threading
+from collections import deque
+from typing import Deque, Optional, Set, Tuple
+
+# Saklanacak en fazla değişiklik kaydı
+EVENT_LOG_SIZE = 5000
+
+
+class DownloadEventHub:
+    """İndirme değişikliklerini sıra numarasıyla yayınla ve bekleyenleri uyandır"""
+
+    def __init__(self, log_size: int = EVENT_LOG_SIZE):
+        self._log: Deque[Tuple[int, str]] = deque(maxlen=log_size)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._changed: Optional[asyncio.Event] = None
+
+    @property
+    def cursor(self) -> int:
+        """En son yayınlanan değişikliğin numarası"""
+        return self._seq
+
+    def publish(self, download_id: str) -> None:
+        """Bir işin değiştiğini duyur (herhangi bir thread'den çağrılabilir)"""
+        with self._lock:
+            self._seq += 1
+            self._log.append((self._seq, download_id))
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._wake()
+        else:
+            loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self) -> None:
+        if self._changed is not None:
+            event, self._changed = self._changed, asyncio.Event()
+            event.set()
+
+    def changes_since(self, cursor: int) -> Optional[Tuple[Set[str], int]]:
+        """İmleçten sonra değişen işler ve yeni imleç; imleç kayıttan eskiyse None"""
+        with self._lock:
+            if cursor > self._seq:
+                return None
+            if self._log and cursor < self._log[0][0] - 1:
+                return None
+            if not self._log and cursor < self._seq:
+                return None
+            changed = {download_id for seq, download_id in self._log if seq > cursor}
+            return changed, self._seq
+
+    async def wait(self, cursor: int, timeout: float) -> bool:
+        """İmleçten sonra yeni bir değişiklik olana kadar bekle; zaman aşımında False"""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        event = self._changed
+        if self._seq > cursor:
+            return True
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
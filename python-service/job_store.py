@@ -0,0 +1,422 @@
+"""
+İndirme işi deposu
+
+İndirme durumlarını tutan, değiştirilebilir arka uçlu depo:
+- MemoryJobStore: süreç içi, biten işler için LRU + TTL sınırlı
+- SQLiteJobStore: diskte kalıcı; yeniden başlatmada bekleyen işler kurtarılır.
+  Birden fazla süreç aynı dosyayı paylaşabilir (shared=True); aktif işleri
+  sadece sahibi olan süreç (zamanlayıcı) bellekte tutar ve değiştirir.
+
+Her iki depo da aynı saklama politikasını uygular: bekleyen/çalışan işler
+asla silinmez, biten işler `retention_seconds` sonra veya sayıları
+`max_finished` değerini aşınca en eskiden başlanarak silinir. Üst işi
+(koleksiyon, toplu içe aktarma) hâlâ sürenlerin biten alt işleri de
+silinmez; üst işin ilerlemesi, tekrar deneme ve sonuç raporu onlara bakar.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("pending", "downloading")
+
+# Süreçler arası değişiklik kaydının saklanma süresi (saniye)
+CHANGE_LOG_SECONDS = 3600
+
+# SQLite'a sadece ilerleme değişen işler en fazla bu sıklıkta yazılır (saniye)
+PROGRESS_WRITE_INTERVAL = 2.0
+
+
+class JobStore:
+    """İş deposu arayüzü"""
+
+    def __init__(self, retention_seconds: float = 24 * 3600, max_finished: int = 1000):
+        self.retention_seconds = retention_seconds
+        self.max_finished = max_finished
+
+    def get(self, job_id: str) -> Optional[BaseModel]:
+        raise NotImplementedError
+
+    def add(self, job: BaseModel) -> None:
+        raise NotImplementedError
+
+    def save(self, job: BaseModel, force: bool = False) -> None:
+        """Yerinde değiştirilmiş bir işi kaydet; force=False ise yazım ertelenebilir"""
+        raise NotImplementedError
+
+    def delete(self, job_id: str) -> bool:
+        raise NotImplementedError
+
+    def query(
+        self,
+        statuses: Optional[Iterable[str]] = None,
+        since: Optional[float] = None,
+        limit: int = 100,
+        offset: int = 0,
+        parent_id: Optional[str] = None,
+        top_level: bool = False,
+    ) -> Tuple[List[BaseModel], int]:
+        """Filtrelenmiş, en yeniden eskiye sıralı sayfa ve toplam eşleşme sayısı
+
+        parent_id verilirse sadece o koleksiyonun alt işleri, top_level=True ise
+        sadece üst düzey işler (alt iş olmayanlar) döner.
+        """
+        raise NotImplementedError
+
+    def evict(self, now: Optional[float] = None) -> List[str]:
+        """Saklama politikasına göre biten işleri sil, silinen ID'leri döndür"""
+        raise NotImplementedError
+
+    def recoverable(self) -> List[BaseModel]:
+        """Önceki çalışmadan kalan bekleyen/çalışan işler"""
+        return []
+
+    def flush(self) -> None:
+        """Ertelenmiş yazımları diske aktar"""
+
+    def set_owner(self, owner: bool) -> None:
+        """Bu süreç aktif işlerin sahibi mi (paylaşılan depolarda zamanlayıcı süreç)"""
+
+    def changes_since(self, revision: int) -> Tuple[List[str], int]:
+        """Revizyondan sonra (başka süreçler dahil) yazılan işler ve yeni revizyon"""
+        return [], revision
+
+    def close(self) -> None:
+        self.flush()
+
+    def __contains__(self, job_id: str) -> bool:
+        return self.get(job_id) is not None
+
+    def __getitem__(self, job_id: str) -> BaseModel:
+        job = self.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        return job
+
+
+class MemoryJobStore(JobStore):
+    """Süreç içi depo; biten işler LRU + TTL ile sınırlandırılır"""
+
+    def __init__(self, retention_seconds: float = 24 * 3600, max_finished: int = 1000):
+        super().__init__(retention_seconds, max_finished)
+        self._jobs: Dict[str, BaseModel] = {}
+        # Biten işler, son güncellenme sırasına göre (en eski başta)
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, job_id: str) -> Optional[BaseModel]:
+        return self._jobs.get(job_id)
+
+    def add(self, job: BaseModel) -> None:
+        with self._lock:
+            self._jobs[job.id] = job
+            self._track(job)
+
+    def save(self, job: BaseModel, force: bool = False) -> None:
+        with self._lock:
+            if job.id in self._jobs:
+                self._track(job)
+
+    def _track(self, job: BaseModel) -> None:
+        if job.status in ACTIVE_STATUSES:
+            self._finished.pop(job.id, None)
+        else:
+            self._finished[job.id] = None
+            self._finished.move_to_end(job.id)
+
+    def delete(self, job_id: str) -> bool:
+        with self._lock:
+            self._finished.pop(job_id, None)
+            return self._jobs.pop(job_id, None) is not None
+
+    def query(self, statuses=None, since=None, limit=100, offset=0, parent_id=None, top_level=False):
+        jobs = list(self._jobs.values())
+        if parent_id is not None:
+            jobs = [job for job in jobs if job.parent_id == parent_id]
+        elif top_level:
+            jobs = [job for job in jobs if job.parent_id is None]
+        if statuses:
+            jobs = [job for job in jobs if job.status in statuses]
+        if since is not None:
+            jobs = [job for job in jobs if job.updated_at >= since]
+        jobs.sort(key=lambda job: job.created_at, reverse=True)
+        return jobs[offset:offset + limit], len(jobs)
+
+    def evict(self, now=None):
+        now = now if now is not None else time.time()
+        removed = []
+        with self._lock:
+            held = 0
+            for job_id in list(self._finished):
+                job = self._jobs.get(job_id)
+                if job is not None and self._parent_active(job):
+                    held += 1
+                    continue
+                expired = job is None or now - job.updated_at > self.retention_seconds
+                if not expired and len(self._finished) - held <= self.max_finished:
+                    break
+                self._finished.pop(job_id, None)
+                self._jobs.pop(job_id, None)
+                removed.append(job_id)
+        return removed
+
+    def _parent_active(self, job: BaseModel) -> bool:
+        parent = self._jobs.get(job.parent_id) if job.parent_id else None
+        return parent is not None and parent.status in ACTIVE_STATUSES
+
+
+class SQLiteJobStore(JobStore):
+    """SQLite üzerinde kalıcı depo; aktif işler bellekte de tutulur
+
+    shared=True ise dosya başka süreçlerle paylaşılır: set_owner(True)
+    çağrılana kadar işler bellekte tutulmaz, her okuma diskten yapılır ve
+    her yazım hemen diske gider.
+    """
+
+    def __init__(
+        self,
+        model: Type[BaseModel],
+        path: str,
+        retention_seconds: float = 24 * 3600,
+        max_finished: int = 1000,
+        shared: bool = False,
+    ):
+        super().__init__(retention_seconds, max_finished)
+        self._model = model
+        self.owner = not shared
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                data TEXT NOT NULL,
+                parent_id TEXT
+            )"""
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "parent_id" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN parent_id TEXT")
+        # Her yazım ve silme artan bir revizyonla kaydedilir; diğer süreçler değişiklikleri
+        # buradan izler. AUTOINCREMENT revizyonu silinen satırlardan sonra da geri almaz.
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS job_changes (
+                rev INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL,
+                changed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS job_changes_time ON job_changes(changed_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_parent ON jobs(parent_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, updated_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_created ON jobs(created_at)")
+        self._lock = threading.RLock()
+        # Aktif işlerin canlı nesneleri; yerinde değiştirilip save() ile yazılır
+        self._live: Dict[str, BaseModel] = {}
+        self._last_write: Dict[str, float] = {}
+        self._dirty: Dict[str, BaseModel] = {}
+
+    def _write(self, job: BaseModel) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO jobs (id, status, created_at, updated_at, data, parent_id) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (job.id, job.status, job.created_at, job.updated_at, job.model_dump_json(), job.parent_id),
+        )
+        self._record_changes([job.id])
+        self._last_write[job.id] = time.monotonic()
+        self._dirty.pop(job.id, None)
+
+    def _load(self, data: str) -> BaseModel:
+        return self._model.model_validate(json.loads(data))
+
+    def get(self, job_id: str) -> Optional[BaseModel]:
+        with self._lock:
+            job = self._live.get(job_id)
+            if job is not None:
+                return job
+            row = self._conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = self._load(row[0])
+        if self.owner and job.status in ACTIVE_STATUSES:
+            with self._lock:
+                job = self._live.setdefault(job_id, job)
+        return job
+
+    def add(self, job: BaseModel) -> None:
+        with self._lock:
+            if self.owner:
+                self._live[job.id] = job
+            self._write(job)
+
+    def save(self, job: BaseModel, force: bool = False) -> None:
+        with self._lock:
+            if not self.owner:
+                self._write(job)
+                return
+            recent = time.monotonic() - self._last_write.get(job.id, 0.0) < PROGRESS_WRITE_INTERVAL
+            if force or not recent or job.status not in ACTIVE_STATUSES:
+                self._write(job)
+            else:
+                self._dirty[job.id] = job
+            if job.status not in ACTIVE_STATUSES:
+                # Biten işler bellekten çıkarılır, sonraki okumalar diskten yapılır
+                self._live.pop(job.id, None)
+                self._last_write.pop(job.id, None)
+
+    def delete(self, job_id: str) -> bool:
+        with self._lock:
+            self._live.pop(job_id, None)
+            self._dirty.pop(job_id, None)
+            self._last_write.pop(job_id, None)
+            cursor = self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            if cursor.rowcount > 0:
+                self._record_changes([job_id])
+            return cursor.rowcount > 0
+
+    def _record_changes(self, job_ids: List[str]) -> None:
+        now = time.time()
+        self._conn.executemany(
+            "INSERT INTO job_changes (job_id, changed_at) VALUES (?, ?)", [(job_id, now) for job_id in job_ids]
+        )
+
+    def flush(self) -> None:
+        with self._lock:
+            for job in list(self._dirty.values()):
+                self._write(job)
+
+    def set_owner(self, owner: bool) -> None:
+        with self._lock:
+            if self.owner and not owner:
+                # Sahiplik devredilmeden önce bekleyen yazımlar diske aktarılır
+                self.flush()
+                self._live.clear()
+                self._last_write.clear()
+            self.owner = owner
+
+    def changes_since(self, revision: int) -> Tuple[List[str], int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id, rev FROM job_changes WHERE rev > ? ORDER BY rev", (revision,)
+            ).fetchall()
+        if not rows:
+            return [], revision
+        return list(dict.fromkeys(job_id for job_id, _ in rows)), rows[-1][1]
+
+    def query(self, statuses=None, since=None, limit=100, offset=0, parent_id=None, top_level=False):
+        clauses, params = [], []
+        if parent_id is not None:
+            clauses.append("parent_id = ?")
+            params.append(parent_id)
+        elif top_level:
+            clauses.append("parent_id IS NULL")
+        if statuses:
+            statuses = list(statuses)
+            clauses.append(f"status IN ({','.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if since is not None:
+            clauses.append("updated_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            self.flush()
+            total = self._conn.execute(f"SELECT COUNT(*) FROM jobs {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT id, data FROM jobs {where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+            # Aktif işler için canlı nesne döndür (diskteki kopya birkaç saniye geride olabilir)
+            jobs = [self._live.get(job_id) or self._load(data) for job_id, data in rows]
+        return jobs, total
+
+    def evict(self, now=None):
+        now = now if now is not None else time.time()
+        placeholders = ",".join("?" * len(ACTIVE_STATUSES))
+        # Üst işi sürmekte olan alt işler sayılmaz ve silinmez
+        evictable = (
+            f"status NOT IN ({placeholders}) AND (parent_id IS NULL OR parent_id NOT IN "
+            f"(SELECT id FROM jobs WHERE status IN ({placeholders})))"
+        )
+        with self._lock:
+            expired = [
+                row[0]
+                for row in self._conn.execute(
+                    f"SELECT id FROM jobs WHERE {evictable} AND updated_at < ?",
+                    list(ACTIVE_STATUSES) * 2 + [now - self.retention_seconds],
+                )
+            ]
+            overflow = [
+                row[0]
+                for row in self._conn.execute(
+                    f"SELECT id FROM jobs WHERE {evictable} AND updated_at >= ? "
+                    f"ORDER BY updated_at DESC LIMIT -1 OFFSET ?",
+                    list(ACTIVE_STATUSES) * 2 + [now - self.retention_seconds, self.max_finished],
+                )
+            ]
+            removed = expired + overflow
+            if removed:
+                self._conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in removed])
+                # Diğer süreçlerin SSE istemcileri de silinen işleri görsün
+                self._record_changes(removed)
+            # Diğer süreçler değişiklik kaydını saniyede birkaç kez okur; eski kayıtlar gereksiz
+            self._conn.execute("DELETE FROM job_changes WHERE changed_at < ?", (now - CHANGE_LOG_SECONDS,))
+        return removed
+
+    def recoverable(self):
+        placeholders = ",".join("?" * len(ACTIVE_STATUSES))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT data FROM jobs WHERE status IN ({placeholders}) ORDER BY created_at",
+                list(ACTIVE_STATUSES),
+            ).fetchall()
+        jobs = []
+        for (data,) in rows:
+            job = self._load(data)
+            with self._lock:
+                self._live[job.id] = job
+            jobs.append(job)
+        return jobs
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+
+def create_job_store(model: Type[BaseModel], shared: bool = False) -> JobStore:
+    """Ortam değişkenlerine göre iş deposunu oluştur (JOB_STORE=sqlite|memory)
+
+    shared=True ise depo diğer işçi süreçleriyle paylaşılır; bellek deposuna
+    düşülmez.
+    """
+    backend = os.getenv("JOB_STORE", "sqlite").lower()
+    retention = float(os.getenv("JOB_RETENTION_SECONDS", str(24 * 3600)))
+    max_finished = int(os.getenv("JOB_MAX_FINISHED", "1000"))
+
+    if backend == "memory":
+        if shared:
+            raise ValueError("JOB_STORE=memory cannot be shared between worker processes")
+        return MemoryJobStore(retention, max_finished)
+    if backend == "sqlite":
+        path = os.getenv("JOB_STORE_PATH", "../data/downloads.db")
+        try:
+            return SQLiteJobStore(model, path, retention, max_finished, shared=shared)
+        except sqlite3.Error as e:
+            if shared:
+                raise
+            logger.error(f"Failed to open job store at {path}, falling back to memory: {e}")
+            return MemoryJobStore(retention, max_finished)
+    raise ValueError(f"Unknown JOB_STORE backend: {backend}")
@@ -0,0 +1,73 @@
+"""
+Kütüphane dosya işlemleri
+
+Her indirme işi kendi hazırlık (staging) klasörüne iner; iş bitince
+sadece o klasördeki ses dosyaları atomik olarak kütüphane klasörüne
+taşınır. Böylece iş sonrası maliyet kütüphane boyutuna değil, işin
+kendi dosya sayısına bağlıdır ve eşzamanlı işler birbirinin dosyasını
+sahiplenmez.
+"""
+
+import logging
+import os
+import shutil
+import threading
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = (".mp3", ".m4a", ".opus", ".ogg", ".flac", ".wav")
+STAGING_DIRNAME = ".staging"
+
+# Eşzamanlı işler aynı boş ismi seçmesin
+_promote_lock = threading.Lock()
+
+
+def staging_dir_for(library_dir: str, job_id: str) -> str:
+    """İşe özel hazırlık klasörünün yolu"""
+    return os.path.join(library_dir, STAGING_DIRNAME, job_id)
+
+
+def _unique_target(library_dir: str, filename: str) -> str:
+    """Kütüphanede aynı isimde dosya varsa "Ad (2).mp3" gibi boş bir isim bul"""
+    base, ext = os.path.splitext(filename)
+    target = os.path.join(library_dir, filename)
+    counter = 2
+    while os.path.exists(target):
+        target = os.path.join(library_dir, f"{base} ({counter}){ext}")
+        counter += 1
+    return target
+
+
+def promote_staged_files(staging_dir: str, library_dir: str) -> List[str]:
+    """Hazırlık klasöründeki ses dosyalarını kütüphaneye taşı, yeni yolları döndür"""
+    if not os.path.isdir(staging_dir):
+        return []
+
+    promoted = []
+    for root, dirs, files in os.walk(staging_dir):
+        # Gizli alt klasörler (ör. kodlanmamış ham sesler) kütüphaneye taşınmaz
+        dirs[:] = [name for name in dirs if not name.startswith(".")]
+        for filename in sorted(files):
+            if not filename.lower().endswith(AUDIO_EXTENSIONS):
+                continue
+            source = os.path.join(root, filename)
+            with _promote_lock:
+                target = _unique_target(library_dir, filename)
+                # Aynı dosya sisteminde os.replace atomiktir; yarım dosya kütüphanede görünmez
+                os.replace(source, target)
+            promoted.append(target)
+    return promoted
+
+
+def remove_staging_dir(staging_dir: str) -> None:
+    """Hazırlık klasörünü (yarım kalmış dosyalarla birlikte) sil"""
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def clear_staging_area(library_dir: str) -> None:
+    """Önceki çalışmadan kalan tüm hazırlık klasörlerini temizle"""
+    staging_root = os.path.join(library_dir, STAGING_DIRNAME)
+    if os.path.isdir(staging_root):
+        shutil.rmtree(staging_root, ignore_errors=True)
+        logger.info("Cleared leftover staging directories")
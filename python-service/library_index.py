@@ -0,0 +1,249 @@
+"""
+İndirilmiş şarkı indeksi
+
+Kütüphaneye eklenen her dosya Spotify ID, ISRC, normalize edilmiş
+sanatçı/başlık anahtarı ve içerik hash'i ile SQLite'ta tutulur. Yeni bir
+iş planlanmadan önce bu indekse bakılır; kütüphanede zaten olan şarkılar
+tekrar indirilmez ve backend'e tekrar kaydedilmez.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from library import AUDIO_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+# Başlıktaki "(feat. X)", "[Remastered 2011]" gibi ekler eşleşmeyi bozmasın
+_BRACKETS_RE = re.compile(r"[\(\[][^\)\]]*[\)\]]")
+_NON_WORD_RE = re.compile(r"[^\w]+")
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def normalize_track_key(artist: Optional[str], title: Optional[str]) -> Optional[str]:
+    """Sanatçı/başlık çiftini karşılaştırılabilir bir anahtara çevir (sadece ilk sanatçı)"""
+    if not artist or not title:
+        return None
+    first_artist = re.split(r",|&| feat\. | ft\. ", artist, maxsplit=1)[0]
+    parts = []
+    for value in (first_artist, _BRACKETS_RE.sub(" ", title)):
+        parts.append(" ".join(_NON_WORD_RE.sub(" ", value.casefold()).split()))
+    if not all(parts):
+        return None
+    return " - ".join(parts)
+
+
+def key_from_filename(filename: str) -> Optional[str]:
+    """spotdl'in "Sanatçı - Başlık.mp3" dosya adından anahtar"""
+    base_name = os.path.splitext(os.path.basename(filename))[0]
+    if " - " not in base_name:
+        return None
+    artist, title = base_name.split(" - ", 1)
+    return normalize_track_key(artist, title)
+
+
+def file_hash(path: str) -> str:
+    """Dosya içeriğinin SHA-256 özeti (bloklayan çağrı)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LibraryIndex:
+    """Kütüphanedeki şarkıların SQLite indeksi"""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tracks (
+                path TEXT PRIMARY KEY,
+                spotify_id TEXT,
+                isrc TEXT,
+                track_key TEXT,
+                file_hash TEXT,
+                added_at REAL NOT NULL
+            )
+            """
+        )
+        for column in ("spotify_id", "isrc", "track_key", "file_hash"):
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_tracks_{column} ON tracks ({column})")
+        self._lock = threading.Lock()
+
+    def _find_by(self, column: str, value: Optional[str], untagged_only: bool = False) -> Optional[str]:
+        if not value:
+            return None
+        untagged = " AND spotify_id IS NULL AND isrc IS NULL" if untagged_only else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT path FROM tracks WHERE {column} = ?{untagged} ORDER BY added_at", (value,)
+            ).fetchall()
+        for (path,) in rows:
+            if os.path.exists(path):
+                return path
+            # Kütüphaneden silinmiş dosyanın kaydı
+            self.remove(path)
+        return None
+
+    def find(
+        self,
+        spotify_id: Optional[str] = None,
+        isrc: Optional[str] = None,
+        artist: Optional[str] = None,
+        title: Optional[str] = None,
+    ) -> Optional[str]:
+        """Şarkı kütüphanede varsa dosya yolunu döndür (en kesin anahtardan başlayarak)
+
+        Sanatçı/başlık anahtarı parantez içini ("(Live)", "(Remix)") atar; aynı
+        şarkının başka bir sürümüyle eşleşmemesi için ID ya da ISRC biliniyorsa
+        sadece kendi ID'si ve ISRC'si olmayan (etiketsiz) dosyalarda kullanılır.
+        """
+        key = normalize_track_key(artist, title)
+        if spotify_id or isrc:
+            return (
+                self._find_by("spotify_id", spotify_id)
+                or self._find_by("isrc", isrc)
+                or self._find_by("track_key", key, untagged_only=True)
+            )
+        return self._find_by("track_key", key)
+
+    def find_by_hash(self, digest: str) -> Optional[str]:
+        return self._find_by("file_hash", digest)
+
+    def add(
+        self,
+        path: str,
+        spotify_id: Optional[str] = None,
+        isrc: Optional[str] = None,
+        track_key: Optional[str] = None,
+        digest: Optional[str] = None,
+    ) -> None:
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO tracks (path, spotify_id, isrc, track_key, file_hash, added_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET
+                    spotify_id = COALESCE(excluded.spotify_id, spotify_id),
+                    isrc = COALESCE(excluded.isrc, isrc),
+                    track_key = COALESCE(excluded.track_key, track_key),
+                    file_hash = COALESCE(excluded.file_hash, file_hash)
+                """,
+                (os.path.abspath(path), spotify_id, isrc, track_key, digest, time.time()),
+            )
+
+    def remove(self, path: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM tracks WHERE path = ?", (os.path.abspath(path),))
+
+    def indexed_paths(self) -> Iterable[str]:
+        """İçerik hash'iyle indekslenmiş dosyalar (eksik kayıtlar senkronizasyonda tamamlanır)"""
+        with self._lock:
+            return [path for (path,) in self._conn.execute("SELECT path FROM tracks WHERE file_hash IS NOT NULL")]
+
+    def sync_directory(
+        self,
+        library_dir: str,
+        read_tags: Optional[Callable[[List[str]], Dict[str, Dict[str, Any]]]] = None,
+    ) -> int:
+        """İndekste olmayan mevcut kütüphane dosyalarını ekle (bloklayan çağrı)
+
+        Anahtarlar dosyanın etiketlerinden (read_tags: audio_tags.read_many;
+        spotdl'in yazdığı Spotify URL'si ve ISRC) ve içerik hash'inden alınır;
+        etiket yoksa dosya adından sanatçı/başlık anahtarı çıkarılır. Eski
+        sürümlerin sadece dosya adıyla eklediği kayıtlar da tamamlanır.
+        """
+        indexed = set(self.indexed_paths())
+        try:
+            entries = list(os.scandir(library_dir))
+        except FileNotFoundError:
+            return 0
+        pending = [
+            os.path.abspath(entry.path) for entry in entries
+            if entry.is_file() and entry.name.lower().endswith(AUDIO_EXTENSIONS)
+            and os.path.abspath(entry.path) not in indexed
+        ]
+        tags = read_tags(pending) if read_tags and pending else {}
+        added = 0
+        for path in pending:
+            file_tags = tags.get(path) or {}
+            try:
+                digest = file_hash(path)
+            except OSError as e:
+                logger.warning(f"Could not index {path}: {e}")
+                continue
+            self.add(
+                path,
+                spotify_id=file_tags.get("spotify_id"),
+                isrc=file_tags.get("isrc"),
+                track_key=(
+                    normalize_track_key(file_tags.get("artist"), file_tags.get("title"))
+                    or key_from_filename(path)
+                ),
+                digest=digest,
+            )
+            added += 1
+        return added
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def index_new_files(
+    index: "LibraryIndex",
+    files: List[str],
+    spotify_id: Optional[str] = None,
+    isrc: Optional[str] = None,
+    tags: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """Yeni kütüphane dosyalarını indekse ekle; içeriği zaten olanları sil
+
+    Dosyanın kendi etiketleri (tags: {yol: audio_tags metadata}) varsa
+    anahtarlar onlardan alınır. İşin Spotify ID/ISRC'si ise sadece iş tek
+    dosya ürettiğinde o dosyaya yazılır.
+    Dönüş: {"new": [yeni dosyalar], "existing": [aynı içerikli mevcut dosyalar]}
+    """
+    new_files: List[str] = []
+    existing: List[str] = []
+    single = len(files) == 1
+    for path in files:
+        digest = file_hash(path)
+        duplicate = index.find_by_hash(digest)
+        if duplicate is not None and os.path.abspath(duplicate) != os.path.abspath(path):
+            os.remove(path)
+            existing.append(duplicate)
+            continue
+        file_tags = (tags or {}).get(path) or {}
+        index.add(
+            path,
+            spotify_id=file_tags.get("spotify_id") or (spotify_id if single else None),
+            isrc=file_tags.get("isrc") or (isrc if single else None),
+            track_key=(
+                normalize_track_key(file_tags.get("artist"), file_tags.get("title"))
+                or key_from_filename(path)
+            ),
+            digest=digest,
+        )
+        new_files.append(path)
+    return {"new": new_files, "existing": existing}
+
+
+def create_library_index() -> Optional[LibraryIndex]:
+    """LIBRARY_INDEX_PATH'teki indeksi aç; açılamazsa tekilleştirme kapalı çalışır"""
+    path = os.getenv("LIBRARY_INDEX_PATH", "../data/library_index.db")
+    try:
+        return LibraryIndex(path)
+    except sqlite3.Error as e:
+        logger.error(f"Failed to open library index at {path}: {e}")
+        return None
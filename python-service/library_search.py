@@ -0,0 +1,298 @@
+"""
+Yerel kütüphane araması
+
+Aramaların çoğu zaten indirilmiş şarkılar için yapılır. Kütüphane
+klasöründeki dosyaların etiketleri bellekte bir ters indekste tutulur;
+/search önce buraya bakar ve Spotify'a gitmeden cevap verebilir.
+
+Sorgu kelimeleri sırasıyla tam eşleşme, önek (yazarken arama) ve yazım
+hatasına dayanıklı benzer kelime eşleşmesiyle aranır; her kelime en az bir
+alanda eşleşmelidir. İndeks başlangıçta klasör taranarak kurulur, tamamlanan
+her indirmede güncellenir ve klasör periyodik olarak yeniden taranır
+(dışarıdan eklenen/silinen dosyalar için; sadece yeni ya da değişmiş
+dosyaların etiketleri okunur).
+"""
+
+import bisect
+import difflib
+import itertools
+import logging
+import os
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from library import AUDIO_EXTENSIONS
+from library_index import normalize_track_key
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Alan ağırlıkları ve eşleşme türü çarpanları
+FIELD_WEIGHTS = {"title": 3.0, "artist": 2.0, "album": 1.0}
+PREFIX_FACTOR = 0.7
+FUZZY_FACTOR = 0.5
+# Tek bir önek en fazla bu kadar kelimeye genişletilir
+MAX_PREFIX_EXPANSION = 200
+# Benzer kelime araması bu uzunluktan kısa kelimelerde yapılmaz
+FUZZY_MIN_LENGTH = 4
+FUZZY_CUTOFF = 0.75
+
+
+def normalize_text(value: str) -> str:
+    """Aksanları at ve küçük harfe çevir ("Beyoncé" -> "beyonce", "IŞIK" -> "isik")"""
+    decomposed = unicodedata.normalize("NFKD", value.replace("ı", "i").replace("İ", "I"))
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def tokenize(value: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall(normalize_text(value)) if value else []
+
+
+@dataclass
+class LibraryTrack:
+    path: str
+    title: Optional[str]
+    artist: Optional[str]
+    album: Optional[str]
+    duration: Optional[float]
+    spotify_id: Optional[str]
+    isrc: Optional[str]
+    mtime: float = 0.0
+
+    @property
+    def filename(self) -> str:
+        return os.path.basename(self.path)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "title": self.title,
+            "artist": self.artist,
+            "album": self.album,
+            "duration": int(self.duration or 0),
+            "filename": self.filename,
+            "spotify_id": self.spotify_id,
+        }
+
+
+def track_from_tags(path: str, tags: Optional[Dict[str, Any]], mtime: float = 0.0) -> LibraryTrack:
+    """Etiketlerden kayıt oluştur; başlık/sanatçı yoksa spotdl dosya adından ("Sanatçı - Başlık") alınır"""
+    tags = tags or {}
+    title, artist = tags.get("title"), tags.get("artist")
+    if not title:
+        base_name = os.path.splitext(os.path.basename(path))[0]
+        if " - " in base_name:
+            name_artist, title = (part.strip() for part in base_name.split(" - ", 1))
+            artist = artist or name_artist
+        else:
+            title = base_name.strip()
+    return LibraryTrack(
+        path=os.path.abspath(path),
+        title=title,
+        artist=artist,
+        album=tags.get("album"),
+        duration=tags.get("duration"),
+        spotify_id=tags.get("spotify_id"),
+        isrc=tags.get("isrc"),
+        mtime=mtime,
+    )
+
+
+class LibrarySearchIndex:
+    """Kütüphane etiketlerinin bellek içi ters indeksi"""
+
+    def __init__(self):
+        self._tracks: Dict[int, LibraryTrack] = {}
+        self._by_path: Dict[str, int] = {}
+        # Kelime -> {kayıt: en yüksek alan ağırlığı}
+        self._postings: Dict[str, Dict[int, float]] = {}
+        # Sahiplik kontrolü için kesin anahtarlar
+        self._by_spotify_id: Dict[str, int] = {}
+        self._by_isrc: Dict[str, int] = {}
+        self._by_key: Dict[str, int] = {}
+        self._ids = itertools.count()
+        # Önek ve benzerlik aramaları için sıralı kelime listesi (değişince yeniden kurulur)
+        self._vocabulary: Optional[List[str]] = None
+        self._by_initial: Dict[str, List[str]] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._tracks)
+
+    def add(self, track: LibraryTrack) -> None:
+        with self._lock:
+            self._remove(track.path)
+            doc_id = next(self._ids)
+            self._tracks[doc_id] = track
+            self._by_path[track.path] = doc_id
+            for field, weight in FIELD_WEIGHTS.items():
+                for token in tokenize(getattr(track, field)):
+                    postings = self._postings.setdefault(token, {})
+                    if postings.get(doc_id, 0.0) < weight:
+                        if not postings:
+                            self._vocabulary = None
+                        postings[doc_id] = weight
+            if track.spotify_id:
+                self._by_spotify_id[track.spotify_id] = doc_id
+            if track.isrc:
+                self._by_isrc[track.isrc.upper()] = doc_id
+            key = normalize_track_key(track.artist, track.title)
+            if key:
+                self._by_key[key] = doc_id
+
+    def add_files(self, tags_by_path: Dict[str, Dict[str, Any]]) -> None:
+        """Yeni indirilen dosyaları etiketleriyle ekle"""
+        for path, tags in tags_by_path.items():
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            self.add(track_from_tags(path, tags, mtime))
+
+    def remove(self, path: str) -> None:
+        with self._lock:
+            self._remove(os.path.abspath(path))
+
+    def _remove(self, path: str) -> None:
+        doc_id = self._by_path.pop(path, None)
+        if doc_id is None:
+            return
+        track = self._tracks.pop(doc_id)
+        for field in FIELD_WEIGHTS:
+            for token in tokenize(getattr(track, field)):
+                postings = self._postings.get(token)
+                if postings is None:
+                    continue
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[token]
+                    self._vocabulary = None
+        for index, value in (
+            (self._by_spotify_id, track.spotify_id),
+            (self._by_isrc, track.isrc.upper() if track.isrc else None),
+            (self._by_key, normalize_track_key(track.artist, track.title)),
+        ):
+            if value and index.get(value) == doc_id:
+                del index[value]
+
+    def refresh(
+        self, library_dir: str, read_tags: Callable[[List[str]], Dict[str, Dict[str, Any]]]
+    ) -> Tuple[int, int]:
+        """Klasörü tara: yeni/değişmiş dosyaları ekle, silinenleri çıkar (bloklayan çağrı)
+
+        Dönüş: (eklenen, çıkarılan)
+        """
+        try:
+            entries = list(os.scandir(library_dir))
+        except FileNotFoundError:
+            entries = []
+        current: Dict[str, float] = {}
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                try:
+                    current[os.path.abspath(entry.path)] = entry.stat().st_mtime
+                except OSError:
+                    continue
+
+        with self._lock:
+            known = {path: self._tracks[doc_id].mtime for path, doc_id in self._by_path.items()}
+        removed = [path for path in known if path not in current]
+        for path in removed:
+            self.remove(path)
+        changed = [path for path, mtime in current.items() if known.get(path) != mtime]
+        if changed:
+            tags_by_path = read_tags(changed)
+            for path in changed:
+                self.add(track_from_tags(path, tags_by_path.get(path), current[path]))
+        return len(changed), len(removed)
+
+    def _ensure_vocabulary(self) -> List[str]:
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+            self._by_initial = {}
+            for token in self._vocabulary:
+                self._by_initial.setdefault(token[0], []).append(token)
+        return self._vocabulary
+
+    def _match(self, term: str) -> Dict[int, float]:
+        """Tek bir sorgu kelimesinin eşleştiği kayıtlar ve puanları"""
+        matches: Dict[int, float] = dict(self._postings.get(term, {}))
+        vocabulary = self._ensure_vocabulary()
+        start = bisect.bisect_left(vocabulary, term)
+        for token in itertools.islice(vocabulary, start, start + MAX_PREFIX_EXPANSION):
+            if not token.startswith(term):
+                break
+            if token == term:
+                continue
+            for doc_id, weight in self._postings[token].items():
+                matches[doc_id] = max(matches.get(doc_id, 0.0), weight * PREFIX_FACTOR)
+        if not matches and len(term) >= FUZZY_MIN_LENGTH:
+            candidates = self._by_initial.get(term[0], [])
+            for token in difflib.get_close_matches(term, candidates, n=5, cutoff=FUZZY_CUTOFF):
+                similarity = difflib.SequenceMatcher(None, term, token).ratio()
+                for doc_id, weight in self._postings[token].items():
+                    matches[doc_id] = max(matches.get(doc_id, 0.0), weight * FUZZY_FACTOR * similarity)
+        return matches
+
+    def search(self, query: str, limit: int = 10) -> List[LibraryTrack]:
+        """Sorgudaki tüm kelimelerle eşleşen şarkılar, en iyi eşleşme önce"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            scores: Optional[Dict[int, float]] = None
+            for term in terms:
+                matches = self._match(term)
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = {doc_id: score + matches[doc_id] for doc_id, score in scores.items() if doc_id in matches}
+                if not scores:
+                    return []
+            ranked = sorted(
+                scores.items(),
+                key=lambda item: (-item[1], len(self._tracks[item[0]].title or ""), item[0])
+            )
+            candidates = [self._tracks[doc_id] for doc_id, _ in ranked[:limit * 2]]
+
+        results = []
+        for track in candidates:
+            if not os.path.exists(track.path):
+                # Periyodik taramadan önce silinmiş dosya
+                self.remove(track.path)
+                continue
+            results.append(track)
+            if len(results) >= limit:
+                break
+        return results
+
+    def find(
+        self,
+        spotify_id: Optional[str] = None,
+        isrc: Optional[str] = None,
+        artist: Optional[str] = None,
+        title: Optional[str] = None,
+    ) -> Optional[LibraryTrack]:
+        """Şarkı kütüphanede varsa kaydı (en kesin anahtardan başlayarak)
+
+        Sanatçı/başlık anahtarı sadece ID ve ISRC bilinmiyorsa kullanılır
+        (bkz. LibraryIndex.find).
+        """
+        key = None if spotify_id or isrc else normalize_track_key(artist, title)
+        with self._lock:
+            for index, value in (
+                (self._by_spotify_id, spotify_id),
+                (self._by_isrc, isrc.upper() if isrc else None),
+                (self._by_key, key),
+            ):
+                doc_id = index.get(value) if value else None
+                if doc_id is not None:
+                    return self._tracks[doc_id]
+        return None
+
+    def tracks(self) -> Iterable[LibraryTrack]:
+        with self._lock:
+            return list(self._tracks.values())
@@ -14,21 +14,58 @@ import os
 import json
 import asyncio
 import aiofiles
+import aiohttp
 import time
 import uuid
-import requests
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import Callable, List, Optional, Dict, Any, Tuple
 from pathlib import Path
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from urllib.parse import quote
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, HttpUrl, Field
 import uvicorn
-from spotdl import Spotdl
-from spotdl.types.song import Song
 import logging
+import multiprocessing
 import threading
-from concurrent.futures import ThreadPoolExecutor
+from scheduler import DownloadScheduler, PRIORITY_TRACK, PRIORITY_COLLECTION
+from progress import SpotdlProgress, is_progress_line, read_lines
+from events import DownloadEventHub
+from job_store import ACTIVE_STATUSES, create_job_store
+from bulk_import import BulkItem, dedupe_urls, item_result, split_urls
+from coordination import COMMAND_CANCEL, COMMAND_ENQUEUE, COMMAND_RETRY, LeaderLease, create_shared_state
+from search_cache import SearchCache
+from search_client import SpotdlClientManager
+from rate_limit import (
+    UPSTREAM_SPOTIFY, AdaptiveLimiter, RateLimited, rate_limit_from_exception, rate_limit_from_text
+)
+from spotify_api import SpotifyAPI, SpotifyAuthError
+from backend_client import LibraryRegistrar
+from download_engine import DownloadEngineError, WarmDownloadEngine, kill_process_group
+from encoder import FFMPEG_CODECS, EncodeError, EncodePool, tag_track
+from library import (
+    clear_staging_area, promote_staged_files, remove_staging_dir, staging_dir_for
+)
+from library_index import create_library_index, index_new_files
+from library_search import LibrarySearchIndex
+from renditions import (
+    DEFAULT_PROFILES, RenditionError, build_renditions, lower_priority, missing_renditions, parse_profiles,
+    prune_renditions
+)
+from cover_art import IMAGE_ID_RE, NO_ART, CoverArtCache, create_cover_store, spotify_image_id
+from audio_tags import read_many as read_audio_metadata_many
+from audio_analysis import (
+    AnalysisError, analysis_response, analyze_to_sidecar, encode_sidecar, read_sidecar,
+    resolve_ffmpeg, sidecar_path
+)
+from metrics import (
+    REGISTRY, BACKEND_PENDING, DOWNLOAD_PHASE_SECONDS, DOWNLOAD_QUEUE_DEPTH, DOWNLOADS_FINISHED,
+    DOWNLOADS_RUNNING, ENCODES_RUNNING, FETCH_SLOTS_IN_USE, LIBRARY_TRACKS, SEARCH_BACKEND_SECONDS, SEARCH_CACHE_LOOKUPS,
+    SEARCH_SECONDS, SUBPROCESS_EXITS, SUBPROCESS_SECONDS, SUBPROCESS_TIMEOUTS, WARM_WORKERS,
+    InstrumentedProcessPoolExecutor, InstrumentedThreadPoolExecutor, PhaseTimer
+)
+from track_metadata import TrackMetadataResolver, create_metadata_cache, extract_track_id
 
 # Logging ayarları
 logging.basicConfig(level=logging.INFO)
@@ -49,6 +86,8 @@ app.add_middleware(
 class DownloadRequest(BaseModel):
     url: str
     output_path: Optional[str] = None
+    priority: Optional[int] = None  # Boş bırakılırsa URL türüne göre belirlenir
+    force: bool = False  # Kütüphanede olsa da yeniden indir
 
 class DownloadStatus(BaseModel):
     id: str
@@ -57,9 +96,32 @@ class DownloadStatus(BaseModel):
     message: str = ""
     song_info: Optional[Dict[str, Any]] = None
     file_path: Optional[str] = None
+    url: Optional[str] = None
+    priority: int = PRIORITY_TRACK
+    queue_position: Optional[int] = None  # 1 = sıradaki iş
+    queue_depth: int = 0
+    total_tracks: int = 0
+    completed_tracks: int = 0
+    current_track: Optional[str] = None
+    failed_tracks: int = 0
+    parent_id: Optional[str] = None  # Playlist/albüm alt işi ise üst işin ID'si
+    children: List[str] = Field(default_factory=list)
+    force_download: bool = False  # Kütüphanede olan şarkılar da indirilsin mi
+    timings: Dict[str, float] = Field(default_factory=dict)  # Aşama -> saniye (queued, resolving, downloading, ...)
+    created_at: float = Field(default_factory=time.time)
+    updated_at: float = Field(default_factory=time.time)
+
+class BulkDownloadRequest(BaseModel):
+    urls: List[str]
+    priority: Optional[int] = None
+    force: bool = False
 
 class SearchRequest(BaseModel):
     query: str
+    remote: bool = True  # False: sadece yerel kütüphanede ara
+
+class MetadataBatchRequest(BaseModel):
+    ids: List[str]  # Spotify şarkı ID'leri, URL'leri veya spotify:track: URI'leri
 
 class SearchResult(BaseModel):
     title: str
@@ -68,11 +130,147 @@ class SearchResult(BaseModel):
     duration: int
     url: str
     cover_url: Optional[str] = None
+    spotify_id: Optional[str] = None
+    isrc: Optional[str] = None
+    cover_urls: Optional[Dict[str, str]] = None  # Boyut -> servisten sunulan küçültülmüş kapak
+    in_library: bool = False  # Şarkı zaten indirilmiş mi
+    filename: Optional[str] = None  # İndirilmişse kütüphanedeki dosya
 
 # Global değişkenler
-downloads: Dict[str, DownloadStatus] = {}
-spotdl_client: Optional[Spotdl] = None
-executor = ThreadPoolExecutor(max_workers=4)  # Thread pool for SpotDL operations
+# Çok işçili çalışma (WEB_WORKERS > 1 ya da SHARED_STATE=true): işler ve ayarlar SQLite'ta paylaşılır,
+# indirmeleri sadece zamanlayıcı kirasını tutan süreç çalıştırır
+shared_state = create_shared_state()
+SCHEDULER_LEASE = "scheduler"
+SCHEDULER_LEASE_TTL = float(os.getenv("SCHEDULER_LEASE_TTL", "15"))  # saniye
+SHARED_POLL_INTERVAL = float(os.getenv("SHARED_POLL_INTERVAL", "0.25"))  # saniye
+SPOTIFY_CREDENTIALS_KEY = "spotify_credentials"
+# Bu sürecin uyguladığı son ayar sürümü ve gördüğü son iş revizyonu
+shared_versions = {"config": 0, "jobs": 0}
+coordination_tasks: set = set()
+# İndirme işleri (JOB_STORE=sqlite|memory, biten işler saklama süresi sonunda silinir)
+downloads = create_job_store(DownloadStatus, shared=shared_state is not None)
+JOB_MAINTENANCE_INTERVAL = 60.0  # saniye
+scheduler_tasks: set = set()
+executor = InstrumentedThreadPoolExecutor("spotdl", max_workers=4)  # Thread pool for SpotDL operations
+# İndirme sonrası dosya taşıma gibi bloklayan işler için ayrı havuz (search'ü aç bırakmasın)
+post_process_executor = InstrumentedThreadPoolExecutor("postprocess", max_workers=2, thread_name_prefix="postprocess")
+# İndirilen dosyaların etiket/süre okuması (backend kayıtları dosya adından değil etiketlerden oluşur)
+METADATA_WORKERS = int(os.getenv("METADATA_WORKERS", "2"))
+metadata_executor = InstrumentedThreadPoolExecutor(
+    "metadata", max_workers=METADATA_WORKERS, thread_name_prefix="metadata"
+)
+# Dalga formu/ses yüksekliği analizi CPU ağırlıklı; ayrı süreçlerde çalışır
+ANALYSIS_DIR = os.getenv("ANALYSIS_DIR", "../data/analysis")
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+# fork ile açılan işçiler o an açık istemci soketlerini miras alır: ana süreç boştaki keep-alive
+# bağlantısını kapatsa da bağlantı işçide açık kalır ve istemcinin sonraki isteği cevapsız kalır.
+# forkserver işçileri temiz bir sunucu sürecinden türetir.
+analysis_executor = InstrumentedProcessPoolExecutor(
+    "analysis",
+    max_workers=ANALYSIS_WORKERS,
+    mp_context=multiprocessing.get_context("forkserver") if os.name == "posix" else None
+)
+analysis_tasks: set = set()
+# Düşük bit hızlı yayın kopyaları (RENDITION_PROFILES="" ile kapatılır); kodlama indirmelerle
+# yarışmasın diye ayrı, önceliği düşürülmüş süreçlerde çalışır
+RENDITIONS_DIR = os.getenv("RENDITIONS_DIR", "../data/renditions")
+RENDITION_PROFILES = parse_profiles(os.getenv("RENDITION_PROFILES", DEFAULT_PROFILES))
+RENDITION_WORKERS = int(os.getenv("RENDITION_WORKERS", "1"))
+RENDITION_NICE = int(os.getenv("RENDITION_NICE", "10"))
+# Zamanlayıcı başlarken kopyası eksik kütüphane dosyaları da kodlanıp kaydedilir
+RENDITION_BACKFILL = os.getenv("RENDITION_BACKFILL", "false").lower() == "true"
+rendition_executor = InstrumentedProcessPoolExecutor(
+    "renditions",
+    max_workers=RENDITION_WORKERS,
+    mp_context=multiprocessing.get_context("forkserver") if os.name == "posix" else None,
+    initializer=lower_priority,
+    initargs=(RENDITION_NICE,)
+)
+rendition_tasks: set = set()
+
+# Müzik kütüphanesi klasörü (Node backend de buradan servis eder)
+UPLOADS_DIR = os.getenv("UPLOADS_DIR", "../uploads")
+# İndirilen şarkılar backend'e gruplar halinde kaydedilir (BACKEND_URL)
+library_registrar = LibraryRegistrar(
+    batch_size=int(os.getenv("LIBRARY_BATCH_SIZE", "50")),
+    linger_seconds=float(os.getenv("LIBRARY_BATCH_LINGER", "0.5"))
+)
+# Yayın kopyaları da aynı şekilde (toplu doldurmada şarkı başına songs.json yazılmasın)
+rendition_registrar = LibraryRegistrar(
+    batch_size=int(os.getenv("LIBRARY_BATCH_SIZE", "50")),
+    linger_seconds=2.0,
+    endpoint="renditions-batch",
+    item_name="rendition set"
+)
+
+# İndirme kuyruğu ayarları
+MAX_CONCURRENT_DOWNLOADS = int(os.getenv("MAX_CONCURRENT_DOWNLOADS", "2"))
+DOWNLOAD_TIMEOUT = int(os.getenv("DOWNLOAD_TIMEOUT", "300"))  # saniye (şarkı başına)
+# Yedek CLI yolu için spotdl çalıştırılabilir dosyası (benchmark'larda sahte spotdl verilir)
+SPOTDL_BIN = os.getenv("SPOTDL_BIN", "spotdl")
+# Playlist/albüm URL'leri şarkı bazında alt işlere bölünür
+FAN_OUT_COLLECTIONS = os.getenv("FAN_OUT_COLLECTIONS", "true").lower() != "false"
+MAX_PARALLEL_PER_COLLECTION = int(os.getenv("MAX_PARALLEL_PER_COLLECTION", "3"))
+# Toplu içe aktarmada tek istekte kabul edilen en fazla link
+MAX_BULK_URLS = int(os.getenv("MAX_BULK_URLS", "5000"))
+bulk_tasks: set = set()
+
+# İndirme pipeline'ı: ağ aşaması (çözümleme/eşleştirme/indirme) ve CPU aşaması (MP3 kodlama)
+# ayrı sınırlarla çalışır; bir şarkının kodlanması diğerinin indirilmesiyle örtüşür
+ENCODE_WORKERS = int(os.getenv("ENCODE_WORKERS", str(os.cpu_count() or 2)))
+# Kütüphaneye yazılan asıl dosyanın çıktı profili
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "mp3").lower()
+OUTPUT_BITRATE = os.getenv("OUTPUT_BITRATE", "320k")
+if OUTPUT_FORMAT not in FFMPEG_CODECS:
+    raise ValueError(f"Unsupported OUTPUT_FORMAT {OUTPUT_FORMAT!r}, expected one of {', '.join(FFMPEG_CODECS)}")
+encode_pool = EncodePool(ENCODE_WORKERS, bitrate=OUTPUT_BITRATE, audio_format=OUTPUT_FORMAT)
+
+# Upstream hız sınırları (AIMD): 429/"Too Many Requests" görülünce eşzamanlılık yarıya iner,
+# Retry-After kadar yeni çağrı başlatılmaz, başarılı çağrılarla sınır tekrar yükselir
+RATE_LIMIT_RETRIES = int(os.getenv("RATE_LIMIT_RETRIES", "3"))
+# Spotify çağrıları (arama, koleksiyon çözümleme, metadata)
+spotify_limiter = AdaptiveLimiter("spotify", max_limit=int(os.getenv("SPOTIFY_MAX_CONCURRENCY", "4")))
+# İndirmelerin ağ aşaması (çözümleme/eşleştirme/indirme); MAX_CONCURRENT_DOWNLOADS üst sınırdır
+download_limiter = AdaptiveLimiter("downloads", max_limit=MAX_CONCURRENT_DOWNLOADS)
+
+# Sıcak indirme motoru: spotdl'i bir kez yükleyen uzun ömürlü işçiler (DOWNLOAD_ENGINE=cli ile kapatılır)
+USE_WARM_ENGINE = os.getenv("DOWNLOAD_ENGINE", "pool").lower() != "cli"
+download_engine = WarmDownloadEngine(
+    size=int(os.getenv("DOWNLOAD_WORKERS", str(MAX_CONCURRENT_DOWNLOADS))),
+    settings={
+        "format": OUTPUT_FORMAT,
+        "bitrate": OUTPUT_BITRATE,
+        "threads": 1,
+        "simple_tui": True,
+    }
+)
+
+# Arama istemcisi (spotdl import'u ve kurulumu arka planda yapılır, event loop'u bloklamaz)
+spotdl_manager = SpotdlClientManager(
+    settings={
+        "output": UPLOADS_DIR,
+        "format": OUTPUT_FORMAT,
+        "bitrate": OUTPUT_BITRATE,
+        "threads": 1,  # Tek thread kullan
+        "quiet": False,
+        # Bu istemci sadece arama yapar; rich canlı ekranı süreç başına bir tane olabildiği
+        # için açık kalırsa yeni credential'larla ikinci istemci kurulamaz
+        "simple_tui": True,
+    },
+    executor=executor
+)
+
+# Arama önbelleği (aynı sorgular kısa süre içinde tekrar Spotify'a gitmesin)
+search_cache = SearchCache(
+    ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL", "600")),
+    max_entries=int(os.getenv("SEARCH_CACHE_SIZE", "512"))
+)
+
+# Durum olay akışı ayarları
+download_events = DownloadEventHub()
+EVENT_COALESCE_INTERVAL = float(os.getenv("EVENT_COALESCE_INTERVAL", "0.5"))  # saniye
+EVENT_HEARTBEAT_INTERVAL = 15.0  # saniye
+MAX_DOWNLOADS_PAGE_SIZE = 500
 
 # Spotify Client ayarları - Bu değerleri environment variable'lardan al
 SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID", "")
@@ -84,323 +282,1382 @@ current_spotify_credentials = {
     "client_secret": SPOTIFY_CLIENT_SECRET
 }
 
+# Spotify Web API istemcisi (önbellekli token + havuzlanmış HTTP oturumu)
+spotify_api = SpotifyAPI(
+    current_spotify_credentials["client_id"], current_spotify_credentials["client_secret"], limiter=spotify_limiter
+)
+# Toplu metadata çözümleyici (diskte önbellekli)
+metadata_resolver = TrackMetadataResolver(spotify_api, create_metadata_cache(), post_process_executor)
+MAX_METADATA_BATCH = 1000
+
+# İndirilmiş şarkı indeksi (Spotify ID / ISRC / sanatçı-başlık / içerik hash'i)
+library_index = create_library_index()
+# Yerel arama indeksi (her süreçte bellekte; /search önce buna bakar)
+library_search = LibrarySearchIndex()
+LIBRARY_RESCAN_INTERVAL = float(os.getenv("LIBRARY_RESCAN_INTERVAL", "60"))  # saniye
+LOCAL_SEARCH_LIMIT = int(os.getenv("LOCAL_SEARCH_LIMIT", "10"))
+library_search_refresh = asyncio.Event()
+library_tasks: set = set()
+
+# Küçültülmüş kapak görselleri (içerik adresli disk önbelleği)
+cover_store = create_cover_store()
+cover_art = CoverArtCache(cover_store, post_process_executor) if cover_store is not None else None
+cover_tasks: set = set()
+# Spotify görsel ID'si ve hash içerik adresidir, değişmez; dosya kapağı ise dosyayla değişebilir
+COVER_CACHE_CONTROL = "public, max-age=31536000, immutable"
+TRACK_COVER_CACHE_CONTROL = "public, max-age=86400"
+
 def init_spotdl():
-    """SpotDL istemcisini başlat"""
-    global spotdl_client
-    try:
-        if not current_spotify_credentials["client_id"] or not current_spotify_credentials["client_secret"]:
-            logger.warning("Spotify credentials not found. Some features may not work.")
-            # Spotify credentials olmadan da çalışabilir, sadece search fonksiyonu etkilenir
-            return None
-            
-        spotdl_client = Spotdl(
-            client_id=current_spotify_credentials["client_id"],
-            client_secret=current_spotify_credentials["client_secret"],
-            downloader_settings={
-                "output": "../uploads",
-                "format": "mp3",
-                "bitrate": "320k",
-                "threads": 1,  # Tek thread kullan
-                "quiet": False,
-            }
+    """SpotDL istemcisini arka planda (yeniden) başlat; hazır olunca /health'te görünür"""
+    client_id = current_spotify_credentials["client_id"]
+    client_secret = current_spotify_credentials["client_secret"]
+    if not client_id or not client_secret:
+        logger.warning("Spotify credentials not found. Some features may not work.")
+    # Spotify credentials olmadan da çalışabilir, sadece search fonksiyonu etkilenir
+    return spotdl_manager.start(client_id, client_secret)
+
+def is_scheduler() -> bool:
+    """İndirmeleri bu süreç mi çalıştırıyor? (tek süreçte her zaman, çok işçide kirayı tutan)"""
+    return shared_state is None or scheduler_lease.is_leader
+
+def worker_role() -> str:
+    if shared_state is None:
+        return "standalone"
+    return "scheduler" if scheduler_lease.is_leader else "worker"
+
+async def start_scheduler():
+    """Zamanlayıcı görevlerini başlat (tek süreçte başlangıçta, çok işçide kira alınınca)"""
+    downloads.set_owner(True)
+    # Önceki çalışmadan (ya da ölen zamanlayıcı süreçten) kalan işleri kuyruğa geri al
+    # (yarım dosyaları baştan indirirler)
+    clear_staging_area(UPLOADS_DIR)
+    if library_index is not None:
+        # Bu indeksten önce indirilmiş dosyalar da tekrar indirilmesin (etiketlerindeki Spotify ID/ISRC ile)
+        loop = asyncio.get_running_loop()
+        loop.run_in_executor(
+            post_process_executor, library_index.sync_directory, UPLOADS_DIR, read_audio_metadata_many
         )
-        logger.info("SpotDL client initialized successfully")
-        return spotdl_client
-    except Exception as e:
-        logger.error(f"Failed to initialize SpotDL: {e}")
-        return None
+    recover_pending_downloads()
+    task = asyncio.create_task(job_maintenance_loop())
+    scheduler_tasks.add(task)
+    task.add_done_callback(scheduler_tasks.discard)
+    if RENDITION_BACKFILL and RENDITION_PROFILES:
+        task = asyncio.create_task(rendition_backfill())
+        scheduler_tasks.add(task)
+        task.add_done_callback(scheduler_tasks.discard)
+    # İşçiler arka planda ısınır; hazır olana kadar indirmeler CLI ile yapılır
+    restart_download_engine()
+
+async def stop_scheduler():
+    """Kira kaybedilince indirmeleri durdur; bitmemiş işler yeni zamanlayıcıda kurtarılır"""
+    for task in list(scheduler_tasks):
+        task.cancel()
+    await download_scheduler.shutdown()
+    await download_engine.stop()
+    collection_children.clear()
+    downloads.set_owner(False)
+
+scheduler_lease = LeaderLease(
+    shared_state,
+    SCHEDULER_LEASE,
+    ttl=SCHEDULER_LEASE_TTL,
+    on_acquired=start_scheduler,
+    on_lost=stop_scheduler,
+    # Diğer işçiler /health'te kuyruk durumunu, işlerde kuyruk konumlarını buradan gösterir
+    info=lambda: {
+        "queue_depth": download_scheduler.depth,
+        "active_downloads": download_scheduler.running,
+        "queue": list(queue_positions)
+    }
+) if shared_state is not None else None
+
+def load_shared_config():
+    """Paylaşılan ayarlardaki güncel credential'ları al (runtime'da başka işçide güncellenmiş olabilir)"""
+    shared_state.seed_config(SPOTIFY_CREDENTIALS_KEY, dict(current_spotify_credentials))
+    value, shared_versions["config"] = shared_state.get_config(SPOTIFY_CREDENTIALS_KEY)
+    if value:
+        current_spotify_credentials["client_id"] = value.get("client_id", "")
+        current_spotify_credentials["client_secret"] = value.get("client_secret", "")
+        spotify_api.set_credentials(current_spotify_credentials["client_id"], current_spotify_credentials["client_secret"])
 
 @app.on_event("startup")
 async def startup_event():
     """Uygulama başlangıcında çalışacak fonksiyon"""
+    if shared_state is not None:
+        load_shared_config()
     init_spotdl()
     
     # Downloads klasörünü oluştur
-    os.makedirs("../uploads", exist_ok=True)
-    logger.info("Download service started")
+    os.makedirs(UPLOADS_DIR, exist_ok=True)
+    
+    # Her işçi kendi arama indeksini klasörden kurar
+    task = asyncio.create_task(library_search_loop())
+    library_tasks.add(task)
+    task.add_done_callback(library_tasks.discard)
+    
+    if shared_state is None:
+        await start_scheduler()
+    else:
+        # Diğer süreçlerin yazdığı iş değişiklikleri buradan itibaren SSE'ye aktarılır
+        _, shared_versions["jobs"] = downloads.changes_since(0)
+        task = asyncio.create_task(shared_state_loop())
+        coordination_tasks.add(task)
+        task.add_done_callback(coordination_tasks.discard)
+        # Kirayı alan işçi zamanlayıcıyı başlatır; diğerleri istekleri karşılar ve komut gönderir
+        scheduler_lease.start()
+    logger.info(f"Download service started ({worker_role()})")
+
+def restart_download_engine():
+    """Sıcak işçileri güncel credential'larla (yeniden) başlat"""
+    client_id = current_spotify_credentials["client_id"]
+    client_secret = current_spotify_credentials["client_secret"]
+    if not is_scheduler():
+        return
+    if USE_WARM_ENGINE and client_id and client_secret:
+        asyncio.create_task(download_engine.start(client_id, client_secret))
+    else:
+        asyncio.create_task(download_engine.stop())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Uygulama kapanırken çalışan indirmeleri durdur"""
+    for task in list(coordination_tasks) + list(library_tasks):
+        task.cancel()
+    await download_scheduler.shutdown()
+    await download_engine.stop()
+    post_process_executor.shutdown(wait=False)
+    metadata_executor.shutdown(wait=False)
+    for task in list(analysis_tasks) + list(rendition_tasks) + list(cover_tasks):
+        task.cancel()
+    analysis_executor.shutdown(wait=False, cancel_futures=True)
+    rendition_executor.shutdown(wait=False, cancel_futures=True)
+    downloads.close()
+    if scheduler_lease is not None:
+        # İşler diske yazıldıktan sonra kira bırakılır; başka işçi hemen devralır
+        scheduler_lease.stop()
+        shared_state.close()
+    if metadata_resolver.cache is not None:
+        metadata_resolver.cache.close()
+    if library_index is not None:
+        library_index.close()
+    if cover_art is not None:
+        await cover_art.close()
+        cover_store.close()
+    await library_registrar.close()
+    await rendition_registrar.close()
+    await spotify_api.close()
+
+def recover_pending_downloads():
+    """Yeniden başlatmadan önce bitmemiş işleri baştan kuyruğa ekle"""
+    recovered = downloads.recoverable()
+    requeued = []
+    for download in recovered:
+        if download.children:
+            # Koleksiyonun kendisi çalışmaz, bitmemiş alt işleri ayrıca kurtarılır
+            continue
+        if download.url is None:
+            # Linkleri çözülmeden kesilen toplu içe aktarma; linkler saklanmadığı için tekrar kuyruğa alınamaz
+            update_download(
+                download.id, status="failed", message="Bulk import was interrupted before its links were resolved"
+            )
+            continue
+        update_download(
+            download.id,
+            status="pending",
+            progress=0.0,
+            message="Recovered after restart, re-queued",
+            current_track=None
+        )
+        requeued.append(download)
+    enqueue_downloads(requeued, owner="recovered")
+    if recovered:
+        logger.info(f"Recovered {len(recovered)} unfinished download(s)")
+
+async def job_maintenance_loop():
+    """Biten eski işleri periyodik olarak sil ve ertelenmiş yazımları diske aktar"""
+    while True:
+        await asyncio.sleep(JOB_MAINTENANCE_INTERVAL)
+        try:
+            for download_id in downloads.evict():
+                download_events.publish(download_id)
+            downloads.flush()
+        except Exception as e:
+            logger.error(f"Job store maintenance error: {e}")
+
+async def library_search_loop():
+    """Arama indeksini kur ve periyodik olarak (ya da istenince) klasörle eşitle
+
+    Sadece yeni/değişmiş dosyaların etiketleri okunur; silinen dosyalar çıkarılır.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        library_search_refresh.clear()
+        try:
+            started = time.perf_counter()
+            added, removed = await loop.run_in_executor(
+                metadata_executor, library_search.refresh, UPLOADS_DIR, read_audio_metadata_many
+            )
+            if added or removed:
+                logger.info(
+                    f"Library search index: +{added} -{removed} files, {len(library_search)} tracks "
+                    f"({time.perf_counter() - started:.2f}s)"
+                )
+        except Exception as e:
+            logger.error(f"Library search refresh error: {e}")
+        try:
+            await asyncio.wait_for(library_search_refresh.wait(), LIBRARY_RESCAN_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+async def shared_state_loop():
+    """Paylaşılan durumu yokla (çok işçili çalışma)
+
+    Başka işçide güncellenen credential'lar uygulanır, diğer süreçlerin
+    yazdığı iş değişiklikleri bu sürecin SSE bağlantılarına aktarılır ve
+    zamanlayıcı süreçte diğer işçilerden gelen komutlar çalıştırılır.
+    """
+    while True:
+        await asyncio.sleep(SHARED_POLL_INTERVAL)
+        try:
+            if shared_state.config_version(SPOTIFY_CREDENTIALS_KEY) > shared_versions["config"]:
+                value, shared_versions["config"] = shared_state.get_config(SPOTIFY_CREDENTIALS_KEY)
+                value = value or {}
+                apply_spotify_credentials(value.get("client_id", ""), value.get("client_secret", ""))
+            changed, shared_versions["jobs"] = downloads.changes_since(shared_versions["jobs"])
+            for download_id in changed:
+                download_events.publish(download_id)
+                if not scheduler_lease.is_leader:
+                    # Zamanlayıcı süreçte biten indirmeler bu sürecin arama indeksine de eklensin
+                    download = downloads.get(download_id)
+                    if download is not None and download.status == "completed" and download.file_path:
+                        library_search_refresh.set()
+            if scheduler_lease.is_leader:
+                handle_commands(shared_state.take_commands())
+            else:
+                load_queue_positions()
+        except Exception as e:
+            logger.error(f"Shared state poll error: {e}")
+
+def handle_commands(commands: List[tuple]):
+    """Komutları sırayla çalıştır; art arda gelen kuyruğa ekleme istekleri toplu eklenir"""
+    batch: List[DownloadStatus] = []
+    batch_owner = None
+    for kind, download_id, owner in commands:
+        owner = owner or "default"
+        if kind == COMMAND_ENQUEUE:
+            download = downloads.get(download_id)
+            # Kira devralınırken kurtarılan işler zaten kuyruktadır
+            if download is None or download.status != "pending" or is_queued(download_id):
+                continue
+            if batch and owner != batch_owner:
+                enqueue_downloads(batch, owner=batch_owner)
+                batch = []
+            batch.append(download)
+            batch_owner = owner
+            continue
+        if batch:
+            enqueue_downloads(batch, owner=batch_owner)
+            batch = []
+        handle_command(kind, download_id, owner)
+    if batch:
+        enqueue_downloads(batch, owner=batch_owner)
+
+def handle_command(kind: str, download_id: str, owner: str):
+    """Başka bir işçiden gelen isteği zamanlayıcı süreçte çalıştır"""
+    download = downloads.get(download_id)
+    if download is None:
+        return
+    if kind == COMMAND_RETRY:
+        targets = retry_targets(download)
+        if targets:
+            requeue_downloads(download, targets, owner)
+    elif kind == COMMAND_CANCEL:
+        cancel_targets(cancellable_targets(download))
+    else:
+        logger.warning(f"Unknown shared command {kind} for {download_id}")
 
 @app.get("/health")
 async def health_check():
     """Sağlık kontrolü"""
+    queue = scheduler_status()
     return {
         "status": "healthy",
-        "spotdl_initialized": spotdl_client is not None,
-        "spotify_configured": bool(current_spotify_credentials["client_id"] and current_spotify_credentials["client_secret"])
+        "role": worker_role(),
+        "spotdl_initialized": spotdl_manager.ready,
+        "spotdl_state": spotdl_manager.state,
+        "spotdl_error": spotdl_manager.error,
+        "spotify_configured": bool(current_spotify_credentials["client_id"] and current_spotify_credentials["client_secret"]),
+        "queue_depth": queue["queue_depth"],
+        "active_downloads": queue["active_downloads"],
+        "rate_limits": {
+            "spotify": spotify_limiter.status(),
+            "downloads": download_limiter.status()
+        }
     }
 
+def scheduler_status() -> Dict[str, int]:
+    """Kuyruk durumu; zamanlayıcı başka süreçteyse onun kirada yayınladığı son değerler"""
+    if is_scheduler():
+        return {"queue_depth": download_scheduler.depth, "active_downloads": download_scheduler.running}
+    lease = shared_state.lease_info(SCHEDULER_LEASE)
+    info = lease["info"] if lease else {}
+    return {"queue_depth": info.get("queue_depth", 0), "active_downloads": info.get("active_downloads", 0)}
+
 @app.post("/search")
 async def search_music(request: SearchRequest):
     """Müzik arama"""
+    started = time.perf_counter()
+    # Kütüphanedeki eşleşmeler Spotify beklenmeden (ve Spotify yokken de) döner
+    local_results = [track.to_dict() for track in library_search.search(request.query, LOCAL_SEARCH_LIMIT)]
+    if not request.remote:
+        SEARCH_SECONDS.observe(time.perf_counter() - started, outcome="local")
+        return {"results": [], "local_results": local_results}
     try:
-        if not spotdl_client:
+        client = spotdl_manager.client
+        if client is None and spotdl_manager.state == "initializing":
+            SEARCH_SECONDS.observe(time.perf_counter() - started, outcome="unconfigured")
+            return {
+                "results": [],
+                "local_results": local_results,
+                "message": "Search is starting up, please try again in a few seconds."
+            }
+        if client is None:
+            SEARCH_SECONDS.observe(time.perf_counter() - started, outcome="unconfigured")
             return {
                 "results": [],
+                "local_results": local_results,
                 "message": "Spotify credentials not configured. Please set SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET environment variables."
             }
         
-        # SpotDL arama işlemini thread pool'da çalıştır
-        loop = asyncio.get_event_loop()
-        songs = await loop.run_in_executor(executor, search_songs_sync, request.query)
-        
-        results = []
-        for song in songs:
-            results.append(SearchResult(
-                title=song.name,
-                artist=", ".join(song.artists),
-                album=song.album_name,
-                duration=song.duration,
-                url=song.url,
-                cover_url=song.cover_url
-            ))
+        async def fetch_results():
+            # SpotDL arama işlemini thread pool'da çalıştır
+            loop = asyncio.get_event_loop()
+            with SEARCH_BACKEND_SECONDS.time():
+                # 429 gelirse sınırlayıcı bekler ve aramayı tekrar dener
+                songs = await spotify_limiter.call(
+                    lambda: loop.run_in_executor(executor, search_songs_sync, request.query, client),
+                    retries=RATE_LIMIT_RETRIES
+                )
+            return [
+                SearchResult(
+                    title=song.name,
+                    artist=", ".join(song.artists),
+                    album=song.album_name,
+                    duration=song.duration,
+                    url=song.url,
+                    cover_url=song.cover_url,
+                    cover_urls=cover_variant_urls(song.cover_url),
+                    spotify_id=song.song_id,
+                    isrc=song.isrc
+                )
+                for song in songs
+            ]
         
-        return {"results": results}
+        # Aynı sorgu önbellekteyse veya şu an aranıyorsa Spotify'a tekrar gidilmez
+        results = await search_cache.get_or_fetch(request.query, fetch_results)
+        SEARCH_SECONDS.observe(time.perf_counter() - started, outcome="ok")
+        return {"results": [mark_owned(result) for result in results], "local_results": local_results}
+    except RateLimited as e:
+        SEARCH_SECONDS.observe(time.perf_counter() - started, outcome="throttled")
+        retry_after = max(1, round(spotify_limiter.backoff_remaining or e.retry_after or 1))
+        raise HTTPException(
+            status_code=429,
+            detail="Spotify is rate limiting searches, please try again shortly",
+            headers={"Retry-After": str(retry_after)}
+        )
     except Exception as e:
+        SEARCH_SECONDS.observe(time.perf_counter() - started, outcome="error")
         logger.error(f"Search error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-def search_songs_sync(query: str):
+def mark_owned(result: SearchResult) -> SearchResult:
+    """Kütüphanede olan sonucu işaretle (önbellekteki nesne değiştirilmez; sahiplik sonradan değişebilir)"""
+    track = library_search.find(
+        spotify_id=result.spotify_id, isrc=result.isrc, artist=result.artist, title=result.title
+    )
+    if track is None:
+        return result
+    return result.model_copy(update={"in_library": True, "filename": track.filename})
+
+def cover_variant_urls(cover_url: Optional[str]) -> Optional[Dict[str, str]]:
+    """Spotify kapağının servisten sunulan küçültülmüş varyantları (boyut -> yol)"""
+    image_id = spotify_image_id(cover_url)
+    if cover_art is None or image_id is None:
+        return None
+    return {str(size): f"/covers/spotify/{image_id}/{size}" for size in cover_art.sizes}
+
+@app.get("/search/cache/stats")
+async def search_cache_stats():
+    """Arama önbelleği isabet/ıskalama istatistikleri"""
+    return search_cache.stats()
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrikleri"""
+    return Response(content=REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def search_songs_sync(query: str, client=None):
     """Şarkı arama (senkron wrapper)"""
     try:
-        return spotdl_client.search([query])
+        # İstemci çağıranda sabitlenir; arama sürerken yapılan değişim bu aramayı etkilemez
+        return (client or spotdl_manager.client).search([query])
     except Exception as e:
+        # Hız sınırı boş sonuç sayılmaz; çağıran sınırlayıcı bekleyip tekrar dener
+        throttle = rate_limit_from_exception(e)
+        if throttle is not None:
+            raise throttle from e
         logger.error(f"Search sync error: {e}")
         return []
 
+def classify_priority(url: str) -> int:
+    """URL türüne göre kuyruk önceliğini belirle (tekil şarkılar önce)"""
+    lowered = url.lower()
+    if any(kind in lowered for kind in ("/playlist/", "/album/", "/artist/", "list=")):
+        return PRIORITY_COLLECTION
+    return PRIORITY_TRACK
+
+def update_download(download_id: str, **changes):
+    """İndirme durumunu güncelle"""
+    download = downloads.get(download_id)
+    if download is None:
+        return None
+    # İptal edilen iş sadece yeniden denemeyle açılır; biten alt süreçler durumu ezemez
+    # (aşama süreleri yine de kaydedilir)
+    if (
+        download.status == "cancelled"
+        and changes.get("status") not in ("pending", "downloading")
+        and set(changes) != {"timings"}
+    ):
+        return download
+    status = changes.get("status")
+    if status in ("completed", "failed", "cancelled") and status != download.status:
+        DOWNLOADS_FINISHED.inc(kind="collection" if download.children else "track", status=status)
+    for key, value in changes.items():
+        setattr(download, key, value)
+    download.updated_at = time.time()
+    # Durum değişiklikleri hemen, sadece ilerleme değişiklikleri gecikmeli yazılabilir
+    downloads.save(download, force="status" in changes)
+    download_events.publish(download_id)
+    if download.parent_id:
+        refresh_collection(download.parent_id, download)
+    return download
+
+# Koleksiyon başına alt işlerin son (durum, ilerleme) bilgisi; toplamı hesaplarken diske gitmemek için
+collection_children: Dict[str, Dict[str, tuple]] = {}
+
+def refresh_collection(parent_id: str, child: DownloadStatus):
+    """Alt iş değişince üst işin toplam ilerlemesini ve durumunu güncelle"""
+    parent = downloads.get(parent_id)
+    if parent is None:
+        collection_children.pop(parent_id, None)
+        return
+    # Önbellek sadece zamanlayıcı süreçte tutulur; diğer işçiler (toplu içe aktarma) diskten hesaplar
+    state = collection_children.get(parent_id) if is_scheduler() else None
+    if state is None:
+        state = {}
+        for child_id in parent.children:
+            existing = downloads.get(child_id)
+            if existing is not None:
+                state[child_id] = (existing.status, existing.progress)
+        if is_scheduler():
+            collection_children[parent_id] = state
+    state[child.id] = (child.status, child.progress)
+    
+    total = max(len(parent.children), 1)
+    completed = sum(1 for status, _ in state.values() if status == "completed")
+    failed = sum(1 for status, _ in state.values() if status == "failed")
+    finished = sum(1 for status, _ in state.values() if status in ("completed", "failed", "cancelled"))
+    progress = sum(100.0 if status in ("failed", "cancelled") else value for status, value in state.values())
+    
+    changes = {
+        "progress": round(progress / total, 1),
+        "completed_tracks": completed,
+        "failed_tracks": failed,
+        "message": f"Downloaded {completed}/{total} tracks" + (f" ({failed} failed)" if failed else "")
+    }
+    if parent.status != "cancelled":
+        if finished >= total:
+            changes["status"] = "completed" if completed else "failed"
+            collection_children.pop(parent_id, None)
+        else:
+            changes["status"] = "downloading"
+    if changes.get("status") == parent.status:
+        changes.pop("status")
+    update_download(parent_id, **changes)
+
+# Bekleyen işlerin kuyruk konumları (iş ID'si -> 1'den başlayan sıra)
+#
+# Bir iş başlayınca arkasındaki tüm işlerin konumu değişir; bunları her
+# seferinde yazıp yayınlamak kuyruk uzunluğunun karesiyle büyür. Konumlar
+# bu yüzden iş kaydına yazılmaz, iş okunurken eklenir (bkz. queue_view).
+queue_positions: Dict[str, int] = {}
+
+def update_queue_positions(order: List[str]):
+    """Zamanlayıcının güncel sırasını kaydet"""
+    queue_positions.clear()
+    queue_positions.update((download_id, position) for position, download_id in enumerate(order, start=1))
+
+def load_queue_positions():
+    """Zamanlayıcı başka süreçteyse sırayı onun kirada yayınladığı listeden al"""
+    lease = shared_state.lease_info(SCHEDULER_LEASE)
+    update_queue_positions(lease["info"].get("queue", []) if lease else [])
+
+def queue_view(download: DownloadStatus) -> DownloadStatus:
+    """Kuyruktaki iş için okunma anındaki konumu içeren kopya
+
+    Konum değişiklikleri ayrıca yayınlanmaz; SSE istemcileri güncel konumu
+    anlık görüntüde ve işin bir sonraki değişikliğinde alır.
+    """
+    position = queue_positions.get(download.id)
+    if position is None:
+        return download
+    return download.model_copy(update={"queue_position": position, "queue_depth": len(queue_positions)})
+
+@app.post("/metadata/batch")
+async def get_metadata_batch(request: MetadataBatchRequest):
+    """Birden fazla şarkının metadata'sını Spotify'ın çoklu tracks isteğiyle getir"""
+    if not spotify_api.configured:
+        return {
+            "tracks": {},
+            "not_found": [],
+            "invalid": [],
+            "message": "Spotify credentials not configured. Please set SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET environment variables."
+        }
+    if len(request.ids) > MAX_METADATA_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_METADATA_BATCH} ids per request")
+    
+    track_ids, invalid = [], []
+    for value in request.ids:
+        track_id = extract_track_id(value)
+        if track_id:
+            track_ids.append(track_id)
+        else:
+            invalid.append(value)
+    
+    try:
+        resolved = await metadata_resolver.resolve(track_ids)
+    except Exception as e:
+        logger.error(f"Metadata batch error: {e}")
+        raise HTTPException(status_code=502, detail=str(e))
+    
+    return {
+        "tracks": {track_id: info for track_id, info in resolved.items() if info is not None},
+        "not_found": [track_id for track_id, info in resolved.items() if info is None],
+        "invalid": invalid
+    }
+
 @app.post("/download")
-async def start_download(request: DownloadRequest, background_tasks: BackgroundTasks):
+async def start_download(request: DownloadRequest, http_request: Request):
     """Müzik indirme işlemini başlat"""
     try:
         # Benzersiz bir ID oluştur
-        import uuid
         download_id = str(uuid.uuid4())
+        priority = request.priority if request.priority is not None else classify_priority(request.url)
+        
+        # Şarkı zaten kütüphanedeyse indirmeden bitmiş iş döndür
+        existing = None if request.force else await find_existing_track(request.url)
+        if existing is not None:
+            downloads.add(DownloadStatus(
+                id=download_id,
+                status="completed",
+                progress=100.0,
+                message="Already in library",
+                url=request.url,
+                priority=priority,
+                file_path=existing
+            ))
+            download_events.publish(download_id)
+            return {
+                "download_id": download_id,
+                "status": "already_in_library",
+                "file_path": existing
+            }
         
         # İndirme durumunu kaydet
-        downloads[download_id] = DownloadStatus(
+        downloads.add(DownloadStatus(
             id=download_id,
             status="pending",
-            message="Download queued"
-        )
-        
-        # Arka planda indirme işlemini başlat (thread pool'da)
-        background_tasks.add_task(run_download_in_thread, download_id, request.url, request.output_path)
+            message="Download queued",
+            url=request.url,
+            priority=priority,
+            force_download=request.force
+        ))
+        download_events.publish(download_id)
         
-        return {"download_id": download_id, "status": "started"}
-    except Exception as e:
-        logger.error(f"Download start error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        # Kuyruğa ekle; aynı öncelikteki işler istemciler arasında adil dağıtılır
+        owner = http_request.client.host if http_request.client else "default"
+        submit_download(download_id, owner=owner)
         
-        return {"download_id": download_id, "status": "started"}
+        return {
+            "download_id": download_id,
+            "status": "started",
+            "queue_position": queue_positions.get(download_id),
+            "queue_depth": scheduler_status()["queue_depth"]
+        }
     except Exception as e:
         logger.error(f"Download start error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-def run_download_in_thread(download_id: str, url: str, output_path: Optional[str] = None):
-    """İndirme işlemini ayrı thread'de çalıştır"""
+@app.post("/download/bulk")
+async def start_bulk_download(http_request: Request, priority: Optional[int] = None, force: bool = False):
+    """Birden fazla linki tek istekte indir; her linkin sonucu bitince NDJSON satırı olarak gönderilir
+
+    Gövde JSON ({"urls": [...], "priority", "force"}), düz metin (satır başına bir link) ya da
+    "file" alanında metin dosyası olan multipart form olabilir. Linkler normalize edilip tekrarları
+    ayıklanır; hepsi tek bir üst işin alt işleri olur. Bağlantı koparsa indirmeler devam eder,
+    üst işin durumu /download/{id}/status ile izlenebilir.
+    """
+    values, priority, force = await read_bulk_request(http_request, priority, force)
+    if len(values) > MAX_BULK_URLS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_URLS} URLs per request")
+    items = dedupe_urls(values)
+    unique = [item for item in items if item.url is not None and item.duplicate_of is None]
+    if not unique:
+        raise HTTPException(status_code=400, detail="No Spotify or YouTube URLs found")
+    
+    bulk_id = str(uuid.uuid4())
+    downloads.add(DownloadStatus(
+        id=bulk_id,
+        status="pending",
+        message=f"Resolving {len(unique)} links...",
+        priority=priority if priority is not None else PRIORITY_COLLECTION,
+        force_download=force
+    ))
+    download_events.publish(bulk_id)
+    
+    owner = http_request.client.host if http_request.client else "default"
+    # Bağlantıdan bağımsız çalışır; istemci koparsa da işler kuyruğa girer
+    task = asyncio.create_task(prepare_bulk_download(bulk_id, unique, owner))
+    bulk_tasks.add(task)
+    task.add_done_callback(bulk_tasks.discard)
+    
+    return StreamingResponse(
+        bulk_result_stream(http_request, bulk_id, items, task),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def read_bulk_request(http_request: Request, priority: Optional[int], force: bool):
+    """İstek gövdesinden link listesini oku (JSON, düz metin ya da yüklenen dosya)"""
+    content_type = http_request.headers.get("content-type", "")
+    if content_type.startswith("application/json"):
+        try:
+            body = BulkDownloadRequest.model_validate(await http_request.json())
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        values = [value for url in body.urls for value in split_urls(url)]
+        return values, body.priority if body.priority is not None else priority, body.force or force
+    if content_type.startswith("multipart/form-data"):
+        form = await http_request.form()
+        upload = form.get("file")
+        if upload is not None and hasattr(upload, "read"):
+            text = (await upload.read()).decode("utf-8", errors="replace")
+        else:
+            text = str(form.get("urls") or "")
+        return split_urls(text), priority, force
+    text = (await http_request.body()).decode("utf-8", errors="replace")
+    return split_urls(text), priority, force
+
+def match_existing_tracks(lookups: List[Tuple[str, Dict[str, Any]]]) -> List[Optional[str]]:
+    """(URL, şarkı bilgisi) listesindeki şarkılar kütüphanede varsa dosya yolları
+
+    Bloklayan çağrı; ağa çıkmaz, sadece yerel indeks ve metadata önbelleği okunur.
+    Bilgisi olmayan tekil şarkı linklerinin önbellekteki metadata'sı tek sorguyla alınır.
+    """
+    if library_index is None:
+        return [None] * len(lookups)
+    track_ids = [extract_track_id(url) for url, _ in lookups]
+    uncached = [
+        track_id for track_id, (_, info) in zip(track_ids, lookups)
+        if track_id and not (info.get("isrc") or info.get("title"))
+    ]
+    cached: Dict[str, Dict[str, Any]] = {}
+    if uncached and metadata_resolver.cache is not None:
+        cached = metadata_resolver.cache.get_many(list(dict.fromkeys(uncached)))
+    results: List[Optional[str]] = []
+    for track_id, (_, info) in zip(track_ids, lookups):
+        isrc, artist, title = info.get("isrc"), info.get("artist"), info.get("title")
+        if track_id and not (isrc or title):
+            # Tekil şarkı linki: metadata önbellekteyse ISRC/başlıkla da eşleştir
+            info = cached.get(track_id) or {}
+            isrc, artist, title = info.get("isrc"), info.get("artist"), info.get("title")
+        if not (track_id or isrc or title):
+            results.append(None)
+            continue
+        results.append(library_index.find(spotify_id=track_id, isrc=isrc, artist=artist, title=title))
+    return results
+
+async def find_existing_tracks(lookups: List[Tuple[str, Dict[str, Any]]]) -> List[Optional[str]]:
+    """match_existing_tracks'in SQLite sorguları event loop'u bloklamasın diye havuzda çalıştırılır"""
+    if library_index is None or not lookups:
+        return [None] * len(lookups)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(post_process_executor, match_existing_tracks, lookups)
+
+async def find_existing_track(
+    url: str,
+    isrc: Optional[str] = None,
+    artist: Optional[str] = None,
+    title: Optional[str] = None
+) -> Optional[str]:
+    """Şarkı kütüphanede varsa dosya yolunu döndür"""
+    return (await find_existing_tracks([(url, {"isrc": isrc, "artist": artist, "title": title})]))[0]
+
+async def run_download(download_id: str):
+    """Zamanlayıcının bir slot ayırdığı indirme işini çalıştır"""
+    download = downloads.get(download_id)
+    if download is None or download.status != "pending":
+        return
+    timer = PhaseTimer(download.timings)
     try:
-        download_song_subprocess(download_id, url, output_path)
-    except Exception as e:
-        logger.error(f"Thread download error for {download_id}: {e}")
-        downloads[download_id].status = "failed"
-        downloads[download_id].message = f"Thread error: {str(e)}"
+        await run_timed_download(download, timer)
+    finally:
+        update_download(download_id, timings=timer.timings)
 
-def download_song_subprocess(download_id: str, url: str, output_path: Optional[str] = None):
-    """SpotDL'i subprocess olarak çalıştır (event loop sorununu çözer)"""
+async def run_timed_download(download: DownloadStatus, timer: PhaseTimer):
+    download_id = download.id
+    if not download.force_download and not download.children:
+        # Kuyrukta beklerken aynı şarkı başka bir işle inmiş olabilir
+        song_info = download.song_info or {}
+        with timer.phase("resolving"):
+            existing = await find_existing_track(
+                download.url, isrc=song_info.get("isrc"), artist=song_info.get("artist"), title=song_info.get("title")
+            )
+        if existing is not None:
+            update_download(
+                download_id,
+                status="completed",
+                progress=100.0,
+                file_path=existing,
+                message="Already in library"
+            )
+            return
+    # Kuyruktan çıktı; istemciler konumun kalktığını görsün
+    download_events.publish(download_id)
     try:
-        import subprocess
-        import os
-        import time
-        
-        # Durumu güncelle
-        downloads[download_id].status = "downloading"
-        downloads[download_id].message = "Starting download..."
-        downloads[download_id].progress = 5.0
-        
-        # Output dizinini hazırla
-        output_dir = "../uploads"
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # SpotDL komutunu hazırla
-        cmd = [
-            "spotdl",
-            "download",
-            url,
-            "--output", output_dir,
-            "--format", "mp3",
-            "--bitrate", "320k",
-            "--threads", "1"
-        ]
-        
-        # Spotify credentials varsa ekle
-        if current_spotify_credentials["client_id"] and current_spotify_credentials["client_secret"]:
-            cmd.extend([
-                "--client-id", current_spotify_credentials["client_id"],
-                "--client-secret", current_spotify_credentials["client_secret"]
-            ])
-        
-        downloads[download_id].message = "Downloading with SpotDL..."
-        downloads[download_id].progress = 10.0
-        
-        # SpotDL'i çalıştır
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=300  # 5 dakika timeout
-        )
-        
-        if result.returncode == 0:
-            downloads[download_id].progress = 80.0
-            downloads[download_id].message = "Download completed, adding to library..."
-            
-            # İndirilen dosyayı bul ve veritabanına ekle
-            time.sleep(2)  # Dosyanın tamamen yazılmasını bekle
-            
-            # İndirilen dosyaları bul ve ekle
-            added_files = find_and_add_downloaded_files(download_id, output_dir)
-            
-            if added_files > 0:
-                downloads[download_id].status = "completed"
-                downloads[download_id].progress = 100.0
-                downloads[download_id].message = f"Successfully downloaded and added {added_files} song(s) to library"
-            else:
-                downloads[download_id].status = "completed"
-                downloads[download_id].progress = 100.0
-                downloads[download_id].message = "Download completed (check uploads folder)"
-            
-        else:
-            downloads[download_id].status = "failed"
-            downloads[download_id].message = f"SpotDL error: {result.stderr}"
-            logger.error(f"SpotDL failed: {result.stderr}")
-            
-    except subprocess.TimeoutExpired:
-        downloads[download_id].status = "failed"
-        downloads[download_id].message = "Download timeout (5 minutes)"
+        await download_song(download_id, download.url, timer)
     except Exception as e:
         logger.error(f"Download error for {download_id}: {e}")
-        downloads[download_id].status = "failed"
-        downloads[download_id].message = f"Error: {str(e)}"
+        update_download(download_id, status="failed", message=f"Download error: {str(e)}")
+
+def record_queue_wait(download_id: str, waited: float):
+    """Zamanlayıcı işi başlatırken kuyrukta geçen süreyi kaydet"""
+    download = downloads.get(download_id)
+    if download is None:
+        return
+    DOWNLOAD_PHASE_SECONDS.observe(waited, phase="queued")
+    update_download(download_id, timings={**download.timings, "queued": round(waited, 3)})
 
-def get_song_info_from_spotify(track_id: str):
-    """Spotify API'den şarkı bilgilerini al"""
+download_scheduler = DownloadScheduler(
+    run_download,
+    # Slot sadece ağ aşamasını kapsar (download_song kodlamaya geçerken bırakır); kuyruktan ancak
+    # indirmeye hemen başlayabilecek kadar iş çıkar ve öncelik/adalet sırası indirme aşamasında da geçerlidir
+    max_concurrent=MAX_CONCURRENT_DOWNLOADS,
+    on_queue_change=update_queue_positions,
+    max_per_group=MAX_PARALLEL_PER_COLLECTION,
+    on_start=record_queue_wait
+)
+
+# Anlık değerler /metrics okunurken hesaplanır
+DOWNLOAD_QUEUE_DEPTH.set_function(lambda: download_scheduler.depth)
+DOWNLOADS_RUNNING.set_function(lambda: download_scheduler.slots_in_use)
+ENCODES_RUNNING.set_function(lambda: encode_pool.active)
+WARM_WORKERS.set_function(lambda: download_engine.worker_count)
+BACKEND_PENDING.set_function(lambda: library_registrar.pending)
+LIBRARY_TRACKS.set_function(lambda: len(library_search))
+for cache_result in ("hits", "misses", "coalesced"):
+    SEARCH_CACHE_LOOKUPS.set_function(lambda key=cache_result: search_cache.stats()[key], result=cache_result)
+
+def should_fan_out(download: DownloadStatus) -> bool:
+    """Spotify playlist/albüm işi şarkı bazında alt işlere bölünebilir mi?"""
+    return (
+        FAN_OUT_COLLECTIONS
+        and spotdl_manager.ready
+        and download.parent_id is None
+        and "open.spotify.com/" in download.url
+        and classify_priority(download.url) == PRIORITY_COLLECTION
+    )
+
+def submit_download(download_id: str, owner: str):
+    """Yeni işi kuyruğa ver; zamanlayıcı başka bir süreçteyse ona komut olarak gönder"""
+    submit_downloads([download_id], owner)
+
+def submit_downloads(download_ids: List[str], owner: str):
+    """Yeni işleri tek seferde kuyruğa ver (toplu içe aktarma)"""
+    if is_scheduler():
+        enqueue_downloads([downloads[download_id] for download_id in download_ids], owner=owner)
+    else:
+        shared_state.send_commands(COMMAND_ENQUEUE, download_ids, owner)
+
+# Şarkılara çözülmekte olan koleksiyonlar (henüz zamanlayıcıda değiller)
+expanding_collections: set = set()
+
+def is_queued(download_id: str) -> bool:
+    return download_scheduler.is_scheduled(download_id) or download_id in expanding_collections
+
+def enqueue_downloads(batch: List[DownloadStatus], owner: str):
+    """İşleri zamanlayıcıya ver; koleksiyonlar önce şarkılara çözülür, diğerleri toplu eklenir"""
+    groups: Dict[tuple, List[str]] = {}
+    for download in batch:
+        if not download.children and should_fan_out(download):
+            expanding_collections.add(download.id)
+            task = asyncio.create_task(expand_collection(download.id, owner))
+            task.add_done_callback(lambda _, download_id=download.id: expanding_collections.discard(download_id))
+        else:
+            groups.setdefault((download.priority, download.parent_id), []).append(download.id)
+    for (priority, group), job_ids in groups.items():
+        download_scheduler.submit_many(job_ids, priority=priority, owner=owner, group=group)
+
+async def expand_collection(parent_id: str, owner: str):
+    """Playlist/albüm URL'sini şarkı listesine çöz ve her şarkı için alt iş oluştur"""
+    parent = downloads.get(parent_id)
+    if parent is None:
+        return
+    update_download(parent_id, message="Resolving tracks...")
+    
+    timer = PhaseTimer(parent.timings)
+    with timer.phase("resolving"):
+        unique_songs = await resolve_collection_songs(parent.url)
+        song_infos = [song_info_from_song(song) for song in unique_songs]
+        # Kütüphanede olan şarkılar tek havuz görevinde bulunur
+        existing = [None] * len(unique_songs) if parent.force_download else await find_existing_tracks(
+            [(song.url, info) for song, info in zip(unique_songs, song_infos)]
+        )
+    update_download(parent_id, timings=timer.timings)
+    
+    parent = downloads.get(parent_id)
+    if parent is None or parent.status != "pending":
+        return
+    if not unique_songs:
+        # Çözülemezse tek bir spotdl çağrısıyla indir
+        logger.warning(f"Could not resolve collection {parent.url}, downloading as a single job")
+        download_scheduler.submit(parent_id, priority=parent.priority, owner=owner)
+        return
+    
+    children = []
+    queued = []
+    for song, info, path in zip(unique_songs, song_infos, existing):
+        child_id, pending = add_child_download(parent, song.url, info, path)
+        children.append(child_id)
+        if pending:
+            queued.append(child_id)
+    
+    update_download(
+        parent_id,
+        status="downloading",
+        children=children,
+        total_tracks=len(children),
+        message=f"Downloaded 0/{len(children)} tracks"
+    )
+    if len(queued) < len(children):
+        # Kütüphanedekiler bitmiş sayılır (hepsi varsa koleksiyon hemen tamamlanır)
+        refresh_collection(parent_id, downloads.get(children[0]))
+    download_scheduler.submit_many(queued, priority=parent.priority, owner=owner, group=parent_id)
+    logger.info(
+        f"Collection {parent_id} expanded into {len(children)} track jobs "
+        f"({len(children) - len(queued)} already in library)"
+    )
+
+async def resolve_collection_songs(url: str) -> list:
+    """Playlist/albüm URL'sini tekil şarkılara çöz; çözülemezse boş liste"""
+    loop = asyncio.get_running_loop()
     try:
-        import requests
-        
-        if not current_spotify_credentials["client_id"] or not current_spotify_credentials["client_secret"]:
-            return None
-            
-        # Spotify API token al
-        auth_url = "https://accounts.spotify.com/api/token"
-        auth_data = {
-            "grant_type": "client_credentials",
-            "client_id": current_spotify_credentials["client_id"],
-            "client_secret": current_spotify_credentials["client_secret"]
-        }
-        
-        auth_response = requests.post(auth_url, data=auth_data, timeout=10)
-        if auth_response.status_code != 200:
-            return None
+        songs = await spotify_limiter.call(
+            lambda: loop.run_in_executor(executor, search_songs_sync, url),
+            retries=RATE_LIMIT_RETRIES
+        )
+    except RateLimited:
+        logger.warning(f"Spotify kept rate limiting while resolving {url}")
+        songs = []
+    # Aynı şarkı birden fazla kez geçebilir
+    return list({song.url: song for song in songs if song.url}.values())
+
+async def prepare_bulk_download(bulk_id: str, items: List[BulkItem], owner: str):
+    """Toplu içe aktarmanın linklerini şarkılara çöz, alt işleri oluşturup kuyruğa ver
+
+    Spotify şarkı linklerinin metadata'sı tek seferde toplu istekle (önbellekli) alınır ve
+    kütüphanede olanlar indirilmez. Playlist/albümler şarkılara çözülür; farklı linklerde
+    geçen aynı şarkı bir kez indirilir. Çözülemeyen koleksiyonlar ve YouTube linkleri tek
+    bir spotdl işiyle indirilir.
+    """
+    bulk = downloads.get(bulk_id)
+    if bulk is None:
+        return
+    timer = PhaseTimer(bulk.timings)
+    try:
+        with timer.phase("resolving"):
+            track_ids = {item.index: extract_track_id(item.url) for item in items}
+            metadata: Dict[str, Any] = {}
+            wanted = [track_id for track_id in track_ids.values() if track_id]
+            if wanted and spotify_api.configured:
+                try:
+                    metadata = await metadata_resolver.resolve(wanted)
+                except Exception as e:
+                    # Metadata olmadan da indirilebilir; sadece kütüphane eşleştirmesi zayıflar
+                    logger.warning(f"Bulk metadata lookup failed: {e}")
             
-        token = auth_response.json().get("access_token")
-        
-        # Track bilgilerini al
-        track_url = f"https://api.spotify.com/v1/tracks/{track_id}"
-        headers = {"Authorization": f"Bearer {token}"}
-        
-        track_response = requests.get(track_url, headers=headers, timeout=10)
-        if track_response.status_code != 200:
-            return None
+            collections = [
+                item for item in items
+                if not track_ids[item.index]
+                and "open.spotify.com/" in item.url
+                and FAN_OUT_COLLECTIONS
+                and spotdl_manager.ready
+            ]
+            # Spotify sınırlayıcısı çözümlemelerin eşzamanlılığını ayarlar
+            resolved = await asyncio.gather(*(resolve_collection_songs(item.url) for item in collections))
+            songs_by_index = {item.index: songs for item, songs in zip(collections, resolved)}
             
-        track_data = track_response.json()
+            # Her linkin şarkı URL'leri; farklı linklerde geçen aynı şarkı bir kez planlanır
+            planned: Dict[str, Optional[Dict[str, Any]]] = {}
+            item_urls: List[Tuple[BulkItem, List[str]]] = []
+            for item in items:
+                track_id = track_ids[item.index]
+                songs = songs_by_index.get(item.index)
+                if track_id:
+                    info = metadata.get(track_id) or {}
+                    entries = [(item.url, {
+                        "title": info.get("title"),
+                        "artist": info.get("artist"),
+                        "album": info.get("album"),
+                        "duration": info.get("duration"),
+                        "spotify_id": track_id,
+                        "isrc": info.get("isrc")
+                    } if info else None)]
+                elif songs:
+                    entries = [(song.url, song_info_from_song(song)) for song in songs]
+                else:
+                    # YouTube linki ya da çözülemeyen koleksiyon: tek bir spotdl çağrısıyla indirilir
+                    entries = [(item.url, None)]
+                for url, song_info in entries:
+                    planned.setdefault(url, song_info)
+                item_urls.append((item, [url for url, _ in entries]))
+            # Kütüphanede olan şarkılar tek havuz görevinde bulunur
+            existing = [None] * len(planned) if bulk.force_download else await find_existing_tracks(
+                [(url, song_info or {}) for url, song_info in planned.items()]
+            )
         
-        return {
-            "title": track_data["name"],
-            "artist": ", ".join([artist["name"] for artist in track_data["artists"]]),
-            "album": track_data["album"]["name"],
-            "duration": track_data["duration_ms"] // 1000
-        }
+        bulk = downloads.get(bulk_id)
+        if bulk is None or bulk.status != "pending":
+            return
+        children: List[str] = []
+        queued: List[str] = []
+        child_by_url: Dict[str, str] = {}
+        for (url, song_info), path in zip(planned.items(), existing):
+            child_id, pending = add_child_download(bulk, url, song_info, path)
+            child_by_url[url] = child_id
+            children.append(child_id)
+            if pending:
+                queued.append(child_id)
+        for item, urls in item_urls:
+            item.download_ids.extend(child_by_url[url] for url in urls)
         
+        update_download(
+            bulk_id,
+            status="downloading",
+            children=children,
+            total_tracks=len(children),
+            message=f"Downloaded 0/{len(children)} tracks",
+            timings=timer.timings
+        )
+        if len(queued) < len(children):
+            refresh_collection(bulk_id, downloads.get(children[0]))
+        elif not children:
+            update_download(bulk_id, status="failed", message="No tracks found")
+        submit_downloads(queued, owner=owner)
+        logger.info(
+            f"Bulk import {bulk_id}: {len(items)} links -> {len(children)} track jobs "
+            f"({len(children) - len(queued)} already in library)"
+        )
     except Exception as e:
-        logger.error(f"Spotify API error: {e}")
-        return None
+        logger.error(f"Bulk import {bulk_id} failed: {e}")
+        update_download(bulk_id, status="failed", message=f"Bulk import failed: {e}")
 
-def find_and_add_downloaded_file(download_id: str, output_dir: str):
-    """İndirilen dosyayı bul ve veritabanına ekle"""
-    try:
-        import os
-        import time
-        from pathlib import Path
-        
-        # Son eklenen dosyaları bul
-        files = []
-        for file in os.listdir(output_dir):
-            if file.endswith(".mp3"):
-                file_path = os.path.join(output_dir, file)
-                files.append((file_path, os.path.getctime(file_path)))
+def ndjson(data: Dict[str, Any]) -> str:
+    return json.dumps(data) + "\n"
+
+async def bulk_result_stream(request: Request, bulk_id: str, items: List[BulkItem], prepared: asyncio.Task):
+    """Toplu içe aktarma sonuçlarını satır satır gönder (her link işleri bitince bir satır)"""
+    cursor = download_events.cursor
+    unique = [item for item in items if item.url is not None and item.duplicate_of is None]
+    yield ndjson({
+        "event": "accepted",
+        "download_id": bulk_id,
+        "total": len(items),
+        "unique": len(unique),
+        "invalid": sum(1 for item in items if item.url is None),
+        "duplicates": sum(1 for item in items if item.duplicate_of is not None)
+    })
+    counts: Dict[str, int] = {}
+    
+    def report(item: BulkItem, jobs: List[DownloadStatus], expired: int = 0) -> str:
+        result = item_result(item, jobs, expired)
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+        return ndjson(result)
+    
+    for item in items:
+        if item.url is None or item.duplicate_of is not None:
+            yield report(item, [])
+    
+    await asyncio.shield(prepared)
+    pending = {item.index: item for item in unique}
+    # Alt iş -> onu içeren linkler (aynı şarkı birden fazla linkte geçebilir)
+    items_by_child: Dict[str, List[int]] = {}
+    for item in unique:
+        for child_id in item.download_ids:
+            items_by_child.setdefault(child_id, []).append(item.index)
+    to_check = set(pending)
+    # Alt işin görülen son hali; iş sonuç raporlanmadan depodan silinse de sonucu bilinir
+    last_seen: Dict[str, DownloadStatus] = {}
+    
+    def item_jobs(item: BulkItem) -> Tuple[List[DownloadStatus], int]:
+        """Linkin işleri ve kaydı hiç görülmeden silinmiş (sonucu bilinmeyen) iş sayısı"""
+        jobs, expired = [], 0
+        for child_id in item.download_ids:
+            job = downloads.get(child_id)
+            if job is None:
+                job = last_seen.get(child_id)
+            elif job.status not in ACTIVE_STATUSES:
+                last_seen[child_id] = job
+            if job is None:
+                # Depo sadece biten işleri siler
+                expired += 1
+            else:
+                jobs.append(job)
+        return jobs, expired
+    
+    while pending:
+        for index in sorted(to_check):
+            item = pending.get(index)
+            if item is None:
+                continue
+            jobs, expired = item_jobs(item)
+            if all(job.status not in ACTIVE_STATUSES for job in jobs):
+                del pending[index]
+                yield report(item, jobs, expired)
+        if not pending or await request.is_disconnected():
+            break
         
-        if not files:
-            return
-            
-        # En son oluşturulan dosyayı al
-        latest_file = max(files, key=lambda x: x[1])[0]
-        filename = os.path.basename(latest_file)
+        if not await download_events.wait(cursor, EVENT_HEARTBEAT_INTERVAL):
+            bulk = downloads.get(bulk_id)
+            yield ndjson({
+                "event": "progress",
+                "download_id": bulk_id,
+                "remaining": len(pending),
+                "progress": bulk.progress if bulk else None
+            })
+            to_check = set()
+            continue
+        # Hızlı ardışık güncellemeler tek kontrolde birleşir
+        await asyncio.sleep(EVENT_COALESCE_INTERVAL)
+        result = download_events.changes_since(cursor)
+        if result is None:
+            cursor = download_events.cursor
+            to_check = set(pending)
+            continue
+        changed, cursor = result
+        to_check = {index for child_id in changed for index in items_by_child.get(child_id, ())}
+    
+    bulk = downloads.get(bulk_id)
+    yield ndjson({
+        "event": "summary",
+        "download_id": bulk_id,
+        "status": bulk.status if bulk else None,
+        "results": counts,
+        "remaining": len(pending)
+    })
+
+def song_info_from_song(song) -> Dict[str, Any]:
+    """spotdl Song nesnesinden iş kaydındaki şarkı bilgisi"""
+    return {
+        "title": song.name,
+        "artist": ", ".join(song.artists),
+        "album": song.album_name,
+        "duration": song.duration,
+        "spotify_id": song.song_id,
+        "isrc": song.isrc
+    }
+
+def add_child_download(
+    parent: DownloadStatus, url: str, song_info: Optional[Dict[str, Any]] = None, existing: Optional[str] = None
+) -> tuple:
+    """Koleksiyona alt iş ekle; (iş ID'si, kuyruğa girmeli mi) döndür
+
+    Kütüphanede olan şarkılar (existing: find_existing_tracks ile önceden bulunan
+    dosya yolu) indirilmez, iş hemen tamamlanmış olarak eklenir.
+    """
+    child_id = str(uuid.uuid4())
+    song_info = song_info or {}
+    downloads.add(DownloadStatus(
+        id=child_id,
+        status="completed" if existing else "pending",
+        progress=100.0 if existing else 0.0,
+        message="Already in library" if existing else "Download queued",
+        url=url,
+        priority=parent.priority,
+        parent_id=parent.id,
+        force_download=parent.force_download,
+        total_tracks=1,
+        completed_tracks=1 if existing else 0,
+        file_path=existing,
+        song_info=song_info or None
+    ))
+    download_events.publish(child_id)
+    return child_id, existing is None
+
+async def run_spotdl_cli(url: str, output_dir: str, on_line: Callable[[str], None]):
+    """SpotDL CLI'ı asenkron subprocess olarak çalıştır (sıcak işçi yoksa yedek yol)"""
+    # SpotDL komutunu hazırla (simple-tui: satır bazlı, ayrıştırılabilir çıktı)
+    cmd = [
+        SPOTDL_BIN,
+        "download",
+        url,
+        "--output", output_dir,
+        "--format", OUTPUT_FORMAT,
+        "--bitrate", OUTPUT_BITRATE,
+        "--threads", "1",
+        "--simple-tui",
+        "--log-format", "%(message)s"
+    ]
+    
+    # Spotify credentials varsa ekle
+    if current_spotify_credentials["client_id"] and current_spotify_credentials["client_secret"]:
+        cmd.extend([
+            "--client-id", current_spotify_credentials["client_id"],
+            "--client-secret", current_spotify_credentials["client_secret"]
+        ])
+    
+    # Rich satırları kaydırmasın diye geniş terminal genişliği ver
+    env = {**os.environ, "COLUMNS": "1000", "PYTHONIOENCODING": "utf-8"}
+    started = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        env=env,
+        # İptalde spotdl'in başlattığı ffmpeg/yt-dlp süreçleri de birlikte öldürülür
+        start_new_session=os.name == "posix"
+    )
+    
+    async def consume_output():
+        await read_lines(process.stdout, on_line)
+        await process.wait()
+    
+    try:
+        await asyncio.wait_for(consume_output(), timeout=DOWNLOAD_TIMEOUT)
+    except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+        if isinstance(e, asyncio.TimeoutError):
+            SUBPROCESS_TIMEOUTS.inc(command="spotdl")
+        await asyncio.shield(kill_process_group(process))
+        raise
+    finally:
+        SUBPROCESS_SECONDS.observe(time.perf_counter() - started, command="spotdl")
+    
+    SUBPROCESS_EXITS.inc(command="spotdl", code=str(process.returncode))
+    if process.returncode != 0:
+        raise DownloadEngineError(f"spotdl exited with code {process.returncode}")
+
+async def download_song(download_id: str, url: str, timer: Optional[PhaseTimer] = None):
+    """Şarkıyı/koleksiyonu indir, kütüphaneye taşı ve kaydet (event loop'u bloklamaz)"""
+    timer = timer or PhaseTimer()
+    # Her iş kendi klasörüne iner; bitince sadece kendi dosyaları kütüphaneye taşınır
+    staging_dir = staging_dir_for(UPLOADS_DIR, download_id)
+    encode_tasks: List[asyncio.Task] = []
+    try:
+        # Durumu güncelle
+        update_download(download_id, status="downloading", message="Starting download...", progress=5.0)
         
-        # Basit dosya adından bilgi çıkar
-        name_parts = filename.replace(".mp3", "").split(" - ")
-        if len(name_parts) >= 2:
-            artist = name_parts[0]
-            title = " - ".join(name_parts[1:])
-        else:
-            title = filename.replace(".mp3", "")
-            artist = "Unknown Artist"
+        # Output dizinini hazırla
+        os.makedirs(staging_dir, exist_ok=True)
         
-        song_info = {
-            "title": title,
-            "artist": artist,
-            "album": "Downloaded",
-            "duration": 0
-        }
+        update_download(download_id, message="Downloading with SpotDL...", progress=10.0)
         
-        downloads[download_id].song_info = song_info
-        add_downloaded_file_to_database(download_id, output_dir, song_info, filename)
+        # Çıktı geldikçe ilerleme güncellenir, sadece son satırlar saklanır
+        tracker = SpotdlProgress(start=10.0, end=80.0)
+        # İlk şarkının sesi inmeye başlayana kadar geçen süre "resolving" sayılır
+        first_download_at: Optional[float] = None
+        # Denemede görülen hız sınırı ve başarısız şarkı olup olmadığı
+        throttle: Optional[RateLimited] = None
+        track_failed = False
         
-    except Exception as e:
-        logger.error(f"Error finding downloaded file: {e}")
-
-def add_downloaded_file_to_database(download_id: str, output_dir: str, song_info: dict, filename: str = None):
-    """İndirilen dosyayı Erotify veritabanına ekle"""
-    try:
-        import requests
-        import os
+        def on_output_line(line: str):
+            nonlocal first_download_at, throttle, track_failed
+            if first_download_at is None and line.endswith(": Downloading"):
+                first_download_at = time.perf_counter()
+            if line.endswith(": Error"):
+                track_failed = True
+            progressed = tracker.feed(line)
+            # Hız sınırı sadece hata satırlarında aranır; "Rate Limit" adlı bir şarkı sınır sayılmasın
+            if throttle is None and not is_progress_line(line):
+                throttle = rate_limit_from_text(tracker.redact_tracks(line))
+            if progressed:
+                update_download(
+                    download_id,
+                    progress=tracker.progress,
+                    message=tracker.message,
+                    total_tracks=tracker.total_tracks,
+                    completed_tracks=tracker.completed_tracks,
+                    current_track=tracker.current_track
+                )
         
-        if not filename:
-            # Dosya adını song_info'dan oluştur
-            safe_title = "".join(c for c in song_info["title"] if c.isalnum() or c in (' ', '-', '_')).strip()
-            safe_artist = "".join(c for c in song_info["artist"] if c.isalnum() or c in (' ', '-', '_')).strip()
-            filename = f"{safe_artist} - {safe_title}.mp3"
+        loop = asyncio.get_running_loop()
+        encoded_tracks = 0
         
-        # Erotify server'ına şarkı bilgilerini gönder
-        song_data = {
-            "title": song_info["title"],
-            "artist": song_info["artist"],
-            "album": song_info.get("album", "Downloaded"),
-            "duration": song_info.get("duration", 0),
-            "filename": filename,
-            "source": "spotdl"
-        }
+        async def encode_fetched_track(event: Dict[str, Any]):
+            """Pipeline'ın CPU aşaması: ham sesi kodla ve etiketle"""
+            nonlocal encoded_tracks
+            name = event["name"]
+            on_output_line(f"{name}: Converting")
+            try:
+                with timer.phase("encoding"):
+                    await encode_pool.encode(event["source"], event["output"], ffmpeg=event.get("ffmpeg") or "ffmpeg")
+                    on_output_line(f"{name}: Embedding metadata")
+                    try:
+                        await loop.run_in_executor(post_process_executor, tag_track, event["output"], event["song"])
+                    except Exception as e:
+                        # Etiketsiz de olsa dosya kullanılabilir
+                        logger.warning(f"Failed to tag {name}: {e}")
+                on_output_line(f"{name}: Done")
+            except (EncodeError, OSError) as e:
+                on_output_line(f"{name}: Error")
+                on_output_line(f"EncodeError: {e}")
+            encoded_tracks += 1
+            on_output_line(f"{encoded_tracks}/{max(tracker.total_tracks, encoded_tracks)} complete")
         
-        response = requests.post(
-            "http://localhost:3001/api/music/add-downloaded",
-            json=song_data,
-            timeout=10
-        )
+        def on_fetched(event: Dict[str, Any]):
+            # İşçi sıradaki şarkıyı indirirken bu şarkı kodlama havuzunda kodlanır
+            encode_tasks.append(asyncio.create_task(encode_fetched_track(event)))
         
-        if response.status_code == 200:
-            logger.info(f"Song added to Erotify database: {song_info['title']}")
+        try:
+            # Ağ aşaması sınırlı: slot sadece indirme sürerken tutulur, kodlama ayrı havuzda.
+            # Hız sınırına takılıp başarısız olan deneme, sınırlayıcının beklemesinden sonra tekrarlanır
+            attempt = 0
+            while True:
+                if download_limiter.locked():
+                    update_download(download_id, message="Waiting for a download slot...")
+                with timer.phase("slot_wait"):
+                    acquired_at = await download_limiter.acquire()
+                FETCH_SLOTS_IN_USE.inc()
+                fetch_started = time.perf_counter()
+                throttle, track_failed = None, False
+                outcome = "error"
+                try:
+                    # Sıcak işçi varsa onu kullan, yoksa CLI'ı başlat
+                    if download_engine.available:
+                        await download_engine.download(
+                            url, staging_dir, on_output_line, timeout=DOWNLOAD_TIMEOUT, on_fetched=on_fetched
+                        )
+                    else:
+                        await run_spotdl_cli(url, staging_dir, on_output_line)
+                    outcome = "ok"
+                except DownloadEngineError as e:
+                    throttle = throttle or rate_limit_from_text(tracker.redact_tracks(str(e)))
+                    track_failed = True
+                    if throttle is None or attempt >= RATE_LIMIT_RETRIES:
+                        raise
+                finally:
+                    retry_after = None
+                    if throttle is not None:
+                        # spotdl kendi içinde tekrar deneyip başarmış olsa da sınır düşer
+                        outcome, retry_after = "rate_limited", throttle.retry_after
+                        if throttle.upstream == UPSTREAM_SPOTIFY:
+                            # Spotify'a takılan indirme arama/metadata çağrılarını da yavaşlatır
+                            spotify_limiter.throttle(retry_after)
+                    download_limiter.release(acquired_at, outcome, retry_after)
+                    FETCH_SLOTS_IN_USE.dec()
+                    fetch_ended = time.perf_counter()
+                    split = first_download_at or fetch_ended
+                    timer.record("resolving", split - fetch_started)
+                    timer.record("downloading", fetch_ended - split)
+                if throttle is None or not track_failed or attempt >= RATE_LIMIT_RETRIES:
+                    break
+                
+                attempt += 1
+                # Önceki denemenin kodlamaları bitmeden aynı dosyalar tekrar kodlanmasın
+                if encode_tasks:
+                    await asyncio.gather(*encode_tasks)
+                wait = download_limiter.backoff_remaining
+                logger.warning(
+                    f"Download {download_id} rate limited by {throttle.upstream}, "
+                    f"retry {attempt}/{RATE_LIMIT_RETRIES} in {wait:.0f}s"
+                )
+                update_download(
+                    download_id,
+                    message=f"Rate limited upstream ({throttle.upstream}), retrying in {wait:.0f}s..."
+                )
+                tracker = SpotdlProgress(start=10.0, end=80.0)
+                first_download_at = None
+            # İndirme bitti; kalan kodlamalar sürerken sıradaki iş zamanlayıcı slotunu alabilir
+            download_scheduler.release(download_id)
+            if encode_tasks:
+                await asyncio.gather(*encode_tasks)
+        except DownloadEngineError as e:
+            error_output = tracker.tail() or str(e)
+            update_download(download_id, status="failed", message=f"SpotDL error: {error_output}")
+            logger.error(f"SpotDL failed: {error_output}")
         else:
-            logger.warning(f"Failed to add song to Erotify database: {response.status_code}")
+            update_download(
+                download_id,
+                progress=80.0,
+                message="Download completed, adding to library...",
+                current_track=None
+            )
+            
+            # Bu işin dosyalarını kütüphaneye taşı ve kaydet (bloklayan işler ayrı havuzda)
+            with timer.phase("registering"):
+                files = await loop.run_in_executor(
+                    post_process_executor, promote_staged_files, staging_dir, UPLOADS_DIR
+                )
+                # Dosyalar kütüphaneye taşındıktan sonra iptal gelse de indeksleme ve kayıt tamamlanır
+                files, existing, added_files = await asyncio.shield(commit_library_files(download_id, url, files))
+            # Dalga formu/ses yüksekliği analizi ve yayın kopyaları işin tamamlanmasını beklemez
+            schedule_analysis(files)
+            schedule_renditions(files)
+            
+            if added_files > 0:
+                update_download(
+                    download_id,
+                    status="completed",
+                    progress=100.0,
+                    file_path=files[0],
+                    message=f"Successfully downloaded and added {added_files} song(s) to library"
+                )
+            elif files:
+                update_download(
+                    download_id,
+                    status="completed",
+                    progress=100.0,
+                    file_path=files[0],
+                    message="Download completed (check uploads folder)"
+                )
+            elif existing:
+                update_download(
+                    download_id,
+                    status="completed",
+                    progress=100.0,
+                    file_path=existing[0],
+                    message="Already in library"
+                )
+            else:
+                update_download(
+                    download_id,
+                    status="failed",
+                    message="SpotDL finished but produced no audio files"
+                )
             
+    except asyncio.TimeoutError:
+        update_download(download_id, status="failed", message=f"Download timeout ({DOWNLOAD_TIMEOUT} seconds)")
     except Exception as e:
-        logger.error(f"Error adding song to Erotify database: {e}")
+        logger.error(f"Download error for {download_id}: {e}")
+        update_download(download_id, status="failed", message=f"Error: {str(e)}")
+    finally:
+        # Hata/iptalde bekleyen kodlamalar durdurulur (ffmpeg süreçleri öldürülür)
+        pending = [task for task in encode_tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        # Başarısız/iptal edilen işlerin yarım dosyaları da silinir
+        remove_staging_dir(staging_dir)
 
 @app.get("/download/{download_id}/status")
 async def get_download_status(download_id: str):
@@ -408,146 +1665,447 @@ async def get_download_status(download_id: str):
     if download_id not in downloads:
         raise HTTPException(status_code=404, detail="Download not found")
     
-    return downloads[download_id]
+    return queue_view(downloads[download_id])
 
 @app.get("/downloads")
-async def get_all_downloads():
-    """Tüm indirme durumlarını getir"""
-    return {"downloads": list(downloads.values())}
+async def get_all_downloads(
+    status: Optional[str] = None,
+    since: Optional[float] = None,
+    limit: int = 100,
+    offset: int = 0,
+    parent_id: Optional[str] = None,
+    include_children: bool = False
+):
+    """İndirme durumlarını sayfalı getir (status: virgülle ayrılmış liste, since: unix zamanı)
+
+    Playlist alt işleri varsayılan olarak listelenmez; parent_id ile bir koleksiyonun
+    alt işleri alınabilir.
+    """
+    statuses = [item.strip() for item in status.split(",") if item.strip()] if status else None
+    limit = max(1, min(limit, MAX_DOWNLOADS_PAGE_SIZE))
+    items, total = downloads.query(
+        statuses=statuses,
+        since=since,
+        limit=limit,
+        offset=max(offset, 0),
+        parent_id=parent_id,
+        top_level=not include_children
+    )
+    return {"downloads": [queue_view(item) for item in items], "total": total, "limit": limit, "offset": offset}
+
+def format_sse(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    """Server-Sent Events formatında tek bir mesaj oluştur"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+def download_snapshot() -> List[Dict[str, Any]]:
+    """SSE anlık görüntüsü: istemcinin listelediği üst düzey işler (alt işler deltalarla gelir)"""
+    return [
+        queue_view(download).model_dump()
+        for download in downloads.query(limit=MAX_DOWNLOADS_PAGE_SIZE, top_level=True)[0]
+    ]
+
+@app.get("/downloads/events")
+async def download_event_stream(request: Request, cursor: Optional[int] = None):
+    """İndirme durum değişikliklerini SSE ile gönder (sadece değişen alanlar)"""
+    # Tarayıcı yeniden bağlanırken son imleci Last-Event-ID başlığında gönderir
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        cursor = int(last_event_id)
+
+    async def event_stream():
+        position = cursor
+        # Bu bağlantıda gönderilen son durumlar; sadece farklar gönderilir
+        sent: Dict[str, Dict[str, Any]] = {}
+
+        if position is None or download_events.changes_since(position) is None:
+            position = download_events.cursor
+            snapshot = download_snapshot()
+            sent = {item["id"]: item for item in snapshot}
+            yield format_sse("snapshot", {"downloads": snapshot}, position)
+
+        while not await request.is_disconnected():
+            if not await download_events.wait(position, EVENT_HEARTBEAT_INTERVAL):
+                yield ": keep-alive\n\n"
+                continue
+
+            # Hızlı ardışık ilerleme güncellemelerini tek mesajda birleştir
+            await asyncio.sleep(EVENT_COALESCE_INTERVAL)
+            result = download_events.changes_since(position)
+            if result is None:
+                position = download_events.cursor
+                snapshot = download_snapshot()
+                sent = {item["id"]: item for item in snapshot}
+                yield format_sse("snapshot", {"downloads": snapshot}, position)
+                continue
+
+            changed_ids, position = result
+            changed, removed = [], []
+            for download_id in changed_ids:
+                download = downloads.get(download_id)
+                if download is None:
+                    removed.append(download_id)
+                    sent.pop(download_id, None)
+                    continue
+                current = queue_view(download).model_dump()
+                previous = sent.get(download_id, {})
+                delta = {key: value for key, value in current.items() if previous.get(key) != value}
+                if delta:
+                    delta["id"] = download_id
+                    changed.append(delta)
+                sent[download_id] = current
+
+            if changed or removed:
+                yield format_sse("update", {"changed": changed, "removed": removed}, position)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/download/{download_id}/retry")
+async def retry_download(download_id: str, http_request: Request):
+    """Başarısız/iptal edilen indirmeyi tekrar dene; koleksiyonlarda sadece bitmemiş alt işler"""
+    download = downloads.get(download_id)
+    if download is None:
+        raise HTTPException(status_code=404, detail="Download not found")
+    owner = http_request.client.host if http_request.client else "default"
+    
+    targets = retry_targets(download)
+    if targets is None:
+        raise HTTPException(status_code=400, detail="Only failed downloads can be retried")
+    if is_scheduler():
+        requeue_downloads(download, targets, owner)
+    else:
+        shared_state.send_command(COMMAND_RETRY, download_id, owner)
+    
+    return {"download_id": download_id, "retried": len(targets)}
+
+def retry_targets(download: DownloadStatus) -> Optional[List[DownloadStatus]]:
+    """Tekrar denenecek işler; koleksiyonlarda bitmemiş alt işler, tekrar denenemiyorsa None"""
+    if download.children:
+        return [child for child in (downloads.get(child_id) for child_id in download.children)
+                if child is not None and child.status in ("failed", "cancelled")]
+    if download.status in ("failed", "cancelled") and download.url:
+        return [download]
+    return None
+
+def requeue_downloads(download: DownloadStatus, targets: List[DownloadStatus], owner: str):
+    """Tekrar denenecek işleri sıfırlayıp kuyruğa ekle (zamanlayıcı süreçte)"""
+    if download.children and download.status == "cancelled":
+        update_download(download.id, status="downloading")
+    for target in targets:
+        update_download(
+            target.id,
+            status="pending",
+            progress=0.0,
+            message="Retry queued",
+            current_track=None,
+            completed_tracks=0,
+            timings={}
+        )
+    enqueue_downloads(targets, owner=owner)
 
 @app.delete("/download/{download_id}")
 async def cancel_download(download_id: str):
-    """İndirme işlemini iptal et"""
+    """İndirme işlemini iptal et; çalışan süreç öldürülür, koleksiyonlarda tüm alt işler iptal edilir"""
     if download_id not in downloads:
         raise HTTPException(status_code=404, detail="Download not found")
     
-    download = downloads[download_id]
-    if download.status in ["pending", "downloading"]:
-        download.status = "cancelled"
-        download.message = "Download cancelled by user"
+    targets = cancellable_targets(downloads[download_id])
+    if is_scheduler():
+        cancel_targets(targets)
+    else:
+        shared_state.send_command(COMMAND_CANCEL, download_id)
     
-    return {"message": "Download cancelled"}
+    return {"message": "Download cancelled", "cancelled": len(targets)}
 
-def find_and_add_downloaded_files(download_id: str, output_dir: str) -> int:
-    """İndirilen dosyaları bul ve veritabanına ekle"""
-    added_count = 0
-    
+def cancellable_targets(download: DownloadStatus) -> List[DownloadStatus]:
+    """İşin kendisi ve alt işlerinden hâlâ bekleyen/çalışanlar"""
+    targets = [download] + [child for child in (downloads.get(child_id) for child_id in download.children)
+                            if child is not None]
+    return [target for target in targets if target.status in ACTIVE_STATUSES]
+
+def cancel_targets(targets: List[DownloadStatus]):
+    """İşleri iptal et (zamanlayıcı süreçte)"""
+    for target in targets:
+        # Önce durum yazılır ki iptal edilen görev sonradan "failed"/"completed" yazamasın
+        update_download(
+            target.id,
+            status="cancelled",
+            message="Download cancelled by user",
+            current_track=None
+        )
+    # Kuyruktakiler çıkarılır, çalışanların görevi iptal edilir (spotdl/ffmpeg öldürülür, yarım dosyalar silinir)
+    download_scheduler.cancel_many(target.id for target in targets)
+
+async def commit_library_files(download_id: str, url: str, files: List[str]):
+    """Yeni dosyaların etiketlerini oku, indeksle (içeriği zaten olanları at) ve backend'e kaydet
+
+    Dönüş: (yeni dosyalar, aynı içerikli mevcut dosyalar, kaydedilen sayısı)
+    """
+    if not files:
+        return files, [], 0
+    loop = asyncio.get_running_loop()
+    tags = await loop.run_in_executor(metadata_executor, read_audio_metadata_many, files)
+    existing: List[str] = []
+    if library_index is not None:
+        download = downloads.get(download_id)
+        song_info = (download.song_info if download else None) or {}
+        result = await loop.run_in_executor(
+            post_process_executor,
+            index_new_files,
+            library_index,
+            files,
+            extract_track_id(url) or song_info.get("spotify_id"),
+            song_info.get("isrc"),
+            tags
+        )
+        files, existing = result["new"], result["existing"]
+    library_search.add_files({filepath: tags.get(filepath) or {} for filepath in files})
+    added_files = await register_downloaded_files(files, tags)
+    return files, existing, added_files
+
+def track_cover_urls(files: List[str], tags: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+    """Gömülü kapağı olan dosyalar için en büyük varyantın yolu; küçültme arka planda yapılır"""
+    if cover_art is None:
+        return {}
+    covers = {
+        path: f"/covers/track/{quote(os.path.basename(path))}/{cover_art.sizes[-1]}"
+        for path in files
+        if (tags.get(path) or {}).get("has_cover")
+    }
+    for path in covers:
+        task = asyncio.create_task(warm_track_cover(path))
+        cover_tasks.add(task)
+        task.add_done_callback(cover_tasks.discard)
+    return covers
+
+async def warm_track_cover(path: str):
+    """Kapağı kütüphane görünümü istemeden önce çıkarıp küçült"""
     try:
-        if not os.path.exists(output_dir):
-            logger.warning(f"Output directory does not exist: {output_dir}")
-            return 0
-            
-        # Son 5 dakikada oluşturulan/değiştirilen dosyaları bul
-        current_time = time.time()
-        cutoff_time = current_time - 300  # 5 dakika
-        
-        for filename in os.listdir(output_dir):
-            if filename.endswith('.mp3'):
-                filepath = os.path.join(output_dir, filename)
-                file_mtime = os.path.getmtime(filepath)
-                
-                if file_mtime > cutoff_time:
-                    # Bu dosya yeni indirildi
-                    success = add_single_file_to_database(filename, filepath)
-                    if success:
-                        added_count += 1
-                        logger.info(f"Added {filename} to database")
-                    else:
-                        logger.warning(f"Failed to add {filename} to database")
-                        
+        await cover_art.track(path)
     except Exception as e:
-        logger.error(f"Error finding downloaded files: {e}")
+        logger.warning(f"Cover art extraction failed for {path}: {e}")
+
+async def register_downloaded_files(
+    files: List[str], tags: Optional[Dict[str, Dict[str, Any]]] = None
+) -> int:
+    """İşin kütüphaneye taşınan dosyalarını backend'e kaydet (diğer işlerle toplu gönderilir)"""
+    if not files:
         return 0
-        
-    return added_count
+    if tags is None:
+        loop = asyncio.get_running_loop()
+        tags = await loop.run_in_executor(metadata_executor, read_audio_metadata_many, files)
+    covers = track_cover_urls(files, tags)
+    results = await library_registrar.register_many([
+        downloaded_song_entry(os.path.basename(filepath), tags.get(filepath), covers.get(filepath))
+        for filepath in files
+    ])
+    return sum(results)
 
+def downloaded_song_entry(
+    filename: str, metadata: Optional[Dict[str, Any]] = None, cover_url: Optional[str] = None
+) -> Dict[str, Any]:
+    """Dosyanın etiketlerinden backend'e gönderilecek şarkı kaydını oluştur
+
+    Etiketi olmayan alanlar için dosya adına ("Artist - Song Title.mp3") düşülür.
+    """
+    metadata = metadata or {}
+    base_name = os.path.splitext(filename)[0]
+    
+    if " - " in base_name:
+        artist, title = base_name.split(" - ", 1)
+        artist = artist.strip()
+        title = title.strip()
+    else:
+        # Fallback
+        artist = "Unknown Artist"
+        title = base_name.strip()
+    
+    entry = {
+        "id": str(uuid.uuid4()),
+        "title": metadata.get("title") or title,
+        "artist": metadata.get("artist") or artist,
+        "filename": filename,
+        "source": "downloaded",
+        "duration": metadata.get("duration") or 0,
+        "createdAt": datetime.now().isoformat()
+    }
+    optional_fields = {
+        "album": metadata.get("album"),
+        "bitrate": metadata.get("bitrate"),
+        "sampleRate": metadata.get("sample_rate"),
+        "genre": metadata.get("genre"),
+        "year": metadata.get("year"),
+        "coverUrl": cover_url,
+    }
+    entry.update({key: value for key, value in optional_fields.items() if value})
+    return entry
 
-def add_single_file_to_database(filename: str, filepath: str) -> bool:
-    """Tek bir dosyayı veritabanına ekle"""
+async def analyze_library_file(path: str) -> Optional[Dict[str, Any]]:
+    """Dosyayı süreç havuzunda analiz edip yan dosyasını yaz"""
+    loop = asyncio.get_running_loop()
     try:
-        # Dosya adından şarkı bilgilerini çıkar
-        # Format genelde: "Artist - Song Title.mp3"
-        base_name = os.path.splitext(filename)[0]
-        
-        if " - " in base_name:
-            artist, title = base_name.split(" - ", 1)
-            artist = artist.strip()
-            title = title.strip()
-        else:
-            # Fallback
-            artist = "Unknown Artist"
-            title = base_name.strip()
-        
-        # Unique ID oluştur
-        song_id = str(uuid.uuid4())
-        
-        # Song objesi oluştur
-        song_data = {
-            "id": song_id,
-            "title": title,
-            "artist": artist,
-            "filename": filename,
-            "source": "downloaded",
-            "duration": 0,  # Bu daha sonra client'ta hesaplanacak
-            "createdAt": datetime.now().isoformat()
-        }
-        
-        # Erotify backend'ine ekle
-        response = requests.post(
-            f"http://localhost:3001/api/music/add-downloaded",
-            json=song_data,
-            timeout=10
+        return await loop.run_in_executor(
+            analysis_executor, analyze_to_sidecar, path, ANALYSIS_DIR, resolve_ffmpeg()
         )
-        
-        if response.status_code == 200:
-            logger.info(f"Successfully added {filename} to database")
-            return True
-        else:
-            logger.error(f"Failed to add to database: {response.status_code} - {response.text}")
-            return False
-            
+    except AnalysisError as e:
+        logger.warning(f"Analysis failed: {e}")
+    except Exception as e:
+        logger.error(f"Analysis error for {path}: {e}")
+    return None
+
+def schedule_analysis(files: List[str]):
+    """Yeni kütüphane dosyalarını arka planda analiz et"""
+    for path in files:
+        task = asyncio.create_task(analyze_library_file(path))
+        analysis_tasks.add(task)
+        task.add_done_callback(analysis_tasks.discard)
+
+async def render_library_file(path: str) -> List[Dict[str, Any]]:
+    """Dosyanın yayın kopyalarını süreç havuzunda üret ve backend'e kaydet"""
+    loop = asyncio.get_running_loop()
+    try:
+        renditions = await loop.run_in_executor(
+            rendition_executor, build_renditions, path, RENDITIONS_DIR, RENDITION_PROFILES, resolve_ffmpeg()
+        )
+    except (RenditionError, OSError) as e:
+        logger.warning(f"Rendition failed: {e}")
+        return []
     except Exception as e:
-        logger.error(f"Error adding file to database: {e}")
-        return False
+        logger.error(f"Rendition error for {path}: {e}")
+        return []
+    await rendition_registrar.register({"filename": os.path.basename(path), "renditions": renditions})
+    return renditions
+
+def schedule_renditions(files: List[str]):
+    """Yeni kütüphane dosyalarının yayın kopyalarını arka planda üret"""
+    if not RENDITION_PROFILES:
+        return
+    for path in files:
+        task = asyncio.create_task(render_library_file(path))
+        rendition_tasks.add(task)
+        task.add_done_callback(rendition_tasks.discard)
+
+async def rendition_backfill():
+    """Kopyası eksik ya da eski kütüphane dosyalarını kodla (RENDITION_BACKFILL)
+
+    Havuza aynı anda en fazla işçi sayısı kadar dosya verilir; yeni indirmelerin
+    kopyaları uzun bir toplu doldurma kuyruğunun arkasında beklemez.
+    """
+    loop = asyncio.get_running_loop()
+    pruned = await loop.run_in_executor(
+        post_process_executor, prune_renditions, UPLOADS_DIR, RENDITIONS_DIR, RENDITION_PROFILES
+    )
+    pending = await loop.run_in_executor(
+        post_process_executor, missing_renditions, UPLOADS_DIR, RENDITIONS_DIR, RENDITION_PROFILES
+    )
+    logger.info(f"Rendition backfill: {len(pending)} file(s) to transcode, {pruned} orphaned rendition(s) removed")
+    slots = asyncio.Semaphore(RENDITION_WORKERS)
+
+    async def render(path: str) -> bool:
+        async with slots:
+            return bool(await render_library_file(path))
+
+    done = sum(await asyncio.gather(*(render(path) for path in pending)))
+    logger.info(f"Rendition backfill finished: {done}/{len(pending)} file(s) transcoded")
+
+@app.get("/analysis/{filename}")
+async def get_track_analysis(filename: str, format: str = "json"):
+    """Şarkının dalga formu tepeleri ve ses yüksekliği (yoksa şimdi hesaplanır)
+
+    format=binary yan dosyanın kendisini döndürür.
+    """
+    if os.path.basename(filename) != filename:
+        raise HTTPException(status_code=400, detail="Invalid filename")
+    audio_path = os.path.join(UPLOADS_DIR, filename)
+    if not os.path.isfile(audio_path):
+        raise HTTPException(status_code=404, detail="Song not found")
+
+    loop = asyncio.get_running_loop()
+    analysis = await loop.run_in_executor(
+        post_process_executor, read_sidecar, sidecar_path(ANALYSIS_DIR, filename)
+    )
+    if analysis is None:
+        analysis = await analyze_library_file(audio_path)
+        if analysis is None:
+            raise HTTPException(status_code=500, detail="Analysis failed")
+
+    if format == "binary":
+        return Response(content=encode_sidecar(analysis), media_type="application/octet-stream")
+    return analysis_response(filename, analysis)
+
+def check_cover_size(size: int):
+    if cover_art is None:
+        raise HTTPException(status_code=503, detail="Cover art cache is not available")
+    if size not in cover_art.sizes:
+        raise HTTPException(
+            status_code=400, detail=f"Size must be one of {', '.join(map(str, cover_art.sizes))}"
+        )
+
+async def cover_response(request: Request, resolve, size: int, cache_control: str) -> Response:
+    """Kapak varyantını ETag ve önbellek başlıklarıyla döndür"""
+    # Görsel hash'i bulunduktan sonra bütçe için silinmiş olabilir; bir kez yeniden alınır
+    for _ in range(2):
+        try:
+            digest = await resolve()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"Cover art fetch failed: {e}")
+            raise HTTPException(status_code=502, detail="Could not fetch cover art")
+        if digest == NO_ART:
+            raise HTTPException(status_code=404, detail="No cover art")
+        headers = {"ETag": f'"{digest}-{size}"', "Cache-Control": cache_control}
+        if request.headers.get("if-none-match") == headers["ETag"]:
+            return Response(status_code=304, headers=headers)
+        data = await cover_art.read(digest, size)
+        if data is not None:
+            return Response(content=data, media_type="image/jpeg", headers=headers)
+    raise HTTPException(status_code=404, detail="No cover art")
+
+@app.get("/covers/spotify/{image_id}/{size}")
+async def get_spotify_cover(image_id: str, size: int, request: Request):
+    """Arama sonucunun kapağı, küçültülmüş (Spotify CDN'den bir kez indirilir)"""
+    check_cover_size(size)
+    if not IMAGE_ID_RE.match(image_id):
+        raise HTTPException(status_code=400, detail="Invalid image id")
+    return await cover_response(request, lambda: cover_art.spotify(image_id), size, COVER_CACHE_CONTROL)
+
+@app.get("/covers/track/{filename}/{size}")
+async def get_track_cover(filename: str, size: int, request: Request):
+    """Kütüphanedeki şarkının gömülü kapağı, küçültülmüş"""
+    check_cover_size(size)
+    if os.path.basename(filename) != filename:
+        raise HTTPException(status_code=400, detail="Invalid filename")
+    audio_path = os.path.join(UPLOADS_DIR, filename)
+    if not os.path.isfile(audio_path):
+        raise HTTPException(status_code=404, detail="Song not found")
+    return await cover_response(request, lambda: cover_art.track(audio_path), size, TRACK_COVER_CACHE_CONTROL)
 
 @app.post("/update-spotify-config")
 async def update_spotify_config(request: dict):
     """Spotify config'ini runtime'da güncelle"""
-    global current_spotify_credentials, spotdl_client
-    
     try:
         client_id = request.get("client_id", "")
         client_secret = request.get("client_secret", "")
         
-        # Credentials'ları güncelle
-        current_spotify_credentials["client_id"] = client_id
-        current_spotify_credentials["client_secret"] = client_secret
-        
-        # SpotDL client'ını yeniden başlat
-        if client_id and client_secret:
-            try:
-                spotdl_client = Spotdl(
-                    client_id=client_id,
-                    client_secret=client_secret,
-                    downloader_settings={
-                        "output": "../uploads",
-                        "format": "mp3",
-                        "bitrate": "320k",
-                        "quality": "high"
-                    }
-                )
-                logger.info("SpotDL client reinitialized with new credentials")
-            except Exception as e:
-                logger.error(f"Failed to reinitialize SpotDL: {e}")
-                spotdl_client = None
-        else:
-            spotdl_client = None
-            logger.info("SpotDL client disabled - no credentials provided")
+        apply_spotify_credentials(client_id, client_secret)
+        if shared_state is not None:
+            # Diğer işçiler sürüm değişikliğini görüp aynı credential'ları bir kez uygular
+            shared_versions["config"] = shared_state.set_config(
+                SPOTIFY_CREDENTIALS_KEY, {"client_id": client_id, "client_secret": client_secret}
+            )
         
         return {
             "success": True,
             "message": "Spotify config updated successfully",
-            "spotify_configured": bool(client_id and client_secret)
+            "spotify_configured": bool(client_id and client_secret),
+            "spotdl_state": spotdl_manager.state
         }
         
     except Exception as e:
@@ -557,6 +2115,18 @@ async def update_spotify_config(request: dict):
             "error": str(e)
         }
 
+def apply_spotify_credentials(client_id: str, client_secret: str):
+    """Credential'ları bu süreçte uygula"""
+    # Credentials'ları güncelle
+    current_spotify_credentials["client_id"] = client_id
+    current_spotify_credentials["client_secret"] = client_secret
+    spotify_api.set_credentials(client_id, client_secret)
+    search_cache.clear()
+    restart_download_engine()
+    
+    # SpotDL client'ını arka planda yeniden başlat; hazır olana kadar eskisi aramalara cevap verir
+    init_spotdl()
+
 @app.post("/test-spotify-config")
 async def test_spotify_config(request: dict):
     """Spotify credentials'larını test et"""
@@ -570,30 +2140,21 @@ async def test_spotify_config(request: dict):
                 "error": "Client ID and Client Secret are required"
             }
         
-        # Spotify API'ye test isteği gönder
-        import requests
-        
-        auth_url = "https://accounts.spotify.com/api/token"
-        auth_data = {
-            "grant_type": "client_credentials",
-            "client_id": client_id,
-            "client_secret": client_secret
-        }
-        
-        auth_response = requests.post(auth_url, data=auth_data, timeout=10)
-        
-        if auth_response.status_code == 200:
-            return {
-                "success": True,
-                "message": "Spotify credentials are valid",
-                "token_type": auth_response.json().get("token_type")
-            }
-        else:
+        # Spotify API'ye test isteği gönder (paylaşılan oturum üzerinden)
+        try:
+            token_data = await spotify_api.request_token(client_id, client_secret)
+        except SpotifyAuthError as e:
             return {
                 "success": False,
-                "error": f"Invalid credentials. Status code: {auth_response.status_code}",
-                "details": auth_response.text
+                "error": f"Invalid credentials. Status code: {e.status}",
+                "details": e.details
             }
+        
+        return {
+            "success": True,
+            "message": "Spotify credentials are valid",
+            "token_type": token_data.get("token_type")
+        }
             
     except Exception as e:
         logger.error(f"Error testing Spotify config: {e}")
@@ -603,10 +2164,13 @@ async def test_spotify_config(request: dict):
         }
 
 if __name__ == "__main__":
+    # WEB_WORKERS > 1 ise istekler birden fazla süreçte karşılanır (paylaşılan durum otomatik açılır)
+    web_workers = int(os.getenv("WEB_WORKERS", "1"))
     uvicorn.run(
         "main:app",
         host="127.0.0.1",
         port=8000,
-        reload=True,
+        reload=web_workers == 1,
+        workers=web_workers,
         log_level="info"
     )
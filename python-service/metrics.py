@@ -0,0 +1,357 @@
+"""
+Prometheus biçiminde metrikler
+
+Harici bağımlılık olmadan sayaç, gösterge ve histogram tutan küçük bir
+kayıt defteri. `/metrics` ucu `REGISTRY.render()` çıktısını döndürür.
+Metrikler thread-safe'tir; iş parçacığı havuzlarından da güncellenebilir.
+
+Servisin metrikleri bu modülde tanımlanır; diğer modüller ihtiyaç
+duyduklarını buradan import eder.
+"""
+
+import math
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Saniye cinsinden varsayılan histogram sınırları (kısa API çağrılarından uzun indirmelere)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labels)
+        self._lock = threading.Lock()
+        self._functions: Dict[LabelValues, Callable[[], float]] = {}
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def set_function(self, function: Callable[[], float], **labels: str) -> None:
+        """Değeri her okumada fonksiyondan al (kuyruk derinliği gibi anlık değerler için)"""
+        with self._lock:
+            self._functions[self._key(labels)] = function
+
+    def _function_samples(self) -> List[Tuple[LabelValues, float]]:
+        with self._lock:
+            functions = list(self._functions.items())
+        samples = []
+        for key, function in functions:
+            try:
+                samples.append((key, float(function())))
+            except Exception:
+                continue
+        return samples
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self.samples(),
+        ]
+
+
+class Counter(_Metric):
+    """Sadece artan sayaç"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values + self._function_samples()
+        ]
+
+
+class Gauge(Counter):
+    """Artıp azalabilen anlık değer"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Gecikme dağılımı (kümülatif bucket'lar, toplam ve sayı)"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * len(self.buckets)
+                self._sums[key] = 0.0
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+        lines = []
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ("le",), key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Kayıtlı metrikleri Prometheus metin biçiminde döndürür"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(
+        self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Arama
+SEARCH_SECONDS = REGISTRY.histogram(
+    "erotify_search_duration_seconds", "Latency of /search requests", ("outcome",)
+)
+SEARCH_BACKEND_SECONDS = REGISTRY.histogram(
+    "erotify_search_backend_duration_seconds", "Latency of Spotify searches on cache misses"
+)
+
+# İndirme işleri
+DOWNLOAD_PHASE_SECONDS = REGISTRY.histogram(
+    "erotify_download_phase_seconds",
+    "Time download jobs spend in each phase (queued, slot_wait, resolving, downloading, encoding, registering)",
+    ("phase",),
+)
+DOWNLOADS_FINISHED = REGISTRY.counter(
+    "erotify_downloads_finished_total", "Download jobs that reached a final status", ("kind", "status")
+)
+
+DOWNLOAD_QUEUE_DEPTH = REGISTRY.gauge("erotify_download_queue_depth", "Jobs waiting in the scheduler queue")
+DOWNLOADS_RUNNING = REGISTRY.gauge("erotify_downloads_running", "Jobs holding a scheduler slot")
+FETCH_SLOTS_IN_USE = REGISTRY.gauge("erotify_fetch_slots_in_use", "Jobs in the network fetch stage")
+ENCODES_RUNNING = REGISTRY.gauge("erotify_encodes_running", "ffmpeg encodes currently running")
+WARM_WORKERS = REGISTRY.gauge("erotify_warm_workers", "Warm spotdl worker processes")
+SEARCH_CACHE_LOOKUPS = REGISTRY.counter(
+    "erotify_search_cache_lookups_total", "Search cache lookups by result", ("result",)
+)
+BACKEND_PENDING = REGISTRY.gauge("erotify_backend_pending_songs", "Songs waiting to be sent to the backend")
+LIBRARY_TRACKS = REGISTRY.gauge("erotify_library_search_tracks", "Tracks in the local search index")
+
+# Alt süreçler (spotdl CLI, sıcak işçiler, ffmpeg)
+SUBPROCESS_SECONDS = REGISTRY.histogram(
+    "erotify_subprocess_duration_seconds", "Run time of external processes per job", ("command",)
+)
+SUBPROCESS_EXITS = REGISTRY.counter(
+    "erotify_subprocess_exits_total", "External process exits by exit code", ("command", "code")
+)
+SUBPROCESS_TIMEOUTS = REGISTRY.counter(
+    "erotify_subprocess_timeouts_total", "External processes killed after a timeout", ("command",)
+)
+
+# Upstream (Spotify/YouTube) hız sınırları
+UPSTREAM_CONCURRENCY_LIMIT = REGISTRY.gauge(
+    "erotify_upstream_concurrency_limit", "Current adaptive concurrency limit per upstream", ("upstream",)
+)
+UPSTREAM_IN_FLIGHT = REGISTRY.gauge(
+    "erotify_upstream_in_flight", "Calls currently holding an upstream slot", ("upstream",)
+)
+UPSTREAM_THROTTLED = REGISTRY.counter(
+    "erotify_upstream_throttled_total", "Rate-limit responses received per upstream", ("upstream",)
+)
+
+# Backend kaydı
+BACKEND_REQUEST_SECONDS = REGISTRY.histogram(
+    "erotify_backend_request_duration_seconds", "Latency of batch registration requests", ("outcome",)
+)
+BACKEND_SONGS = REGISTRY.counter(
+    "erotify_backend_songs_total", "Songs sent to the backend by result", ("result",)
+)
+
+# İş parçacığı/süreç havuzları
+EXECUTOR_WORKERS = REGISTRY.gauge(
+    "erotify_executor_workers", "Configured worker count per pool", ("pool",)
+)
+EXECUTOR_ACTIVE = REGISTRY.gauge(
+    "erotify_executor_active_tasks", "Tasks currently running per pool", ("pool",)
+)
+EXECUTOR_QUEUED = REGISTRY.gauge(
+    "erotify_executor_queued_tasks", "Tasks waiting for a worker per pool", ("pool",)
+)
+EXECUTOR_WAIT_SECONDS = REGISTRY.histogram(
+    "erotify_executor_wait_seconds", "Time tasks wait for a pool worker", ("pool",)
+)
+
+
+class InstrumentedThreadPoolExecutor(ThreadPoolExecutor):
+    """Çalışan/bekleyen görev sayısını ve bekleme süresini raporlayan iş parçacığı havuzu"""
+
+    def __init__(self, name: str, max_workers: int, **kwargs):
+        super().__init__(max_workers=max_workers, **kwargs)
+        self.pool_name = name
+        EXECUTOR_WORKERS.set(max_workers, pool=name)
+        EXECUTOR_ACTIVE.set(0, pool=name)
+        EXECUTOR_QUEUED.set(0, pool=name)
+
+    def submit(self, fn, /, *args, **kwargs):
+        name = self.pool_name
+        submitted = time.perf_counter()
+        EXECUTOR_QUEUED.inc(pool=name)
+
+        def run():
+            EXECUTOR_QUEUED.dec(pool=name)
+            EXECUTOR_WAIT_SECONDS.observe(time.perf_counter() - submitted, pool=name)
+            EXECUTOR_ACTIVE.inc(pool=name)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                EXECUTOR_ACTIVE.dec(pool=name)
+
+        try:
+            return super().submit(run)
+        except BaseException:
+            EXECUTOR_QUEUED.dec(pool=name)
+            raise
+
+
+class InstrumentedProcessPoolExecutor(ProcessPoolExecutor):
+    """Süreç havuzu; görevin başladığı an alt süreçte olduğundan çalışan/bekleyen
+    sayısı havuzdaki toplam görevden tahmin edilir"""
+
+    def __init__(self, name: str, max_workers: int, **kwargs):
+        super().__init__(max_workers=max_workers, **kwargs)
+        self.pool_name = name
+        self._max = max_workers
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        EXECUTOR_WORKERS.set(max_workers, pool=name)
+        EXECUTOR_ACTIVE.set_function(lambda: min(self._in_flight, self._max), pool=name)
+        EXECUTOR_QUEUED.set_function(lambda: max(self._in_flight - self._max, 0), pool=name)
+
+    def _finished(self, _future) -> None:
+        with self._in_flight_lock:
+            self._in_flight -= 1
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = super().submit(fn, *args, **kwargs)
+        with self._in_flight_lock:
+            self._in_flight += 1
+        future.add_done_callback(self._finished)
+        return future
+
+
+class PhaseTimer:
+    """Bir işin aşama sürelerini toplar ve aşama histogramına yazar"""
+
+    def __init__(self, initial: Optional[Dict[str, float]] = None):
+        self.timings: Dict[str, float] = dict(initial or {})
+
+    def record(self, phase: str, seconds: float) -> None:
+        seconds = max(seconds, 0.0)
+        self.timings[phase] = round(self.timings.get(phase, 0.0) + seconds, 3)
+        DOWNLOAD_PHASE_SECONDS.observe(seconds, phase=phase)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
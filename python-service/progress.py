@@ -0,0 +1,163 @@
+"""
+SpotDL çıktısından canlı ilerleme takibi
+
+spotdl `--simple-tui` ile çalıştırıldığında her şarkı için aşama satırları
+("<şarkı>: Downloading", "<şarkı>: Done"), playlist boyutu ("Found N songs
+in ...") ve toplam sayaç ("3/10 complete") yazar. Bu modül satırları
+geldikçe işler, şarkı ve yüzde bazında ilerleme hesaplar ve işin çıktısını
+sınırlı bir kuyrukta saklar.
+"""
+
+import asyncio
+import re
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+
+# Saklanacak en fazla çıktı satırı ve satır uzunluğu (iş başına)
+OUTPUT_TAIL_LINES = 40
+MAX_LINE_LENGTH = 500
+# Satır sonu gelmeden biriken tamponun üst sınırı (byte)
+MAX_PENDING_BYTES = 64 * 1024
+
+# spotdl'in SongTracker aşamaları ve karşılık gelen şarkı ilerlemesi
+STAGE_PROGRESS = {
+    "Searching for song": 25,
+    "Getting audio meta": 40,
+    "Downloading": 55,
+    "Converting": 75,
+    "Embedding metadata": 95,
+    "Done": 100,
+    "Skipped": 100,
+    "Error": 100,
+}
+
+FOUND_RE = re.compile(r"Found (\d+) songs? in")
+COMPLETE_RE = re.compile(r"(\d+)/(\d+) complete")
+STAGE_RE = re.compile(r"^(?P<song>.+?): (?P<stage>" + "|".join(map(re.escape, STAGE_PROGRESS)) + r")\s*$")
+DOWNLOADED_RE = re.compile(r'^Downloaded "(?P<song>.+)":')
+SKIPPING_RE = re.compile(r"^Skipping (?P<song>.+?) \(")
+PERCENT_RE = re.compile(r"(\d{1,3}(?:\.\d+)?)%")
+
+
+def is_progress_line(line: str) -> bool:
+    """Şarkı/playlist adı taşıyan aşama ve sayaç satırı mı? (hata aramasında atlanır)"""
+    line = line.strip()
+    return bool(
+        STAGE_RE.match(line) or DOWNLOADED_RE.match(line) or SKIPPING_RE.match(line)
+        or FOUND_RE.search(line) or COMPLETE_RE.search(line)
+    )
+
+
+class SpotdlProgress:
+    """spotdl çıktı satırlarından iş ilerlemesini hesapla"""
+
+    def __init__(self, start: float = 10.0, end: float = 80.0):
+        # İş ilerlemesinin spotdl'e ayrılan aralığı (gerisi kayıt aşaması)
+        self.start = start
+        self.end = end
+        self.total_tracks = 0
+        self.completed_tracks = 0
+        self.current_track: Optional[str] = None
+        self.track_progress: Dict[str, float] = {}
+        self.output: Deque[str] = deque(maxlen=OUTPUT_TAIL_LINES)
+
+    def feed(self, line: str) -> bool:
+        """Bir çıktı satırını işle; ilerleme değiştiyse True döner"""
+        line = line.strip()
+        if not line:
+            return False
+        self.output.append(line[:MAX_LINE_LENGTH])
+
+        found = FOUND_RE.search(line)
+        if found:
+            self.total_tracks += int(found.group(1))
+            return True
+
+        complete = COMPLETE_RE.search(line)
+        if complete:
+            self.completed_tracks = int(complete.group(1))
+            self.total_tracks = max(self.total_tracks, int(complete.group(2)))
+            return True
+
+        match = DOWNLOADED_RE.match(line) or SKIPPING_RE.match(line)
+        if match:
+            return self._set_track(match.group("song"), 100.0)
+
+        stage = STAGE_RE.match(line)
+        if stage:
+            song = stage.group("song")
+            value = float(STAGE_PROGRESS[stage.group("stage")])
+            # Aşama içindeki byte yüzdesi varsa (ör. yt-dlp) aşama aralığına yay
+            percent = PERCENT_RE.search(line)
+            if percent and stage.group("stage") == "Downloading":
+                value = 40 + min(float(percent.group(1)), 100.0) * 0.3
+            return self._set_track(song, value)
+
+        percent = PERCENT_RE.search(line)
+        if percent and self.current_track:
+            value = 40 + min(float(percent.group(1)), 100.0) * 0.3
+            return self._set_track(self.current_track, value)
+
+        return False
+
+    def _set_track(self, song: str, value: float) -> bool:
+        previous = self.track_progress.get(song)
+        if previous is not None and previous >= value:
+            return False
+        self.track_progress[song] = value
+        if value >= 100:
+            done = sum(1 for v in self.track_progress.values() if v >= 100)
+            self.completed_tracks = max(self.completed_tracks, done)
+            if self.current_track == song:
+                self.current_track = None
+        else:
+            self.current_track = song
+        return True
+
+    @property
+    def progress(self) -> float:
+        """İşin toplam ilerlemesi (start..end aralığında)"""
+        total = max(self.total_tracks, len(self.track_progress), 1)
+        done = sum(min(v, 100.0) for v in self.track_progress.values())
+        done = max(done, self.completed_tracks * 100.0)
+        fraction = min(done / (total * 100.0), 1.0)
+        return round(self.start + (self.end - self.start) * fraction, 1)
+
+    @property
+    def message(self) -> str:
+        """Kullanıcıya gösterilecek kısa durum mesajı"""
+        if self.total_tracks > 1:
+            text = f"Downloaded {self.completed_tracks}/{self.total_tracks} tracks"
+            return f"{text} - {self.current_track}" if self.current_track else text
+        if self.current_track:
+            return f"Downloading {self.current_track}"
+        return "Downloading with SpotDL..."
+
+    def redact_tracks(self, text: str) -> str:
+        """Metinden görülen şarkı adlarını çıkar; hata kalıpları şarkı adıyla eşleşmesin"""
+        for song in sorted(self.track_progress, key=len, reverse=True):
+            text = text.replace(song, " ")
+        return text
+
+    def tail(self, lines: int = 10) -> str:
+        """Son çıktı satırları (hata mesajları için)"""
+        return "\n".join(list(self.output)[-lines:])
+
+
+async def read_lines(stream: asyncio.StreamReader, on_line: Callable[[str], None]) -> None:
+    """Akıştan satırları geldikçe oku; hem \\n hem \\r satır sonu sayılır"""
+    pending = b""
+    while True:
+        chunk = await stream.read(4096)
+        if not chunk:
+            break
+        pending += chunk
+        parts = re.split(rb"[\r\n]", pending)
+        pending = parts.pop()
+        for part in parts:
+            if part.strip():
+                on_line(part.decode(errors="replace"))
+        if len(pending) > MAX_PENDING_BYTES:
+            pending = pending[-MAX_PENDING_BYTES:]
+    if pending.strip():
+        on_line(pending.decode(errors="replace"))
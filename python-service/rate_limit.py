@@ -0,0 +1,251 @@
+"""
+Upstream hız sınırı yönetimi
+
+Spotify ve YouTube yoğun yükte 429 / "Too Many Requests" ile cevap verir.
+Bu durumda aynı hızla tekrar denemek sınırı uzatır ve işler art arda
+başarısız olur. `AdaptiveLimiter` bir upstream'e giden eşzamanlı çağrı
+sayısını AIMD ile ayarlar:
+
+- Başarılı çağrılarda sınır yavaşça artar (her `limit` başarıda +1).
+- Hız sınırına takılınca sınır yarıya iner ve upstream Retry-After
+  süresi (yoksa artan bir bekleme) boyunca yeni çağrı başlatılmaz.
+
+Arama, metadata ve indirme yolları aynı upstream için aynı sınırlayıcıyı
+paylaşır; birinin gördüğü 429 diğerlerini de yavaşlatır.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from metrics import UPSTREAM_CONCURRENCY_LIMIT, UPSTREAM_IN_FLIGHT, UPSTREAM_THROTTLED
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# spotipy, yt-dlp ve HTTP istemcilerinin hız sınırı mesajları
+_RATE_LIMIT_RE = re.compile(
+    r"too many requests|too many 429|rate[ /-]?(?:request )?limit|"
+    r"(?:http error|status(?: code)?:?|http status:?)\s*429\b|\b429 client error|"
+    r"sign in to confirm you.re not a bot",
+    re.IGNORECASE,
+)
+_RETRY_AFTER_RE = re.compile(
+    r"retry(?:[- ]after| will occur after)[:=]?\s*(\d+(?:\.\d+)?)", re.IGNORECASE
+)
+# yt-dlp/YouTube kaynaklı olduğunu gösteren ifadeler; diğerleri Spotify sayılır
+_YOUTUBE_RE = re.compile(r"youtube|yt-dlp|youtu\.be|http error 429|not a bot", re.IGNORECASE)
+
+UPSTREAM_SPOTIFY = "spotify"
+UPSTREAM_YOUTUBE = "youtube"
+
+
+class RateLimited(Exception):
+    """Upstream hız sınırına takıldı"""
+
+    def __init__(self, retry_after: Optional[float] = None, details: str = "", upstream: str = UPSTREAM_SPOTIFY):
+        super().__init__(details or "upstream rate limit")
+        self.retry_after = retry_after
+        self.details = details
+        self.upstream = upstream
+
+
+def is_rate_limited(text: str) -> bool:
+    """Hata mesajı/log satırı bir hız sınırı yanıtını mı anlatıyor?"""
+    return bool(text) and _RATE_LIMIT_RE.search(text) is not None
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After başlığı ya da "retry after N" içeren metinden saniye"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    match = _RETRY_AFTER_RE.search(value)
+    return float(match.group(1)) if match else None
+
+
+def rate_limit_from_text(text: str) -> Optional[RateLimited]:
+    """Metin hız sınırı anlatıyorsa bekleme süresiyle birlikte RateLimited döndür"""
+    if not is_rate_limited(text):
+        return None
+    upstream = UPSTREAM_YOUTUBE if _YOUTUBE_RE.search(text) else UPSTREAM_SPOTIFY
+    return RateLimited(parse_retry_after(text), text.strip()[-300:], upstream)
+
+
+def rate_limit_from_exception(error: BaseException) -> Optional[RateLimited]:
+    """spotipy/HTTP hatası 429 ise RateLimited döndür (Retry-After başlığı varsa kullanılır)"""
+    if isinstance(error, RateLimited):
+        return error
+    status = getattr(error, "http_status", None) or getattr(error, "status", None)
+    if status != 429:
+        return rate_limit_from_text(str(error))
+    headers = getattr(error, "headers", None) or {}
+    retry_after = parse_retry_after(headers.get("Retry-After")) or parse_retry_after(str(error))
+    return RateLimited(retry_after, str(error)[-300:])
+
+
+class AdaptiveLimiter:
+    """AIMD eşzamanlılık sınırı ve Retry-After'a uyan bekleme"""
+
+    def __init__(
+        self,
+        name: str,
+        max_limit: int,
+        min_limit: int = 1,
+        decrease_factor: float = 0.5,
+        backoff_base: float = 2.0,
+        backoff_max: float = 300.0,
+    ):
+        self.name = name
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.decrease_factor = decrease_factor
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._limit = float(self.max_limit)
+        self._in_use = 0
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._consecutive_throttles = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.throttled = 0
+        UPSTREAM_CONCURRENCY_LIMIT.set_function(lambda: self.limit, upstream=name)
+        UPSTREAM_IN_FLIGHT.set_function(lambda: self._in_use, upstream=name)
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+    @property
+    def backoff_remaining(self) -> float:
+        return max(0.0, self._blocked_until - time.monotonic())
+
+    def locked(self) -> bool:
+        """Şu an yeni çağrı beklemeden başlayamaz mı?"""
+        return bool(self._waiters) or self.backoff_remaining > 0 or self._in_use >= self.limit
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "max_limit": self.max_limit,
+            "in_use": self._in_use,
+            "waiting": sum(1 for waiter in self._waiters if not waiter.done()),
+            "backoff_seconds": round(self.backoff_remaining, 1),
+            "throttled": self.throttled,
+        }
+
+    async def acquire(self) -> float:
+        """Slot al (FIFO); alındığı anı döndürür"""
+        if not self.locked():
+            self._in_use += 1
+            return time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._wake()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot verildikten sonra iptal edildi; geri bırak
+                self._in_use -= 1
+                self._wake()
+            raise
+        return time.monotonic()
+
+    def release(self, acquired_at: float, outcome: str = "ok", retry_after: Optional[float] = None) -> None:
+        """Slotu bırak; outcome: "ok", "rate_limited" ya da "error" (sınırı değiştirmez)"""
+        self._in_use -= 1
+        if outcome == "ok":
+            self._consecutive_throttles = 0
+            if self._limit < self.max_limit:
+                # Toplamsal artış: sınır kadar başarıda +1
+                self._limit = min(float(self.max_limit), self._limit + 1.0 / self._limit)
+        elif outcome == "rate_limited":
+            self.throttle(retry_after, acquired_at)
+        self._wake()
+
+    def throttle(self, retry_after: Optional[float] = None, acquired_at: Optional[float] = None) -> None:
+        """Hız sınırı bildir: sınırı düşür ve bekleme süresince yeni çağrı başlatma
+
+        Slot tutmayan yollar da (ör. indirmenin Spotify'a takılması) çağırabilir.
+        """
+        now = time.monotonic()
+        self.throttled += 1
+        UPSTREAM_THROTTLED.inc(upstream=self.name)
+        if retry_after is None:
+            retry_after = min(self.backoff_max, self.backoff_base * (2 ** self._consecutive_throttles))
+        retry_after = min(retry_after, self.backoff_max)
+        # Aynı 429 dalgasına takılan eşzamanlı çağrılar sınırı bir kez düşürür
+        if acquired_at is None:
+            fresh = now >= self._blocked_until
+        else:
+            fresh = acquired_at >= self._last_decrease
+        if fresh:
+            self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+            self._last_decrease = now
+            self._consecutive_throttles += 1
+            logger.warning(
+                f"{self.name} rate limited; concurrency limit {self.limit}, backing off {retry_after:.1f}s"
+            )
+        self._blocked_until = max(self._blocked_until, now + retry_after)
+        self._wake()
+
+    def _wake(self) -> None:
+        """Bekleme bitti ve yer varsa sıradakilere slot ver"""
+        while self._waiters and self._waiters[0].done():
+            self._waiters.popleft()
+        if not self._waiters:
+            return
+        delay = self.backoff_remaining
+        if delay > 0:
+            if self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._on_backoff_end)
+            return
+        while self._waiters and self._in_use < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._in_use += 1
+                waiter.set_result(None)
+
+    def _on_backoff_end(self) -> None:
+        self._timer = None
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """`async with limiter.slot():` — RateLimited fırlatılırsa sınır düşer"""
+        acquired_at = await self.acquire()
+        outcome, retry_after = "error", None
+        try:
+            yield
+            outcome = "ok"
+        except RateLimited as e:
+            outcome, retry_after = "rate_limited", e.retry_after
+            raise
+        finally:
+            self.release(acquired_at, outcome, retry_after)
+
+    async def call(self, fn: Callable[[], Awaitable[T]], retries: int = 3) -> T:
+        """fn'i slot içinde çalıştır; hız sınırına takılırsa bekleyip tekrar dene"""
+        attempt = 0
+        while True:
+            try:
+                async with self.slot():
+                    return await fn()
+            except RateLimited:
+                attempt += 1
+                if attempt > retries:
+                    raise
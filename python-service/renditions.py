@@ -0,0 +1,260 @@
+"""
+Yayın kopyaları (rendition)
+
+Kütüphanedeki asıl dosya (varsayılan 320k MP3) yavaş bağlantıda dinleyen
+istemciler için gereğinden büyüktür. Her dosyadan yapılandırılmış
+profillere göre (varsayılan "low=opus:96k") küçük kopyalar üretilir ve
+RENDITIONS_DIR/<profil>/<dosya adı><uzantı> olarak saklanır (ör.
+low/x.mp3.opus). Backend'e yol RENDITIONS_DIR'e göreli kaydedilir ve
+sunucu tarafında kendi dizinine birleştirilir; kaydedilen kopyalar
+arasından yayın sırasında istemcinin bant genişliğine uygun olanı seçilir.
+
+Kodlama CPU ağırlıklıdır ve indirmelerle yarışmamalıdır: ayrı bir süreç
+havuzunda, düşürülmüş öncelikle (nice) çalıştırılır.
+
+Mevcut kütüphane için toplu doldurma:
+    python renditions.py [--uploads ../uploads] [--workers N] [--force]
+"""
+
+import argparse
+import logging
+import os
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Dict, List, Sequence
+
+from audio_analysis import resolve_ffmpeg
+from encoder import FFMPEG_CODECS, codec_args
+from library import AUDIO_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+RENDITION_TIMEOUT = 600  # saniye
+MAX_ERROR_OUTPUT = 2000
+DEFAULT_PROFILES = "low=opus:96k"
+
+
+class RenditionError(Exception):
+    """ffmpeg kopyayı üretemediğinde fırlatılır"""
+
+
+@dataclass(frozen=True)
+class RenditionProfile:
+    name: str
+    format: str  # FFMPEG_CODECS anahtarı ve dosya uzantısı
+    bitrate: str  # ffmpeg biçiminde, ör. "96k"
+
+    @property
+    def extension(self) -> str:
+        return f".{self.format}"
+
+    @property
+    def kbps(self) -> int:
+        value = self.bitrate.lower()
+        return int(float(value[:-1])) if value.endswith("k") else int(value) // 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"profile": self.name, "format": self.format, "bitrate": self.kbps}
+
+
+def parse_profiles(value: str) -> List[RenditionProfile]:
+    """"low=opus:96k,mid=m4a:160k" -> profiller (boş değer: kopya üretilmez)"""
+    profiles = []
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            name, spec = part.split("=", 1)
+            audio_format, bitrate = spec.split(":", 1)
+        except ValueError:
+            raise ValueError(f"Invalid rendition profile {part!r}, expected name=format:bitrate")
+        name, audio_format, bitrate = name.strip(), audio_format.strip().lower(), bitrate.strip()
+        if not name.isidentifier():
+            raise ValueError(f"Invalid rendition profile name {name!r}")
+        if audio_format not in FFMPEG_CODECS:
+            raise ValueError(f"Unsupported rendition format {audio_format!r}")
+        profiles.append(RenditionProfile(name, audio_format, bitrate))
+    if len({profile.name for profile in profiles}) != len(profiles):
+        raise ValueError("Rendition profile names must be unique")
+    return profiles
+
+
+def rendition_name(profile: RenditionProfile, filename: str) -> str:
+    """Kopyanın RENDITIONS_DIR'e göreli yolu; asıl uzantı korunur (x.mp3 ile x.m4a çakışmasın)"""
+    return f"{profile.name}/{os.path.basename(filename)}{profile.extension}"
+
+
+def rendition_path(renditions_dir: str, profile: RenditionProfile, filename: str) -> str:
+    return os.path.join(renditions_dir, *rendition_name(profile, filename).split("/"))
+
+
+def lower_priority(niceness: int) -> None:
+    """Süreç havuzu işçisinin önceliğini düşür (ffmpeg alt süreçleri de miras alır)"""
+    if niceness and hasattr(os, "nice"):
+        try:
+            os.nice(niceness)
+        except OSError as e:
+            logger.warning(f"Could not lower rendition worker priority: {e}")
+
+
+def transcode(source: str, output: str, profile: RenditionProfile, ffmpeg: str = "ffmpeg") -> None:
+    """Kaynağı profile göre kodla; çıktı önce geçici dosyaya yazılır (bloklayan çağrı)"""
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    base, extension = os.path.splitext(output)
+    # Uzantı korunur; ffmpeg kapsayıcıyı ondan seçer
+    temp_path = f"{base}.tmp{os.getpid()}{extension}"
+    command = [
+        ffmpeg, "-nostdin", "-y", "-loglevel", "error",
+        "-i", source,
+        # Kapak görseli ve diğer video akışları kopyaya alınmaz; etiketler korunur
+        "-map", "0:a:0", "-map_metadata", "0",
+        *codec_args(profile.format, profile.bitrate),
+        temp_path,
+    ]
+    try:
+        result = subprocess.run(command, capture_output=True, timeout=RENDITION_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        _remove_quietly(temp_path)
+        raise RenditionError(f"ffmpeg failed for {source}: {e}")
+    if result.returncode != 0:
+        _remove_quietly(temp_path)
+        details = result.stderr.decode("utf-8", errors="replace")[-MAX_ERROR_OUTPUT:].strip()
+        raise RenditionError(f"ffmpeg exited with code {result.returncode} for {source}: {details}")
+    os.replace(temp_path, output)
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def build_renditions(
+    source: str,
+    renditions_dir: str,
+    profiles: Sequence[RenditionProfile],
+    ffmpeg: str = "ffmpeg",
+    force: bool = False,
+) -> List[Dict[str, Any]]:
+    """Eksik ya da kaynaktan eski kopyaları üret, dosyanın tüm kopyalarını döndür (süreç havuzunda çalıştırılır)"""
+    source_mtime = os.path.getmtime(source)
+    renditions = []
+    for profile in profiles:
+        output = rendition_path(renditions_dir, profile, source)
+        if force or not os.path.exists(output) or os.path.getmtime(output) < source_mtime:
+            transcode(source, output, profile, ffmpeg)
+        renditions.append({
+            **profile.to_dict(), "path": rendition_name(profile, source), "size": os.path.getsize(output)
+        })
+    return renditions
+
+
+def remove_renditions(renditions_dir: str, profiles: Sequence[RenditionProfile], filename: str) -> None:
+    for profile in profiles:
+        _remove_quietly(rendition_path(renditions_dir, profile, filename))
+
+
+def library_files(uploads_dir: str) -> List[str]:
+    try:
+        entries = sorted(os.scandir(uploads_dir), key=lambda entry: entry.name)
+    except FileNotFoundError:
+        logger.error(f"Uploads directory not found: {uploads_dir}")
+        return []
+    return [
+        entry.path for entry in entries
+        if entry.is_file() and entry.name.lower().endswith(AUDIO_EXTENSIONS)
+    ]
+
+
+def missing_renditions(
+    uploads_dir: str, renditions_dir: str, profiles: Sequence[RenditionProfile]
+) -> List[str]:
+    """Kopyalarından biri eksik ya da eski olan kütüphane dosyaları (bloklayan çağrı)"""
+    pending = []
+    for path in library_files(uploads_dir):
+        source_mtime = os.path.getmtime(path)
+        for profile in profiles:
+            output = rendition_path(renditions_dir, profile, path)
+            if not os.path.exists(output) or os.path.getmtime(output) < source_mtime:
+                pending.append(path)
+                break
+    return pending
+
+
+def prune_renditions(uploads_dir: str, renditions_dir: str, profiles: Sequence[RenditionProfile]) -> int:
+    """Kütüphanede artık olmayan dosyaların kopyalarını sil; silinen sayısı"""
+    names = {os.path.basename(path) for path in library_files(uploads_dir)}
+    removed = 0
+    for profile in profiles:
+        profile_dir = os.path.join(renditions_dir, profile.name)
+        if not os.path.isdir(profile_dir):
+            continue
+        for entry in os.scandir(profile_dir):
+            # Eski adlandırmayla (uzantısız) üretilmiş kopyalar da sahipsiz sayılır ve yeniden üretilir
+            source_name = entry.name[:-len(profile.extension)]
+            if entry.name.endswith(profile.extension) and source_name not in names:
+                os.remove(entry.path)
+                removed += 1
+    return removed
+
+
+def backfill(
+    uploads_dir: str,
+    renditions_dir: str,
+    profiles: Sequence[RenditionProfile],
+    workers: int,
+    niceness: int = 10,
+    force: bool = False,
+) -> int:
+    """Kopyası eksik kütüphane dosyalarını kodla, sahipsiz kopyaları sil
+
+    Backend'e kayıt servis tarafından yapılır (RENDITION_BACKFILL=true ile
+    servis başlangıçta aynı taramayı yapıp kaydeder).
+    """
+    pruned = prune_renditions(uploads_dir, renditions_dir, profiles)
+    if pruned:
+        logger.info(f"Removed {pruned} orphaned rendition(s)")
+    pending = library_files(uploads_dir) if force else missing_renditions(uploads_dir, renditions_dir, profiles)
+    logger.info(f"Transcoding {len(pending)} library file(s) with {workers} worker(s)")
+    ffmpeg = resolve_ffmpeg()
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=lower_priority, initargs=(niceness,)) as pool:
+        futures = {
+            pool.submit(build_renditions, path, renditions_dir, profiles, ffmpeg, force): path for path in pending
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+                done += 1
+            except (RenditionError, OSError) as e:
+                logger.warning(str(e))
+            if done and done % 50 == 0:
+                logger.info(f"Transcoded {done}/{len(pending)}")
+    logger.info(f"Backfill finished: {done}/{len(pending)} file(s) transcoded")
+    return done
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Backfill low-bitrate streaming renditions for the music library")
+    parser.add_argument("--uploads", default=os.getenv("UPLOADS_DIR", "../uploads"))
+    parser.add_argument("--renditions-dir", default=os.getenv("RENDITIONS_DIR", "../data/renditions"))
+    parser.add_argument("--profiles", default=os.getenv("RENDITION_PROFILES", DEFAULT_PROFILES))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--nice", type=int, default=int(os.getenv("RENDITION_NICE", "10")))
+    parser.add_argument("--force", action="store_true", help="re-encode files that already have renditions")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    profiles = parse_profiles(args.profiles)
+    if not profiles:
+        logger.error("No rendition profiles configured")
+        return 1
+    backfill(args.uploads, args.renditions_dir, profiles, max(1, args.workers), args.nice, args.force)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
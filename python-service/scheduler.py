@@ -0,0 +1,224 @@
+"""
+İndirme iş zamanlayıcısı
+
+Sınırlı eşzamanlılıkla çalışan, öncelikli ve adil bir asyncio kuyruğu.
+Tekil şarkılar playlist/albüm işlerinin önüne geçer; aynı öncelikteki
+işler sahipleri (istemciler) arasında sırayla dağıtılır, böylece tek bir
+istemcinin 200 linklik bir patlaması diğerlerini bekletmez. Aynı gruba
+(ör. bir playlist'in şarkıları) ait işlerin eşzamanlı sayısı ayrıca
+sınırlandırılabilir.
+
+Slot işin sadece sınırlı aşamasını (ör. ağdan indirme) kapsayabilir: iş
+`release` ile slotunu erken bırakıp arka planda bitebilir. Böylece kuyruktan
+ancak hemen başlayabilecek kadar iş çıkar ve öncelik sırası korunur.
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Küçük sayı = yüksek öncelik
+PRIORITY_TRACK = 0
+PRIORITY_COLLECTION = 10
+
+
+@dataclass
+class ScheduledJob:
+    job_id: str
+    priority: int
+    owner: str
+    seq: int
+    group: Optional[str] = None
+    submitted_at: float = field(default_factory=time.monotonic)
+
+
+class DownloadScheduler:
+    """Öncelikli, adil ve eşzamanlılığı sınırlı iş kuyruğu"""
+
+    def __init__(
+        self,
+        runner: Callable[[str], Awaitable[None]],
+        max_concurrent: int = 2,
+        on_queue_change: Optional[Callable[[List[str]], None]] = None,
+        max_per_group: Optional[int] = None,
+        on_start: Optional[Callable[[str, float], None]] = None,
+    ):
+        self._runner = runner
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_per_group = max_per_group
+        self._on_queue_change = on_queue_change
+        # İş başlarken (iş ID'si, kuyrukta beklenen saniye) ile çağrılır
+        self._on_start = on_start
+        self._pending: Dict[str, ScheduledJob] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        # Slot tutan işler; slotunu bırakmış ama henüz bitmemiş işler ayrıca tutulur
+        self._holding: Dict[str, ScheduledJob] = {}
+        self._released: Set[str] = set()
+        self._running_per_owner: Dict[str, int] = {}
+        self._running_per_group: Dict[str, int] = {}
+        self._seq = itertools.count()
+
+    @property
+    def depth(self) -> int:
+        """Kuyrukta bekleyen iş sayısı"""
+        return len(self._pending)
+
+    @property
+    def running(self) -> int:
+        """Şu anda çalışan iş sayısı"""
+        return len(self._running)
+
+    @property
+    def slots_in_use(self) -> int:
+        """Slot tutan (slotunu bırakmamış) çalışan iş sayısı"""
+        return len(self._holding)
+
+    def is_scheduled(self, job_id: str) -> bool:
+        """İş kuyrukta bekliyor ya da çalışıyor mu?"""
+        return job_id in self._pending or job_id in self._running
+
+    def submit(
+        self,
+        job_id: str,
+        priority: int = PRIORITY_TRACK,
+        owner: str = "default",
+        group: Optional[str] = None,
+    ) -> None:
+        """İşi kuyruğa ekle ve boş slot varsa hemen başlat (event loop içinden çağrılmalı)"""
+        self.submit_many([job_id], priority, owner, group)
+
+    def submit_many(
+        self,
+        job_ids: Iterable[str],
+        priority: int = PRIORITY_TRACK,
+        owner: str = "default",
+        group: Optional[str] = None,
+    ) -> None:
+        """İşleri verilen sırayla kuyruğa ekle; kuyruk sadece bir kez dağıtılır"""
+        for job_id in job_ids:
+            self._pending[job_id] = ScheduledJob(job_id, priority, owner, next(self._seq), group)
+        self._dispatch()
+
+    def queue_order(self) -> List[str]:
+        """Bekleyen işlerin çalışacakları sıraya göre ID listesi"""
+        # Her sahibin bekleyen işleri sırayla numaralandırılır (round-robin);
+        # halihazırda çalışan işi olan sahip o kadar geriye kayar.
+        per_owner: Dict[str, int] = dict(self._running_per_owner)
+        keyed = []
+        for job in sorted(self._pending.values(), key=lambda j: (j.priority, j.seq)):
+            rank = per_owner.get(job.owner, 0)
+            per_owner[job.owner] = rank + 1
+            keyed.append(((job.priority, rank, job.seq), job.job_id))
+        keyed.sort()
+        return [job_id for _, job_id in keyed]
+
+    def _group_full(self, job: ScheduledJob) -> bool:
+        if job.group is None or self.max_per_group is None:
+            return False
+        return self._running_per_group.get(job.group, 0) >= self.max_per_group
+
+    def _dispatch(self) -> None:
+        """Boş slot kaldığı sürece sıradaki işleri başlat"""
+        while self._pending and len(self._holding) < self.max_concurrent:
+            job_id = next(
+                (job_id for job_id in self.queue_order() if not self._group_full(self._pending[job_id])),
+                None,
+            )
+            if job_id is None:
+                break
+            job = self._pending.pop(job_id)
+            self._holding[job.job_id] = job
+            self._running_per_owner[job.owner] = self._running_per_owner.get(job.owner, 0) + 1
+            if job.group is not None:
+                self._running_per_group[job.group] = self._running_per_group.get(job.group, 0) + 1
+            self._running[job.job_id] = asyncio.create_task(self._run(job))
+
+        if self._on_queue_change:
+            try:
+                self._on_queue_change(self.queue_order())
+            except Exception as e:
+                logger.error(f"Queue change callback error: {e}")
+
+    async def _run(self, job: ScheduledJob) -> None:
+        if self._on_start:
+            try:
+                self._on_start(job.job_id, time.monotonic() - job.submitted_at)
+            except Exception as e:
+                logger.error(f"Job start callback error: {e}")
+        try:
+            await self._runner(job.job_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Scheduled job {job.job_id} crashed: {e}")
+        finally:
+            self._running.pop(job.job_id, None)
+            if job.job_id in self._released:
+                self._released.discard(job.job_id)
+            else:
+                self._free_slot(job)
+            self._dispatch()
+
+    def _free_slot(self, job: ScheduledJob) -> None:
+        self._holding.pop(job.job_id, None)
+        remaining = self._running_per_owner.get(job.owner, 1) - 1
+        if remaining > 0:
+            self._running_per_owner[job.owner] = remaining
+        else:
+            self._running_per_owner.pop(job.owner, None)
+        if job.group is not None:
+            remaining = self._running_per_group.get(job.group, 1) - 1
+            if remaining > 0:
+                self._running_per_group[job.group] = remaining
+            else:
+                self._running_per_group.pop(job.group, None)
+
+    def release(self, job_id: str) -> bool:
+        """Çalışan işin slotunu iş bitmeden boşalt (ör. indirme bitti, kodlama sürüyor)
+
+        İş iptal edilebilir kalır; bittiğinde slot ikinci kez boşaltılmaz.
+        Slot tutmayan iş için False.
+        """
+        job = self._holding.get(job_id)
+        if job is None:
+            return False
+        self._free_slot(job)
+        self._released.add(job_id)
+        self._dispatch()
+        return True
+
+    def cancel(self, job_id: str) -> bool:
+        """Bekleyen işi kuyruktan çıkar ya da çalışan işi iptal et; iş bulunamazsa False"""
+        return self.cancel_many([job_id]) == 1
+
+    def cancel_many(self, job_ids: Iterable[str]) -> int:
+        """İşleri iptal et (kuyruk bir kez dağıtılır); bulunan iş sayısı"""
+        found = 0
+        dequeued = False
+        for job_id in job_ids:
+            if self._pending.pop(job_id, None) is not None:
+                dequeued = True
+                found += 1
+                continue
+            task = self._running.get(job_id)
+            if task is not None and not task.done():
+                # Slot, görev iptali işleyip bitince _run içinde boşalır
+                task.cancel()
+                found += 1
+        if dequeued:
+            self._dispatch()
+        return found
+
+    async def shutdown(self) -> None:
+        """Bekleyen işleri bırak, çalışanları iptal et"""
+        self._pending.clear()
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
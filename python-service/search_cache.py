@@ -0,0 +1,94 @@
+"""
+Arama sonuç önbelleği
+
+Normalize edilmiş sorgu anahtarıyla TTL + boyut sınırlı (LRU) önbellek.
+Aynı sorgu için eşzamanlı gelen istekler tek bir upstream çağrısında
+birleştirilir (single-flight); sonucu hepsi paylaşır.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+def normalize_query(query: str) -> str:
+    """Büyük/küçük harf ve boşluk farklarını yok say"""
+    return " ".join(query.casefold().split())
+
+
+class SearchCache:
+    """TTL'li, LRU tahliyeli ve istek birleştiren arama önbelleği"""
+
+    def __init__(self, ttl_seconds: float = 600.0, max_entries: int = 512):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    async def get_or_fetch(self, query: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Önbellekte varsa döndür, yoksa fetch'i (sorgu başına tek sefer) çalıştır"""
+        key = normalize_query(query)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await fetch()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Bekleyen yoksa "exception never retrieved" uyarısını engelle
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            # Boş sonuçlar (ör. geçici upstream hatası) önbelleğe alınmaz
+            if value:
+                self._store(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def _store(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Tüm girdileri sil (ör. Spotify credential'ları değişince)"""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+        }
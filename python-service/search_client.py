@@ -0,0 +1,122 @@
+"""
+SpotDL arama istemcisi
+
+spotdl'in import'u ve istemcinin kurulması (Spotify kimlik doğrulaması,
+ffmpeg kontrolü) saniyeler sürebilir. Bu iş event loop'u bloklamasın diye
+arka planda bir thread'de yapılır; servis bu sırada /health ve durum
+sorgularına cevap vermeye devam eder. spotdl sadece ilk kurulumda import
+edilir.
+
+Credential değişince yeni istemci eskisinin yanında kurulur ve ancak
+hazır olduğunda tek atamayla devreye alınır. Devam eden aramalar eski
+istemciyle biter; kurulum başarısız olursa eski istemci kullanılmaya
+devam eder.
+"""
+
+import asyncio
+import logging
+from concurrent.futures import Executor
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+STATE_DISABLED = "disabled"        # Credential yok
+STATE_INITIALIZING = "initializing"
+STATE_READY = "ready"
+STATE_FAILED = "failed"
+
+
+def build_spotdl_client(client_id: str, client_secret: str, settings: Dict[str, Any]):
+    """Yeni Spotdl istemcisi kur (bloklayan; thread'de çağrılır)
+
+    spotdl'in Spotify istemcisi süreç genelinde tek örnektir ve
+    `SpotifyClient.init` ikinci kez çağrılamaz. Yeni örnek, taban sınıfa
+    dokunmayan bir alt sınıf üzerinden kurulur; böylece kurulum sürerken
+    mevcut aramalar eski örneği kullanmaya devam eder. Dönen `install`
+    çağrılınca yeni örnek devreye girer.
+    """
+    from spotdl import Spotdl
+    from spotdl.download.downloader import Downloader
+    from spotdl.utils.spotify import SpotifyClient
+
+    class _PendingSpotifyClient(SpotifyClient):
+        _instance = None
+
+    implementation = _PendingSpotifyClient.init(client_id=client_id, client_secret=client_secret)
+    use_official_api = _PendingSpotifyClient._use_official_api
+
+    # Spotdl.__init__ Spotify istemcisini de kurmaya çalışır; sadece indiriciyi kur
+    client = Spotdl.__new__(Spotdl)
+    client.downloader = Downloader(settings=dict(settings))
+
+    def install() -> None:
+        SpotifyClient._instance = implementation
+        SpotifyClient._use_official_api = use_official_api
+
+    return client, install
+
+
+class SpotdlClientManager:
+    """Arka planda kurulan, credential değişince atomik olarak değiştirilen istemci"""
+
+    def __init__(self, settings: Dict[str, Any], executor: Optional[Executor] = None):
+        self.settings = settings
+        self.executor = executor
+        self.state = STATE_DISABLED
+        self.error: Optional[str] = None
+        self._client = None
+        self._generation = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def client(self):
+        """Hazır istemci; yoksa None (yeniden kurulum sırasında eskisi döner)"""
+        return self._client
+
+    @property
+    def ready(self) -> bool:
+        return self._client is not None
+
+    def status(self) -> Dict[str, Any]:
+        return {"state": self.state, "ready": self.ready, "error": self.error}
+
+    def start(self, client_id: str, client_secret: str) -> Optional[asyncio.Task]:
+        """Verilen credential'larla kurulumu arka planda başlat, beklemeden dön"""
+        self._generation += 1
+        if self._task is not None and not self._task.done():
+            # Eski kurulum thread'de bitmeden durdurulamaz; sonucu yok sayılır
+            self._task.cancel()
+            self._task = None
+        self.error = None
+
+        if not client_id or not client_secret:
+            self.state = STATE_DISABLED
+            self._client = None
+            logger.info("SpotDL client disabled - no credentials provided")
+            return None
+
+        self.state = STATE_INITIALIZING
+        self._task = asyncio.create_task(self._initialize(self._generation, client_id, client_secret))
+        return self._task
+
+    async def _initialize(self, generation: int, client_id: str, client_secret: str) -> None:
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self.executor, build_spotdl_client, client_id, client_secret, self.settings
+        )
+        try:
+            client, install = await asyncio.shield(future)
+        except Exception as e:
+            if generation == self._generation:
+                self.state = STATE_FAILED
+                self.error = str(e)
+                logger.error(f"Failed to initialize SpotDL: {e}")
+            return
+
+        if generation != self._generation:
+            # Bu arada credential'lar yine değişti; daha yeni kurulum kazanır
+            return
+        install()
+        self._client = client
+        self.state = STATE_READY
+        logger.info("SpotDL client initialized successfully")
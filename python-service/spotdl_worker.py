@@ -0,0 +1,157 @@
+"""
+Sıcak SpotDL işçisi
+
+download_engine tarafından ayrı bir süreç olarak başlatılır. spotdl'i bir
+kez import eder, kimliği doğrulanmış istemciyi tutar ve stdin'den gelen
+işleri sırayla çalıştırır.
+
+Protokol satır bazlı JSON'dur:
+- stdin, ilk satır: {"client_id", "client_secret", "settings"}
+- stdin, sonraki satırlar: {"url", "output", "pipeline"}
+- stdout: {"event": "ready" | "init_error" | "line" | "fetched" | "done" | "error", ...}
+
+"line" olayları spotdl'in simple-tui log satırlarıdır; CLI çıktısıyla aynı
+ayrıştırıcıdan geçer.
+
+"pipeline" işlerinde işçi sadece ağ aşamalarını (çözümleme, YouTube
+eşleştirme, ham sesi indirme) yapar; her şarkı indikçe "fetched" olayıyla
+ham dosyayı bildirir ve bir sonrakine geçer. MP3 kodlama ve etiketleme
+ana süreçteki kodlama havuzunda yapılır.
+"""
+
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+
+# Pipeline işlerinde ham ses dosyalarının tutulduğu alt klasör (kütüphaneye taşınmaz)
+RAW_DIRNAME = ".raw"
+
+
+class _EventLogHandler(logging.Handler):
+    """spotdl log satırlarını "line" olayı olarak ana sürece ilet"""
+
+    def __init__(self, emit_event):
+        super().__init__(logging.INFO)
+        self.emit_event = emit_event
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.emit_event({"event": "line", "line": record.getMessage()})
+        except Exception:
+            self.handleError(record)
+
+
+def fetch_songs(client, job, emit) -> None:
+    """Ağ aşamaları: şarkıları çözümle, eşleştir ve ham sesi indir"""
+    from spotdl.providers.audio import AudioProvider
+    from spotdl.utils.config import get_temp_path
+    from spotdl.utils.formatter import create_file_name
+    from spotdl.utils.search import reinit_song
+
+    downloader = client.downloader
+    settings = downloader.settings
+    raw_dir = os.path.join(job["output"], RAW_DIRNAME)
+
+    songs = client.search([job["url"]])
+    emit({"event": "line", "line": f"Found {len(songs)} songs in {job['url']}"})
+    for song in songs:
+        name = song.display_name
+        try:
+            # Etiketler için eksik albüm bilgilerini tamamla (spotdl'in kendi indirme yolu gibi)
+            if song.genres is None or song.album_id is None or song.track_number is None:
+                song = reinit_song(song)
+
+            emit({"event": "line", "line": f"{name}: Searching for song"})
+            download_url = song.download_url or downloader.search(song)
+
+            emit({"event": "line", "line": f"{name}: Downloading"})
+            provider = AudioProvider(
+                output_format=settings["format"],
+                cookie_file=settings["cookie_file"],
+                search_query=settings["search_query"],
+                filter_results=settings["filter_results"],
+                yt_dlp_args=settings["yt_dlp_args"],
+            )
+            info = provider.get_download_metadata(download_url, download=True)
+            os.makedirs(raw_dir, exist_ok=True)
+            source = os.path.join(raw_dir, f"{info['id']}.{info['ext']}")
+            shutil.move(str(get_temp_path() / f"{info['id']}.{info['ext']}"), source)
+
+            output_file = create_file_name(
+                song=song,
+                template=job["output"],
+                file_extension=settings["format"],
+                restrict=settings["restrict"],
+                file_name_length=settings["max_filename_length"],
+            )
+            emit({
+                "event": "fetched",
+                "name": name,
+                "song": song.json,
+                "source": source,
+                "output": str(output_file),
+                "ffmpeg": downloader.ffmpeg,
+            })
+        except Exception as e:
+            emit({"event": "line", "line": f"{name}: Error"})
+            emit({"event": "line", "line": f"{type(e).__name__}: {e}"})
+
+
+def main() -> int:
+    # Protokol için gerçek stdout'u ayır; spotdl/rich'in yazdıkları stderr'e gitsin
+    protocol = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8", buffering=1)
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    lock = threading.Lock()
+
+    def emit(event):
+        # spotdl kendi thread'lerinden de log yazar
+        with lock:
+            protocol.write(json.dumps(event) + "\n")
+            protocol.flush()
+
+    init = json.loads(sys.stdin.readline() or "{}")
+    try:
+        from spotdl import Spotdl
+        from spotdl.download.progress_handler import ProgressHandler
+
+        client = Spotdl(
+            client_id=init.get("client_id", ""),
+            client_secret=init.get("client_secret", ""),
+            downloader_settings=init.get("settings") or {},
+        )
+    except Exception as e:
+        emit({"event": "init_error", "error": str(e) or type(e).__name__})
+        return 1
+
+    spotdl_logger = logging.getLogger("spotdl")
+    spotdl_logger.addHandler(_EventLogHandler(emit))
+    spotdl_logger.setLevel(logging.INFO)
+    spotdl_logger.propagate = False
+    emit({"event": "ready"})
+
+    for raw in sys.stdin:
+        if not raw.strip():
+            continue
+        job = json.loads(raw)
+        try:
+            client.downloader.settings["output"] = job["output"]
+            # İlerleme sayaçları işler arasında taşınmasın
+            client.downloader.progress_handler = ProgressHandler(simple_tui=True)
+            if job.get("pipeline"):
+                fetch_songs(client, job, emit)
+                emit({"event": "done"})
+                continue
+            songs = client.search([job["url"]])
+            emit({"event": "line", "line": f"Found {len(songs)} songs in {job['url']}"})
+            results = client.download_songs(songs)
+            emit({"event": "done", "files": sum(1 for _, path in results if path is not None)})
+        except Exception as e:
+            emit({"event": "error", "error": str(e) or type(e).__name__})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
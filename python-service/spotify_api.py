@@ -0,0 +1,195 @@
+"""
+Spotify Web API istemcisi
+
+Client-credentials token'ı süresi dolmadan kısa bir süre öncesine kadar
+önbellekte tutar ve eşzamanlı isteklerde yalnızca bir kez yeniler. Tüm
+Spotify çağrıları tek bir havuzlanmış aiohttp oturumu üzerinden yapılır.
+Sınırlayıcı verilirse istekler onun slotlarıyla yapılır; 429 gelince
+Retry-After kadar beklenip tekrar denenir.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from rate_limit import AdaptiveLimiter, RateLimited, parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+SPOTIFY_ACCOUNTS_URL = os.getenv("SPOTIFY_ACCOUNTS_URL", "https://accounts.spotify.com")
+SPOTIFY_API_URL = os.getenv("SPOTIFY_API_URL", "https://api.spotify.com")
+
+# Token süresi dolmadan bu kadar saniye önce yenilenir
+TOKEN_REFRESH_MARGIN = 60
+REQUEST_TIMEOUT = 10
+# Spotify'ın çoklu şarkı isteği başına kabul ettiği en fazla ID
+MAX_TRACKS_PER_REQUEST = 50
+# 429 sonrası aynı istek en fazla bu kadar tekrar denenir
+RATE_LIMIT_RETRIES = 3
+
+
+class SpotifyAuthError(Exception):
+    """Token alınamadığında fırlatılır"""
+
+    def __init__(self, status: int, details: str = ""):
+        super().__init__(f"Spotify token request failed with status {status}")
+        self.status = status
+        self.details = details
+
+
+class SpotifyAPIError(Exception):
+    """Spotify isteği geçici ya da yetki hatasıyla başarısız olduğunda fırlatılır"""
+
+    def __init__(self, status: int, path: str):
+        super().__init__(f"Spotify API {path} failed with status {status}")
+        self.status = status
+
+
+class SpotifyTokenManager:
+    """Client-credentials token'ını önbellekte tut ve tek seferde yenile"""
+
+    def __init__(self, client_id: str, client_secret: str):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _valid(self) -> bool:
+        return self._token is not None and time.monotonic() < self._expires_at - TOKEN_REFRESH_MARGIN
+
+    async def get_token(self, api: "SpotifyAPI") -> str:
+        if self._valid():
+            return self._token
+        async with self._lock:
+            # Kilidi beklerken başka bir istek token'ı yenilemiş olabilir
+            if self._valid():
+                return self._token
+            data = await api.request_token(self.client_id, self.client_secret)
+            self._token = data["access_token"]
+            self._expires_at = time.monotonic() + float(data.get("expires_in", 3600))
+            return self._token
+
+    def invalidate(self) -> None:
+        self._token = None
+        self._expires_at = 0.0
+
+
+class SpotifyAPI:
+    """Havuzlanmış oturum ve önbellekli token ile Spotify Web API çağrıları"""
+
+    def __init__(
+        self,
+        client_id: str = "",
+        client_secret: str = "",
+        max_connections: int = 10,
+        limiter: Optional[AdaptiveLimiter] = None,
+    ):
+        self.max_connections = max_connections
+        self.limiter = limiter
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._tokens: Optional[SpotifyTokenManager] = None
+        self.set_credentials(client_id, client_secret)
+
+    @property
+    def configured(self) -> bool:
+        return self._tokens is not None
+
+    def set_credentials(self, client_id: str, client_secret: str) -> None:
+        """Credential'ları değiştir; önbellekteki token geçersiz olur"""
+        if client_id and client_secret:
+            self._tokens = SpotifyTokenManager(client_id, client_secret)
+        else:
+            self._tokens = None
+
+    async def session(self) -> aiohttp.ClientSession:
+        """Paylaşılan HTTP oturumu (bağlantılar yeniden kullanılır)"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+            )
+        return self._session
+
+    async def request_token(self, client_id: str, client_secret: str) -> Dict[str, Any]:
+        """accounts.spotify.com'dan yeni bir client-credentials token'ı iste"""
+        session = await self.session()
+        async with session.post(
+            f"{SPOTIFY_ACCOUNTS_URL}/api/token",
+            data={
+                "grant_type": "client_credentials",
+                "client_id": client_id,
+                "client_secret": client_secret,
+            },
+        ) as response:
+            if response.status != 200:
+                raise SpotifyAuthError(response.status, await response.text())
+            return await response.json()
+
+    async def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """Yetkili GET isteği; 401 gelirse token yenilenip bir kez tekrar denenir"""
+        if self._tokens is None:
+            raise SpotifyAuthError(0, "Spotify credentials not configured")
+        tokens = self._tokens
+        try:
+            if self.limiter is None:
+                return await self._get(tokens, path, params)
+            return await self.limiter.call(lambda: self._get(tokens, path, params), retries=RATE_LIMIT_RETRIES)
+        except RateLimited:
+            logger.warning(f"Spotify API rate limit persisted for {path}")
+            return 429, None
+
+    async def _get(
+        self, tokens: SpotifyTokenManager, path: str, params: Optional[Dict[str, Any]]
+    ) -> Tuple[int, Optional[Dict[str, Any]]]:
+        session = await self.session()
+        for attempt in range(2):
+            token = await tokens.get_token(self)
+            async with session.get(
+                f"{SPOTIFY_API_URL}{path}",
+                params=params,
+                headers={"Authorization": f"Bearer {token}"},
+            ) as response:
+                if response.status == 401 and attempt == 0:
+                    tokens.invalidate()
+                    continue
+                if response.status == 429:
+                    raise RateLimited(parse_retry_after(response.headers.get("Retry-After")), f"Spotify API {path}")
+                if response.status != 200:
+                    return response.status, None
+                return response.status, await response.json()
+        return 401, None
+
+    async def get_track(self, track_id: str) -> Optional[Dict[str, Any]]:
+        """Tek bir şarkının ham Spotify verisi"""
+        status, data = await self.get(f"/v1/tracks/{track_id}")
+        return data if status == 200 else None
+
+    async def get_tracks(self, track_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Birden fazla şarkıyı çoklu `tracks` isteğiyle getir (istek başına en fazla 50 ID)
+
+        Spotify'ın tanımadığı ID'ler None döner; başarısız istekte SpotifyAPIError fırlatılır.
+        """
+        results: Dict[str, Optional[Dict[str, Any]]] = {}
+        chunks = [track_ids[i:i + MAX_TRACKS_PER_REQUEST] for i in range(0, len(track_ids), MAX_TRACKS_PER_REQUEST)]
+
+        async def fetch_chunk(chunk: List[str]) -> None:
+            status, data = await self.get("/v1/tracks", params={"ids": ",".join(chunk)})
+            if status != 200:
+                # Hata yanıtı "bulunamadı" sayılmamalı; çağıran 502 döndürür
+                raise SpotifyAPIError(status, "/v1/tracks")
+            tracks = (data or {}).get("tracks") or []
+            # Spotify bilinmeyen ID'ler için aynı sırada null döndürür
+            for track_id, track in zip(chunk, tracks + [None] * (len(chunk) - len(tracks))):
+                results[track_id] = track
+
+        await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks))
+        return results
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Servis modülleri paket değil, python-service klasöründen doğrudan içe aktarılır
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
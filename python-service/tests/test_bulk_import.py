@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+import pytest
+
+from bulk_import import STATUS_UNKNOWN, dedupe_urls, item_result, normalize_url, split_urls
+
+TRACK = "https://open.spotify.com/track/4uLU6hMCjMI75M1A2tKUQC"
+VIDEO = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("spotify:track:4uLU6hMCjMI75M1A2tKUQC", TRACK),
+    ("https://open.spotify.com/intl-tr/track/4uLU6hMCjMI75M1A2tKUQC?si=abc123", TRACK),
+    ("open.spotify.com/embed/track/4uLU6hMCjMI75M1A2tKUQC", TRACK),
+    ("<https://open.spotify.com/playlist/37i9dQZF1DXcBWIGoYBM5M>",
+     "https://open.spotify.com/playlist/37i9dQZF1DXcBWIGoYBM5M"),
+    ("https://youtu.be/dQw4w9WgXcQ?t=42", VIDEO),
+    ("https://m.youtube.com/watch?v=dQw4w9WgXcQ&list=PL123", VIDEO),
+    ("https://www.youtube.com/shorts/dQw4w9WgXcQ", VIDEO),
+    ("https://www.youtube.com/playlist?list=PL123", "https://www.youtube.com/playlist?list=PL123"),
+    ("https://example.com/track/4uLU6hMCjMI75M1A2tKUQC", None),
+    ("https://www.youtube.com/watch?v=short", None),
+])
+def test_normalize_url(value, expected):
+    assert normalize_url(value) == expected
+
+
+def test_split_and_dedupe_point_repeats_at_the_first_link():
+    values = split_urls(
+        "# taşınan kütüphane\n"
+        f"{TRACK}?si=x, spotify:track:4uLU6hMCjMI75M1A2tKUQC\n"
+        "not-a-link; https://youtu.be/dQw4w9WgXcQ\n"
+    )
+    assert len(values) == 4
+    items = dedupe_urls(values)
+    assert [item.url for item in items] == [TRACK, TRACK, None, VIDEO]
+    assert [item.duplicate_of for item in items] == [None, 0, None, None]
+
+
+def test_item_result_reports_expired_jobs_as_unknown():
+    item = dedupe_urls([TRACK])[0]
+    result = item_result(item, [], expired=1)
+    assert result["status"] == STATUS_UNKNOWN
+    assert result["unknown_tracks"] == 1
+
+    done = SimpleNamespace(status="completed", file_path="/x.mp3", message="ok")
+    assert item_result(item, [done], expired=1)["status"] == "completed"
@@ -0,0 +1,37 @@
+import asyncio
+
+from events import DownloadEventHub
+
+
+def test_changes_since_returns_only_newer_changes():
+    hub = DownloadEventHub()
+    hub.publish("a")
+    cursor = hub.cursor
+    hub.publish("b")
+    hub.publish("a")
+    changed, new_cursor = hub.changes_since(cursor)
+    assert changed == {"a", "b"}
+    assert new_cursor == hub.cursor == 3
+    assert hub.changes_since(new_cursor) == (set(), 3)
+
+
+def test_stale_or_future_cursor_needs_a_snapshot():
+    hub = DownloadEventHub(log_size=2)
+    for download_id in ["a", "b", "c", "d"]:
+        hub.publish(download_id)
+    # 1. ve 2. kayıtlar düştü; 2'den devam eden istemci 3 ve 4'ü alır, daha eskisi alamaz
+    assert hub.changes_since(2) == ({"c", "d"}, 4)
+    assert hub.changes_since(1) is None
+    assert hub.changes_since(10) is None
+
+
+def test_wait_wakes_on_publish_and_times_out_otherwise():
+    async def scenario():
+        hub = DownloadEventHub()
+        assert await hub.wait(hub.cursor, timeout=0.01) is False
+        waiter = asyncio.create_task(hub.wait(hub.cursor, timeout=1))
+        await asyncio.sleep(0)
+        hub.publish("a")
+        assert await waiter is True
+
+    asyncio.run(scenario())
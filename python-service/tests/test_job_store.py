@@ -0,0 +1,93 @@
+from typing import Optional
+
+import pytest
+from pydantic import BaseModel
+
+from job_store import MemoryJobStore, SQLiteJobStore
+
+
+class Job(BaseModel):
+    id: str
+    status: str = "completed"
+    created_at: float = 0.0
+    updated_at: float = 0.0
+    parent_id: Optional[str] = None
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    stores = []
+
+    def make(**kwargs):
+        if request.param == "memory":
+            store = MemoryJobStore(**kwargs)
+        else:
+            store = SQLiteJobStore(Job, str(tmp_path / "jobs.db"), **kwargs)
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        store.close()
+
+
+def add_jobs(store, *jobs):
+    for job in jobs:
+        store.add(job)
+
+
+def test_evicts_oldest_finished_jobs_over_the_limit(make_store):
+    store = make_store(retention_seconds=3600, max_finished=2)
+    add_jobs(store, *(Job(id=f"j{i}", created_at=i, updated_at=100 + i) for i in range(4)))
+    assert sorted(store.evict(now=200)) == ["j0", "j1"]
+    assert "j2" in store and "j3" in store
+
+
+def test_never_evicts_active_jobs(make_store):
+    store = make_store(retention_seconds=10, max_finished=0)
+    add_jobs(store, Job(id="running", status="downloading"), Job(id="done", updated_at=1))
+    assert store.evict(now=100) == ["done"]
+    assert "running" in store
+
+
+def test_keeps_finished_children_of_an_active_collection(make_store):
+    store = make_store(retention_seconds=10, max_finished=0)
+    add_jobs(
+        store,
+        Job(id="playlist", status="downloading"),
+        Job(id="track", updated_at=1, parent_id="playlist"),
+        Job(id="other", updated_at=1),
+    )
+    assert store.evict(now=100) == ["other"]
+    assert "track" in store
+
+    store.get("playlist").status = "completed"
+    store.save(store.get("playlist"), force=True)
+    assert sorted(store.evict(now=100)) == ["playlist", "track"]
+
+
+def test_other_workers_see_writes_deletes_and_evictions(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    scheduler = SQLiteJobStore(Job, path, retention_seconds=10, max_finished=0, shared=True)
+    scheduler.set_owner(True)
+    worker = SQLiteJobStore(Job, path, shared=True)
+    try:
+        changed, cursor = worker.changes_since(0)
+        assert changed == []
+
+        scheduler.add(Job(id="a", status="pending"))
+        scheduler.add(Job(id="b", updated_at=1))
+        changed, cursor = worker.changes_since(cursor)
+        assert changed == ["a", "b"]
+        assert worker.get("a").status == "pending"
+
+        # İmleç silinen kayıtlardan sonra da geri gitmez; silme ve eviction da değişiklik sayılır
+        scheduler.delete("a")
+        assert scheduler.evict(now=100) == ["b"]
+        changed, new_cursor = worker.changes_since(cursor)
+        assert changed == ["a", "b"] and new_cursor > cursor
+        assert worker.get("a") is None and worker.get("b") is None
+        assert worker.changes_since(new_cursor) == ([], new_cursor)
+    finally:
+        worker.close()
+        scheduler.close()
@@ -0,0 +1,61 @@
+import os
+
+from library_index import LibraryIndex
+
+SPOTIFY_ID = "4uLU6hMCjMI75M1A2tKUQC"
+
+
+def write_file(path, content=b"audio"):
+    with open(path, "wb") as f:
+        f.write(content)
+    return os.path.abspath(path)
+
+
+def test_sync_directory_indexes_tags_so_spotify_links_match(tmp_path):
+    library = tmp_path / "uploads"
+    library.mkdir()
+    path = write_file(library / "Rick Astley - Never Gonna Give You Up.mp3")
+    tags = {path: {"spotify_id": SPOTIFY_ID, "isrc": "GBARL9300135", "artist": "Rick Astley",
+                   "title": "Never Gonna Give You Up"}}
+    index = LibraryIndex(str(tmp_path / "index.db"))
+    try:
+        assert index.sync_directory(str(library), lambda paths: {p: tags[p] for p in paths if p in tags}) == 1
+        assert index.find(spotify_id=SPOTIFY_ID) == path
+        assert index.find(spotify_id="0" * 22, isrc="GBARL9300135") == path
+        # Tekrar senkronizasyonda indekslenmiş dosya atlanır
+        assert index.sync_directory(str(library), lambda paths: {}) == 0
+    finally:
+        index.close()
+
+
+def test_untagged_file_matches_by_name_but_tagged_versions_do_not(tmp_path):
+    library = tmp_path / "uploads"
+    library.mkdir()
+    untagged = write_file(library / "Daft Punk - One More Time.mp3", b"a")
+    index = LibraryIndex(str(tmp_path / "index.db"))
+    try:
+        index.sync_directory(str(library))
+        # Etiketsiz eski dosya: ID bilinse de sanatçı/başlık anahtarıyla bulunur
+        assert index.find(spotify_id=SPOTIFY_ID, artist="Daft Punk", title="One More Time") == untagged
+
+        live = write_file(library / "live.mp3", b"b")
+        index.add(live, spotify_id="1" * 22, track_key="daft punk - one more time")
+        index.remove(untagged)
+        # Başka ID'li bir sürüm (ör. canlı kayıt) aynı anahtara sahip olsa da eşleşmez
+        assert index.find(spotify_id=SPOTIFY_ID, artist="Daft Punk", title="One More Time (Live)") is None
+    finally:
+        index.close()
+
+
+def test_sync_completes_rows_indexed_by_filename_only(tmp_path):
+    library = tmp_path / "uploads"
+    library.mkdir()
+    path = write_file(library / "Artist - Title.mp3")
+    index = LibraryIndex(str(tmp_path / "index.db"))
+    try:
+        # Eski sürümün senkronizasyonu sadece dosya adı anahtarı yazıyordu
+        index.add(path, track_key="artist - title")
+        assert index.sync_directory(str(library), lambda paths: {path: {"spotify_id": SPOTIFY_ID}}) == 1
+        assert index.find(spotify_id=SPOTIFY_ID) == path
+    finally:
+        index.close()
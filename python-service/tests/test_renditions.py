@@ -0,0 +1,34 @@
+import os
+
+from renditions import build_renditions, parse_profiles, prune_renditions, rendition_name, rendition_path
+
+LOW = parse_profiles("low=opus:96k")[0]
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+
+
+def test_sources_that_differ_only_by_extension_get_separate_renditions(tmp_path):
+    assert rendition_name(LOW, "/music/x.mp3") == "low/x.mp3.opus"
+    assert rendition_path(str(tmp_path), LOW, "x.mp3") != rendition_path(str(tmp_path), LOW, "x.m4a")
+
+
+def test_registered_path_is_relative_to_the_renditions_dir(tmp_path, monkeypatch):
+    source = tmp_path / "uploads" / "x.mp3"
+    touch(str(source))
+    renditions_dir = tmp_path / "renditions"
+    monkeypatch.setattr("renditions.transcode", lambda src, output, profile, ffmpeg: touch(output))
+    [rendition] = build_renditions(str(source), str(renditions_dir), [LOW])
+    assert rendition["path"] == "low/x.mp3.opus"
+    assert os.path.exists(os.path.join(renditions_dir, rendition["path"]))
+
+
+def test_prune_removes_orphans_and_old_style_names(tmp_path):
+    uploads, renditions_dir = tmp_path / "uploads", tmp_path / "renditions"
+    touch(str(uploads / "x.mp3"))
+    for name in ("x.mp3.opus", "x.opus", "gone.mp3.opus"):
+        touch(str(renditions_dir / "low" / name))
+    assert prune_renditions(str(uploads), str(renditions_dir), [LOW]) == 2
+    assert os.listdir(renditions_dir / "low") == ["x.mp3.opus"]
@@ -0,0 +1,176 @@
+import asyncio
+
+from scheduler import PRIORITY_COLLECTION, PRIORITY_TRACK, DownloadScheduler
+
+
+class Runner:
+    """Her işi testin bitirmesine kadar bekleten sahte indirme"""
+
+    def __init__(self):
+        self.started = []
+        self.finish = {}
+
+    async def __call__(self, job_id):
+        self.started.append(job_id)
+        self.finish[job_id] = asyncio.Event()
+        await self.finish[job_id].wait()
+
+    async def complete(self, job_id):
+        self.finish[job_id].set()
+        await settle()
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_single_track_jumps_ahead_of_queued_collection():
+    async def scenario():
+        runner = Runner()
+        scheduler = DownloadScheduler(runner, max_concurrent=1)
+        try:
+            scheduler.submit_many([f"c{i}" for i in range(20)], priority=PRIORITY_COLLECTION, owner="a", group="pl")
+            scheduler.submit("t1", priority=PRIORITY_TRACK, owner="a")
+            await settle()
+            assert runner.started == ["c0"]
+            await runner.complete("c0")
+            assert runner.started == ["c0", "t1"]
+        finally:
+            await scheduler.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_burst_from_one_owner_does_not_take_every_slot():
+    async def scenario():
+        runner = Runner()
+        scheduler = DownloadScheduler(runner, max_concurrent=2)
+        try:
+            scheduler.submit_many([f"a{i}" for i in range(5)], owner="a")
+            scheduler.submit("b0", owner="b")
+            await settle()
+            assert runner.started == ["a0", "a1"]
+            assert scheduler.queue_order()[0] == "b0"
+            await runner.complete("a0")
+            assert runner.started == ["a0", "a1", "b0"]
+        finally:
+            await scheduler.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_group_limit_lets_other_jobs_through():
+    async def scenario():
+        runner = Runner()
+        scheduler = DownloadScheduler(runner, max_concurrent=3, max_per_group=1)
+        try:
+            scheduler.submit_many(["c1", "c2", "c3"], priority=PRIORITY_COLLECTION, owner="a", group="pl")
+            scheduler.submit("t1", priority=PRIORITY_COLLECTION, owner="a")
+            await settle()
+            assert sorted(runner.started) == ["c1", "t1"]
+            assert scheduler.depth == 2
+        finally:
+            await scheduler.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_single_track_starts_first_when_collection_jobs_release_their_slots():
+    async def scenario():
+        started = []
+        fetched = {}
+        encoded = asyncio.Event()
+
+        async def runner(job_id):
+            # Slot sadece indirme sürerken tutulur; kodlama slotsuz devam eder
+            started.append(job_id)
+            fetched[job_id] = asyncio.Event()
+            await fetched[job_id].wait()
+            scheduler.release(job_id)
+            await encoded.wait()
+
+        scheduler = DownloadScheduler(runner, max_concurrent=2)
+        try:
+            scheduler.submit_many([f"c{i}" for i in range(200)], priority=PRIORITY_COLLECTION, owner="a", group="pl")
+            await settle()
+            scheduler.submit("t1", priority=PRIORITY_TRACK, owner="b")
+            await settle()
+            assert started == ["c0", "c1"]
+            assert scheduler.running == 2
+
+            fetched["c0"].set()
+            await settle()
+            # c0 kodlamaya geçti; boşalan slotu koleksiyonun sıradaki şarkısı değil tekil şarkı alır
+            assert started == ["c0", "c1", "t1"]
+            assert scheduler.running == 3 and scheduler.slots_in_use == 2
+
+            fetched["c1"].set()
+            await settle()
+            assert started == ["c0", "c1", "t1", "c2"]
+        finally:
+            await scheduler.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_released_job_does_not_free_its_slot_twice():
+    async def scenario():
+        runner = Runner()
+        scheduler = DownloadScheduler(runner, max_concurrent=1)
+        try:
+            scheduler.submit_many(["a", "b", "c"])
+            await settle()
+            assert scheduler.release("a") is True
+            assert scheduler.release("a") is False
+            await settle()
+            assert runner.started == ["a", "b"]
+            await runner.complete("a")
+            # a bitti ama slotu zaten bırakmıştı; c, b bitene kadar bekler
+            assert runner.started == ["a", "b"]
+            await runner.complete("b")
+            assert runner.started == ["a", "b", "c"]
+        finally:
+            await scheduler.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_cancel_removes_pending_jobs_and_frees_running_slots():
+    async def scenario():
+        runner = Runner()
+        scheduler = DownloadScheduler(runner, max_concurrent=1)
+        try:
+            scheduler.submit_many(["a", "b", "c"])
+            await settle()
+            assert scheduler.cancel("b") is True
+            assert scheduler.queue_order() == ["c"]
+
+            # Çalışan iş iptal edilince slotu boşalır ve sıradaki iş başlar
+            assert scheduler.cancel("a") is True
+            await settle()
+            assert runner.started == ["a", "c"]
+            assert not scheduler.is_scheduled("a")
+            assert scheduler.cancel("missing") is False
+        finally:
+            await scheduler.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_cancel_reaches_jobs_that_released_their_slot():
+    async def scenario():
+        runner = Runner()
+        scheduler = DownloadScheduler(runner, max_concurrent=1)
+        try:
+            scheduler.submit_many(["a", "b"])
+            await settle()
+            scheduler.release("a")
+            await settle()
+            assert scheduler.cancel_many(["a", "b"]) == 2
+            await settle()
+            assert scheduler.running == 0 and scheduler.slots_in_use == 0
+        finally:
+            await scheduler.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,139 @@
+"""
+Toplu şarkı metadata çözümleyici
+
+Spotify şarkı ID'lerini (veya URL/URI'lerini) tekilleştirir, diskteki
+önbellekte olmayanları Spotify'ın çoklu `tracks` isteğiyle 50'şerli
+gruplar halinde getirir ve sonucu SQLite önbelleğine yazar.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Executor
+from typing import Any, Dict, Iterable, List, Optional
+
+from spotify_api import SpotifyAPI
+
+logger = logging.getLogger(__name__)
+
+TRACK_ID_RE = re.compile(r"^[A-Za-z0-9]{22}$")
+TRACK_URL_RE = re.compile(r"(?:open\.spotify\.com/(?:intl-[a-z]+/)?track/|spotify:track:)([A-Za-z0-9]{22})")
+
+
+def extract_track_id(value: str) -> Optional[str]:
+    """Spotify şarkı URL'si, URI'si veya çıplak ID'den şarkı ID'sini çıkar"""
+    value = value.strip()
+    if TRACK_ID_RE.match(value):
+        return value
+    match = TRACK_URL_RE.search(value)
+    return match.group(1) if match else None
+
+
+def track_info_from_spotify(track: Dict[str, Any]) -> Dict[str, Any]:
+    """Spotify şarkı nesnesini servisin kullandığı sade sözlüğe çevir"""
+    album = track.get("album") or {}
+    images = album.get("images") or []
+    return {
+        "id": track["id"],
+        "title": track["name"],
+        "artist": ", ".join(artist["name"] for artist in track.get("artists", [])),
+        "album": album.get("name"),
+        "duration": track.get("duration_ms", 0) // 1000,
+        # Spotify görselleri büyükten küçüğe sıralar
+        "cover_url": images[0]["url"] if images else None,
+        "isrc": (track.get("external_ids") or {}).get("isrc"),
+        "url": (track.get("external_urls") or {}).get("spotify"),
+    }
+
+
+class TrackMetadataCache:
+    """Şarkı metadata'sı için SQLite disk önbelleği"""
+
+    def __init__(self, path: str, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tracks (id TEXT PRIMARY KEY, data TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def get_many(self, track_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        found: Dict[str, Dict[str, Any]] = {}
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            # SQLite parametre sınırına takılmamak için parçalı sorgu
+            for i in range(0, len(track_ids), 500):
+                chunk = track_ids[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT id, data FROM tracks WHERE fetched_at >= ? AND id IN ({','.join('?' * len(chunk))})",
+                    [cutoff] + chunk,
+                ).fetchall()
+                found.update({track_id: json.loads(data) for track_id, data in rows})
+        return found
+
+    def put_many(self, tracks: Dict[str, Dict[str, Any]]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO tracks (id, data, fetched_at) VALUES (?, ?, ?)",
+                [(track_id, json.dumps(info), now) for track_id, info in tracks.items()],
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TrackMetadataResolver:
+    """Önbellek + Spotify çoklu istekle toplu metadata çözümleme
+
+    Önbellek SQLite'tır; okuma/yazmalar event loop'u bloklamasın diye
+    `executor` havuzunda (None ise varsayılan havuzda) yapılır.
+    """
+
+    def __init__(
+        self, api: SpotifyAPI, cache: Optional[TrackMetadataCache] = None, executor: Optional[Executor] = None
+    ):
+        self.api = api
+        self.cache = cache
+        self.executor = executor
+
+    async def resolve(self, track_ids: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """ID -> metadata (bulunamayanlar None); tekrar eden ID'ler tek sefer çözülür"""
+        unique_ids = list(dict.fromkeys(track_ids))
+        results: Dict[str, Optional[Dict[str, Any]]] = {}
+        loop = asyncio.get_running_loop()
+        if self.cache is not None:
+            results.update(await loop.run_in_executor(self.executor, self.cache.get_many, unique_ids))
+
+        missing = [track_id for track_id in unique_ids if track_id not in results]
+        if missing:
+            fetched = await self.api.get_tracks(missing)
+            resolved = {
+                track_id: track_info_from_spotify(track)
+                for track_id, track in fetched.items()
+                if track is not None
+            }
+            if self.cache is not None and resolved:
+                await loop.run_in_executor(self.executor, self.cache.put_many, resolved)
+            for track_id in missing:
+                results[track_id] = resolved.get(track_id)
+        return results
+
+
+def create_metadata_cache() -> Optional[TrackMetadataCache]:
+    """METADATA_CACHE_PATH'teki önbelleği aç; açılamazsa önbelleksiz çalış"""
+    path = os.getenv("METADATA_CACHE_PATH", "../data/metadata_cache.db")
+    ttl = float(os.getenv("METADATA_CACHE_TTL", str(7 * 24 * 3600)))
+    try:
+        return TrackMetadataCache(path, ttl)
+    except sqlite3.Error as e:
+        logger.error(f"Failed to open metadata cache at {path}: {e}")
+        return None
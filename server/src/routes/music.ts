@@ -4,8 +4,9 @@ import path from 'path';
 import { v4 as uuidv4 } from 'uuid';
 import * as mm from 'music-metadata';
 import fs from 'fs-extra';
-import { Song } from '../types';
+import { Song, Rendition } from '../types';
 import { DataManager } from '../utils/dataManager';
+import { resolveRenditionPath } from '../utils/renditionPath';
 
 const router = express.Router();
 
@@ -143,6 +144,45 @@ router.delete('/:id', async (req, res) => {
   }
 });
 
+// Yayın dosyalarının içerik türleri
+const AUDIO_CONTENT_TYPES: Record<string, string> = {
+  '.mp3': 'audio/mpeg',
+  '.opus': 'audio/ogg; codecs=opus',
+  '.ogg': 'audio/ogg',
+  '.m4a': 'audio/mp4',
+  '.flac': 'audio/flac',
+  '.wav': 'audio/wav'
+};
+
+// İstenen yayın kopyası; asıl dosya yayınlanacaksa null
+// ?quality=original|lowest|<profil> kopyayı açıkça seçer. ?maxBitrate=<kbps> verilirse asıl dosya sığmıyorsa
+// sınıra sığan en yüksek bit hızlı kopya (hiçbiri sığmıyorsa en düşüğü) seçilir. Seçim sadece URL'ye bağlıdır;
+// aynı şarkının range istekleri arasında dosya değişmez.
+function selectRendition(song: Song, quality: unknown, maxBitrate: unknown): Rendition | null {
+  const renditions = [...(song.renditions || [])].sort((a, b) => a.bitrate - b.bitrate);
+  if (renditions.length === 0 || quality === 'original') {
+    return null;
+  }
+  if (quality === 'lowest') {
+    return renditions[0];
+  }
+  if (typeof quality === 'string' && quality !== 'auto') {
+    return renditions.find(rendition => rendition.profile === quality) || null;
+  }
+
+  const budget = Number(maxBitrate);
+  if (!(budget > 0)) {
+    return null;
+  }
+  // Şarkı kaydındaki bit hızı bps cinsindendir
+  const originalKbps = song.bitrate ? song.bitrate / 1000 : Infinity;
+  if (originalKbps <= budget) {
+    return null;
+  }
+  const fitting = renditions.filter(rendition => rendition.bitrate <= budget);
+  return fitting.length > 0 ? fitting[fitting.length - 1] : renditions[0];
+}
+
 // Şarkı stream et
 router.get('/stream/:id', async (req, res) => {
   try {
@@ -154,7 +194,13 @@ router.get('/stream/:id', async (req, res) => {
       return res.status(404).json({ error: 'Şarkı bulunamadı' });
     }
 
-    const filePath = song.filePath;
+    let rendition = selectRendition(song, req.query.quality, req.query.maxBitrate);
+    const renditionPath = rendition ? resolveRenditionPath(rendition.path) : null;
+    if (rendition && (!renditionPath || !(await fs.pathExists(renditionPath)))) {
+      // Kopya silinmişse ya da kopya dizininin dışını gösteriyorsa asıl dosyaya düş
+      rendition = null;
+    }
+    const filePath = rendition && renditionPath ? renditionPath : song.filePath;
     
     if (!(await fs.pathExists(filePath))) {
       return res.status(404).json({ error: 'Dosya bulunamadı' });
@@ -169,8 +215,10 @@ router.get('/stream/:id', async (req, res) => {
       'Access-Control-Allow-Origin': '*',
       'Access-Control-Allow-Methods': 'GET',
       'Access-Control-Allow-Headers': 'Range',
+      'Access-Control-Expose-Headers': 'X-Rendition',
       'Accept-Ranges': 'bytes',
-      'Content-Type': 'audio/mpeg',
+      'Content-Type': AUDIO_CONTENT_TYPES[path.extname(filePath).toLowerCase()] || 'audio/mpeg',
+      'X-Rendition': rendition ? rendition.profile : 'original',
     });
 
     if (range) {
@@ -296,26 +344,171 @@ router.post('/add-downloaded', async (req, res) => {
   }
 });
 
+// İndirilen dosyanın yolunu bul (uploads klasörü iki olası konumda olabilir)
+async function resolveDownloadedFile(filename: string): Promise<string | null> {
+  const candidates = [
+    path.join(__dirname, '../../../uploads', filename),
+    path.join(process.cwd(), 'uploads', filename)
+  ];
+  for (const candidate of candidates) {
+    if (await fs.pathExists(candidate)) {
+      return candidate;
+    }
+  }
+  return null;
+}
+
+// İndirilen şarkıları toplu ekle (songs.json grup başına bir kez yazılır)
+router.post('/add-downloaded-batch', async (req, res) => {
+  try {
+    const items = req.body?.songs;
+
+    if (!Array.isArray(items)) {
+      return res.status(400).json({ error: 'songs dizisi gerekli' });
+    }
+
+    const added: Song[] = [];
+    const results = [];
+
+    for (const item of items) {
+      const { title, artist, album, duration, filename, source, bitrate, sampleRate, genre, year, coverUrl } = item || {};
+
+      if (!title || !artist || !filename || path.basename(filename) !== filename) {
+        results.push({ success: false, filename, error: 'Gerekli alanlar eksik' });
+        continue;
+      }
+
+      const filePath = await resolveDownloadedFile(filename);
+      if (!filePath) {
+        results.push({ success: false, filename, error: 'İndirilen dosya bulunamadı' });
+        continue;
+      }
+
+      const stat = await fs.stat(filePath);
+      const song: Song = {
+        id: uuidv4(),
+        title,
+        artist,
+        album,
+        duration: duration || 0,
+        filename,
+        filePath,
+        uploadedAt: new Date().toISOString(),
+        size: stat.size,
+        format: path.extname(filename).toLowerCase(),
+        bitrate,
+        sampleRate,
+        genre,
+        year,
+        coverUrl,
+        source: source || 'download'
+      };
+      added.push(song);
+      results.push({ success: true, filename, song });
+    }
+
+    await DataManager.addSongs(added);
+
+    res.json({
+      success: true,
+      added: added.length,
+      results
+    });
+
+  } catch (error) {
+    console.error('Add downloaded batch error:', error);
+    res.status(500).json({ 
+      error: 'İndirilen şarkılar eklenirken hata oluştu',
+      details: error instanceof Error ? error.message : 'Bilinmeyen hata'
+    });
+  }
+});
+
+// Python servisinin ürettiği yayın kopyalarını kaydet (dosya adına göre, toplu)
+router.post('/renditions-batch', async (req, res) => {
+  try {
+    const items = req.body?.songs;
+
+    if (!Array.isArray(items)) {
+      return res.status(400).json({ error: 'songs dizisi gerekli' });
+    }
+
+    const updates: { filename: string; renditions: Rendition[] }[] = [];
+    const results: { success: boolean; filename?: string; error?: string }[] = items.map(() => ({ success: false }));
+    const positions: number[] = [];
+
+    items.forEach((item, index) => {
+      const { filename, renditions } = item || {};
+      if (!filename || path.basename(filename) !== filename || !Array.isArray(renditions)) {
+        results[index] = { success: false, filename, error: 'Gerekli alanlar eksik' };
+        return;
+      }
+      // Yollar kopya dizinine görelidir; dizinin dışına çıkan kayıt kabul edilmez
+      if (!renditions.every((rendition: Rendition) => resolveRenditionPath(String(rendition?.path ?? '')))) {
+        results[index] = { success: false, filename, error: 'Geçersiz kopya yolu' };
+        return;
+      }
+      updates.push({
+        filename,
+        renditions: renditions.map((rendition: Rendition) => ({
+          profile: String(rendition.profile),
+          format: String(rendition.format),
+          bitrate: Number(rendition.bitrate) || 0,
+          path: String(rendition.path),
+          size: Number(rendition.size) || 0
+        }))
+      });
+      positions.push(index);
+    });
+
+    const updated = await DataManager.setRenditions(updates);
+    updated.forEach((success, i) => {
+      const index = positions[i];
+      results[index] = success
+        ? { success: true, filename: updates[i].filename }
+        : { success: false, filename: updates[i].filename, error: 'Şarkı bulunamadı' };
+    });
+
+    res.json({
+      success: true,
+      updated: updated.filter(Boolean).length,
+      results
+    });
+
+  } catch (error) {
+    console.error('Add renditions error:', error);
+    res.status(500).json({ 
+      error: 'Yayın kopyaları kaydedilirken hata oluştu',
+      details: error instanceof Error ? error.message : 'Bilinmeyen hata'
+    });
+  }
+});
+
 // Şarkıyı favorilere ekle/çıkar
 router.post('/favorite/:id', async (req, res) => {
   try {
     const { id } = req.params;
-    const songs = await DataManager.getSongs();
-    const songIndex = songs.findIndex(s => s.id === id);
-    
-    if (songIndex === -1) {
+    const song = await DataManager.withSongsLock(async () => {
+      const songs = await DataManager.getSongs();
+      const songIndex = songs.findIndex(s => s.id === id);
+      
+      if (songIndex === -1) return null;
+
+      // Favorilere ekle/çıkar
+      songs[songIndex].isFavorite = !songs[songIndex].isFavorite;
+      
+      await DataManager.saveSongs(songs);
+      return songs[songIndex];
+    });
+
+    if (!song) {
       return res.status(404).json({ error: 'Şarkı bulunamadı' });
     }
 
-    // Favorilere ekle/çıkar
-    songs[songIndex].isFavorite = !songs[songIndex].isFavorite;
-    
-    await DataManager.saveSongs(songs);
-
     res.json({
       success: true,
-      song: songs[songIndex],
-      message: songs[songIndex].isFavorite ? 'Favorilere eklendi' : 'Favorilerden çıkarıldı'
+      song,
+      message: song.isFavorite ? 'Favorilere eklendi' : 'Favorilerden çıkarıldı'
     });
 
   } catch (error) {
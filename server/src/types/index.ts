@@ -14,9 +14,19 @@ export interface Song {
   genre?: string;
   year?: number;
   source?: string; // 'upload', 'download', 'spotdl', etc.
+  coverUrl?: string; // Python servisindeki küçültülmüş kapak yolu (/covers/...)
+  renditions?: Rendition[]; // Yavaş bağlantılar için düşük bit hızlı kopyalar
   isFavorite?: boolean; // Favori şarkı mı
 }
 
+export interface Rendition {
+  profile: string; // ör. 'low'
+  format: string; // 'opus', 'm4a', 'mp3', ...
+  bitrate: number; // kbps
+  path: string; // RENDITIONS_DIR'e göreli, ör. 'low/x.mp3.opus'
+  size: number;
+}
+
 export interface Playlist {
   id: string;
   name: string;
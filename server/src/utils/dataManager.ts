@@ -1,10 +1,20 @@
 import fs from 'fs-extra';
 import path from 'path';
-import { Song, Playlist } from '../types';
+import { Song, Playlist, Rendition } from '../types';
+import { resolveRenditionPath } from './renditionPath';
 
 const DATA_DIR = path.join(__dirname, '../../../data');
 
 export class DataManager {
+  // songs.json read-modify-write işlemlerini sıraya sokar; eşzamanlı yazımlar birbirini ezmesin
+  private static songsWriteQueue: Promise<unknown> = Promise.resolve();
+
+  static withSongsLock<T>(task: () => Promise<T>): Promise<T> {
+    const run = this.songsWriteQueue.then(task);
+    this.songsWriteQueue = run.catch(() => undefined);
+    return run;
+  }
+
   static async getSongs(): Promise<Song[]> {
     try {
       const filePath = path.join(DATA_DIR, 'songs.json');
@@ -26,28 +36,66 @@ export class DataManager {
   }
 
   static async addSong(song: Song): Promise<void> {
-    const songs = await this.getSongs();
-    songs.push(song);
-    await this.saveSongs(songs);
+    await this.addSongs([song]);
+  }
+
+  // Birden fazla şarkıyı tek okuma-yazma ile ekle
+  static async addSongs(newSongs: Song[]): Promise<void> {
+    if (newSongs.length === 0) return;
+    await this.withSongsLock(async () => {
+      const songs = await this.getSongs();
+      songs.push(...newSongs);
+      await this.saveSongs(songs);
+    });
+  }
+
+  // Dosya adına göre şarkıların yayın kopyalarını güncelle (tek okuma-yazma); bulunamayanlar false
+  static async setRenditions(updates: { filename: string; renditions: Rendition[] }[]): Promise<boolean[]> {
+    if (updates.length === 0) return [];
+    return this.withSongsLock(async () => {
+      const songs = await this.getSongs();
+      const byFilename = new Map(songs.map(song => [song.filename, song]));
+      const results = updates.map(({ filename, renditions }) => {
+        const song = byFilename.get(filename);
+        if (!song) return false;
+        song.renditions = renditions;
+        return true;
+      });
+      if (results.some(Boolean)) {
+        await this.saveSongs(songs);
+      }
+      return results;
+    });
   }
 
   static async deleteSong(songId: string): Promise<boolean> {
-    const songs = await this.getSongs();
-    const index = songs.findIndex(s => s.id === songId);
-    
-    if (index === -1) return false;
-    
-    // Dosyayı sil
-    const song = songs[index];
-    try {
-      await fs.remove(song.filePath);
-    } catch (error) {
-      console.error('Error deleting file:', error);
-    }
+    const deleted = await this.withSongsLock(async () => {
+      const songs = await this.getSongs();
+      const index = songs.findIndex(s => s.id === songId);
+      
+      if (index === -1) return false;
+      
+      // Dosyayı sil
+      const song = songs[index];
+      try {
+        await fs.remove(song.filePath);
+        for (const rendition of song.renditions || []) {
+          const renditionPath = resolveRenditionPath(rendition.path);
+          if (renditionPath) {
+            await fs.remove(renditionPath);
+          }
+        }
+      } catch (error) {
+        console.error('Error deleting file:', error);
+      }
+      
+      // Listeden çıkar
+      songs.splice(index, 1);
+      await this.saveSongs(songs);
+      return true;
+    });
     
-    // Listeden çıkar
-    songs.splice(index, 1);
-    await this.saveSongs(songs);
+    if (!deleted) return false;
     
     // Playlist'lerden de çıkar
     await this.removeSongFromAllPlaylists(songId);
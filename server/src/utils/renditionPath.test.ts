@@ -0,0 +1,25 @@
+import { test } from 'node:test';
+import assert from 'node:assert/strict';
+import path from 'path';
+import { resolveRenditionPath } from './renditionPath';
+
+const root = path.resolve('/srv/erotify/data/renditions');
+
+test('göreli kopya yolu kopya dizinine birleştirilir', () => {
+  assert.equal(resolveRenditionPath('low/x.mp3.opus', root), path.join(root, 'low', 'x.mp3.opus'));
+  assert.equal(resolveRenditionPath('..x.mp3.opus', root), path.join(root, '..x.mp3.opus'));
+});
+
+test('eski kayıtlardaki dizin içi mutlak yollar kabul edilir', () => {
+  const legacy = path.join(root, 'low', 'x.opus');
+  assert.equal(resolveRenditionPath(legacy, root), legacy);
+});
+
+test('kopya dizininin dışına çıkan yollar reddedilir', () => {
+  assert.equal(resolveRenditionPath('../songs.json', root), null);
+  assert.equal(resolveRenditionPath('low/../../../uploads/x.mp3', root), null);
+  assert.equal(resolveRenditionPath('/etc/passwd', root), null);
+  assert.equal(resolveRenditionPath(`${root}-other/x.opus`, root), null);
+  assert.equal(resolveRenditionPath('', root), null);
+  assert.equal(resolveRenditionPath('.', root), null);
+});
@@ -0,0 +1,16 @@
+import path from 'path';
+
+// Python servisinin yayın kopyalarını yazdığı dizin (python-service RENDITIONS_DIR ile aynı olmalı)
+export const RENDITIONS_DIR = path.resolve(
+  process.env.RENDITIONS_DIR || path.join(__dirname, '../../../data/renditions')
+);
+
+// Kopya yolunu kopya dizinine göre çöz; dizinin dışına çıkan yollar null (eski kayıtlardaki mutlak yollar da denetlenir)
+export function resolveRenditionPath(renditionPath: string, root: string = RENDITIONS_DIR): string | null {
+  const resolved = path.resolve(root, renditionPath);
+  const relative = path.relative(root, resolved);
+  if (!relative || relative === '..' || relative.startsWith(`..${path.sep}`) || path.isAbsolute(relative)) {
+    return null;
+  }
+  return resolved;
+}